@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -114,12 +115,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that also records Person.last_activity
+        'knowledge.authentication.ActivityJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'knowledge.pagination.StandardPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -140,6 +142,97 @@ SIMPLE_JWT = {
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
 
+# Redis (optional: cache, counters and activity fall back to per-process storage)
+REDIS_URL = os.environ.get('REDIS_URL')
+
+# Cache: Redis when configured (shared across workers, needed for cross-process
+# invalidation), otherwise per-process local memory for development and tests
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'dkn',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dkn',
+        }
+    }
+
+# Seconds between flushes of buffered view/download counters
+COUNTER_FLUSH_INTERVAL = int(os.environ.get('COUNTER_FLUSH_INTERVAL', '10'))
+
+# Person.last_activity write-behind: resolution and flush interval in seconds
+ACTIVITY_RESOLUTION = int(os.environ.get('ACTIVITY_RESOLUTION', '60'))
+ACTIVITY_FLUSH_INTERVAL = int(os.environ.get('ACTIVITY_FLUSH_INTERVAL', '60'))
+
+# ActivityLog ingestion: flush interval in seconds, rows per bulk insert and
+# the most entries a process buffers before dropping new ones
+ACTIVITY_LOG_FLUSH_INTERVAL = int(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', '5'))
+ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', '500'))
+ACTIVITY_LOG_MAX_BUFFER = int(os.environ.get('ACTIVITY_LOG_MAX_BUFFER', '50000'))
+
+# ActivityLog partitions: months created ahead and months kept (0 keeps all)
+ACTIVITY_LOG_PARTITIONS_AHEAD = int(os.environ.get('ACTIVITY_LOG_PARTITIONS_AHEAD', '3'))
+ACTIVITY_LOG_RETENTION_MONTHS = int(os.environ.get('ACTIVITY_LOG_RETENTION_MONTHS', '12'))
+
+# Neo4j graph sync: model changes are queued in an outbox table (when a
+# graph database is configured) and drained by `manage.py sync_graph`
+NEO4J_BOLT_URL = os.environ.get('NEO4J_BOLT_URL')
+NEO4J_USER = os.environ.get('NEO4J_USER', 'neo4j')
+NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD', '')
+GRAPH_OUTBOX_ENABLED = os.environ.get('GRAPH_OUTBOX_ENABLED', str(bool(NEO4J_BOLT_URL))) == 'True'
+GRAPH_SINK = os.environ.get('GRAPH_SINK', 'knowledge.graph_sync.Neo4jGraphSink')
+GRAPH_SYNC_BATCH_SIZE = int(os.environ.get('GRAPH_SYNC_BATCH_SIZE', '500'))
+# Outbox backlog at which bulk writers pause for the drain worker to catch up
+GRAPH_OUTBOX_HIGH_WATERMARK = int(os.environ.get('GRAPH_OUTBOX_HIGH_WATERMARK', '50000'))
+
+# Blockchain anchoring: chain client, most documents per Merkle batch,
+# seconds between batches for `manage.py anchor_documents --loop` and
+# seconds after which a batch left submitting (its run died) is retried
+ANCHOR_CHAIN_CLIENT = os.environ.get('ANCHOR_CHAIN_CLIENT', 'knowledge.anchoring.SimulatedLedger')
+ANCHOR_BATCH_MAX_SIZE = int(os.environ.get('ANCHOR_BATCH_MAX_SIZE', '10000'))
+ANCHOR_BATCH_WINDOW = int(os.environ.get('ANCHOR_BATCH_WINDOW', '300'))
+ANCHOR_SUBMIT_TIMEOUT = int(os.environ.get('ANCHOR_SUBMIT_TIMEOUT', '3600'))
+
+# Celery: Redis as broker. Without one (development, or a single-service
+# deploy such as render.yaml) tasks run inline after commit with a logged
+# warning, holding up the request; CELERY_TASK_ALWAYS_EAGER runs every task
+# inline even with a broker
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ROUTES = {'knowledge.tasks.*': {'queue': 'extraction'}}
+
+# Knowledge extraction: processes for text analysis per worker (0 runs it
+# in the worker itself), retries for transient errors and the most bytes
+# of a stored file that are analysed
+EXTRACTION_PROCESSES = int(os.environ.get('EXTRACTION_PROCESSES', str(os.cpu_count() or 1)))
+EXTRACTION_MAX_RETRIES = int(os.environ.get('EXTRACTION_MAX_RETRIES', '5'))
+EXTRACTION_MAX_BYTES = int(os.environ.get('EXTRACTION_MAX_BYTES', str(5 * 1024 * 1024)))
+
+# Semantic search: index directory, embedder class and its dimensions, and
+# IVF lists scanned per query (more is slower but finds more neighbours)
+VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR', str(BASE_DIR / 'var' / 'vector_index'))
+VECTOR_EMBEDDER = os.environ.get('VECTOR_EMBEDDER', 'knowledge.vector_index.HashedTfidfEmbedder')
+VECTOR_DIMENSIONS = int(os.environ.get('VECTOR_DIMENSIONS', '512'))
+VECTOR_INDEX_NPROBE = int(os.environ.get('VECTOR_INDEX_NPROBE', '8'))
+
+# Related documents: directory of the MinHash/LSH neighbour index
+RELATED_INDEX_DIR = os.environ.get('RELATED_INDEX_DIR', str(BASE_DIR / 'var' / 'related_index'))
+
+# Knowledge graph: directory of the snapshot every process loads (written by
+# `manage.py build_graph` or the rebuild_graph_snapshot task)
+GRAPH_SNAPSHOT_DIR = os.environ.get('GRAPH_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'graph'))
+
+# Tests keep the index directories above in a temporary directory
+TEST_RUNNER = 'dkn.test_runner.TestRunner'
+
 # Custom user model
 AUTH_USER_MODEL = 'knowledge.Person'
 
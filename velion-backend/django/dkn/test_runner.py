@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+# Settings naming directories that code under test writes to
+DATA_DIR_SETTINGS = ('VECTOR_INDEX_DIR', 'RELATED_INDEX_DIR', 'GRAPH_SNAPSHOT_DIR')
+
+class TestRunner(DiscoverRunner):
+    """
+    Point the on-disk indexes and the graph snapshot at a temporary
+    directory for the whole run, so tests never write under ``var/``.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.data_dir = tempfile.mkdtemp(prefix='dkn-test-')
+        self.data_settings = override_settings(**{
+            setting: os.path.join(self.data_dir, setting.lower()) for setting in DATA_DIR_SETTINGS
+        })
+        self.data_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.data_settings.disable()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,115 @@
+"""
+Workspace access resolution.
+
+A user sees public workspaces and the private ones they are a member of.
+Each user's memberships (workspace id -> role) are cached as a small map,
+stored with the user's membership version, so list and detail queries
+filter on ``is_private`` plus a short id list instead of joining
+memberships and de-duplicating. When the map is not cached, the
+membership test is an ``EXISTS`` subquery in the same statement.
+
+A change to one of the user's WorkspaceMembership rows bumps the version
+after commit. The map and the version are read together, and a refill
+records the version it read before loading the rows, so a refill racing
+with a change is stored under the old version and never served.
+"""
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from . import caching
+from .models import WorkspaceMembership
+
+MEMBERSHIPS_KEY = 'access:memberships:{}'
+MEMBERSHIPS_RESOURCE = 'memberships:{}'  # per-person version, see caching.py
+MEMBERSHIPS_TIMEOUT = 3600  # changes invalidate explicitly; this bounds missed ones
+
+def is_admin(user):
+    return getattr(user, 'role', None) == 'ADMIN'
+
+def load_memberships(user):
+    return {
+        str(workspace_id): role
+        for workspace_id, role in WorkspaceMembership.objects.filter(person=user).values_list(
+            'workspace_id', 'role'
+        )
+    }
+
+def get_memberships(user, build=True):
+    """
+    ``{workspace id: role}`` for ``user``, from the cache or, with
+    ``build``, the database. Returns None on a miss without ``build``.
+    """
+    key = MEMBERSHIPS_KEY.format(user.pk)
+    version_key = caching.VERSION_KEY.format(MEMBERSHIPS_RESOURCE.format(user.pk))
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key, 0)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    if not build:
+        return None
+    memberships = load_memberships(user)
+    cache.set(key, (version, memberships), MEMBERSHIPS_TIMEOUT)
+    return memberships
+
+def invalidate_memberships(person_id):
+    caching.bump_version_on_commit(MEMBERSHIPS_RESOURCE.format(person_id))
+
+def membership_condition(user, field='pk', memberships=None):
+    """
+    ``Q`` on ``field`` (a workspace id) for workspaces ``user`` is a member
+    of, from ``memberships`` or the cached map when either is at hand.
+    """
+    if memberships is None:
+        memberships = get_memberships(user, build=False)
+    if memberships is not None:
+        return Q(**{f'{field}__in': list(memberships)})
+    return Q(Exists(WorkspaceMembership.objects.filter(workspace=OuterRef(field), person=user)))
+
+def visible_workspaces(queryset, user, memberships=None):
+    if is_admin(user):
+        return queryset
+    return queryset.filter(Q(is_private=False) | membership_condition(user, memberships=memberships))
+
+def visible_documents(queryset, user, memberships=None, prefix=''):
+    """
+    Documents outside any workspace, or in one ``user`` can see. ``prefix``
+    reaches the document from another model, e.g. ``'document__'``.
+    """
+    if is_admin(user):
+        return queryset
+    return queryset.filter(
+        Q(**{f'{prefix}workspace__isnull': True}) | Q(**{f'{prefix}workspace__is_private': False})
+        | membership_condition(user, f'{prefix}workspace_id', memberships)
+    )
+
+def filter_documents_by_workspace(queryset, user, workspace_id, memberships=None):
+    """
+    Documents of ``workspace_id``, or none when ``user`` cannot see that
+    workspace. Visibility is part of the same query.
+    """
+    queryset = queryset.filter(workspace_id=workspace_id)
+    if is_admin(user):
+        return queryset
+    if memberships is None:
+        memberships = get_memberships(user, build=False)
+    if memberships is not None and str(workspace_id) in memberships:
+        return queryset
+    return queryset.filter(
+        Q(workspace__is_private=False) | membership_condition(user, 'workspace_id', memberships)
+    )
+
+# Signal helpers (see signals.py)
+def remember_membership_state(membership):
+    loaded = membership.__dict__
+    membership._access_state = (loaded.get('workspace_id'), loaded.get('person_id'), loaded.get('role'))
+
+def membership_saved(membership, created):
+    previous = getattr(membership, '_access_state', None)
+    remember_membership_state(membership)
+    # last_accessed is touched on every visit and does not change access
+    if created or membership._access_state != previous:
+        invalidate_memberships(membership.person_id)
+        if previous and previous[1] not in (None, membership.person_id):
+            invalidate_memberships(previous[1])
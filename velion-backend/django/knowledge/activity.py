@@ -0,0 +1,170 @@
+"""
+Write-behind tracking of ``Person.last_activity``.
+
+Activity is coalesced per user (in Redis when ``REDIS_URL`` is set, else
+per process) and persisted periodically with one narrow bulk UPDATE.
+Timestamps only need minute-level resolution, so repeat activity within
+``ACTIVITY_RESOLUTION`` seconds is not even buffered.
+"""
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching, rollups
+from .models import Person
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 1000
+
+class LocalActivityBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def add(self, person_id, timestamp):
+        with self._lock:
+            if timestamp > self._pending.get(person_id, 0):
+                self._pending[person_id] = timestamp
+
+    def drain(self):
+        with self._lock:
+            drained, self._pending = self._pending, {}
+        return drained
+
+class RedisActivityBuffer:
+    key = 'dkn:activity:pending'
+    # Keep the newest timestamp when workers report the same user concurrently
+    SET_LATEST = """
+        local current = redis.call('HGET', KEYS[1], ARGV[1])
+        if not current or tonumber(current) < tonumber(ARGV[2]) then
+            redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+        end
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._set_latest = client.register_script(self.SET_LATEST)
+
+    def add(self, person_id, timestamp):
+        self._set_latest(keys=[self.key], args=[person_id, repr(timestamp)])
+
+    def drain(self):
+        processing_key = f'{self.key}:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(self.key, processing_key)
+        except redis.ResponseError:
+            return {}  # Nothing pending
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(processing_key)
+        pipeline.delete(processing_key)
+        values, _ = pipeline.execute()
+        return {int(person_id): float(timestamp) for person_id, timestamp in values.items()}
+
+class ActivityTracker:
+    def __init__(self):
+        self.local = LocalActivityBuffer()
+        self.remote = None
+        self._recent = {}
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+        redis_url = getattr(settings, 'REDIS_URL', None)
+        if redis_url:
+            self.remote = RedisActivityBuffer(redis.Redis.from_url(redis_url))
+
+    def record(self, person_id, when=None):
+        timestamp = (when or timezone.now()).timestamp()
+
+        # Throttle: this process already reported the user recently
+        if timestamp - self._recent.get(person_id, 0) < settings.ACTIVITY_RESOLUTION:
+            return
+        self._recent[person_id] = timestamp
+
+        try:
+            (self.remote or self.local).add(person_id, timestamp)
+        except redis.RedisError:
+            logger.warning('Activity buffer unavailable, buffering locally', exc_info=True)
+            self.local.add(person_id, timestamp)
+
+        if time.monotonic() - self._last_flush >= settings.ACTIVITY_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_flush = time.monotonic()
+            self._recent.clear()
+            flushed = 0
+            for buffer in (self.remote, self.local):
+                if buffer is None:
+                    continue
+                try:
+                    pending = buffer.drain()
+                except redis.RedisError:
+                    logger.warning('Could not drain activity buffer', exc_info=True)
+                    continue
+                try:
+                    flushed += persist_activity(pending)
+                except Exception:
+                    logger.exception('Activity flush failed, re-buffering')
+                    for person_id, timestamp in pending.items():
+                        self.local.add(person_id, timestamp)
+            return flushed
+        finally:
+            self._flush_lock.release()
+
+def persist_activity(pending):
+    """
+    Write ``{person_id: epoch_seconds}`` with one
+    ``UPDATE ... FROM (VALUES ...)`` per batch. Only ``last_activity`` is
+    written, and never moved backwards.
+    """
+    entries = [
+        (person_id, datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+        for person_id, timestamp in pending.items()
+    ]
+    table = Person._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for start in range(0, len(entries), FLUSH_BATCH_SIZE):
+                batch = entries[start:start + FLUSH_BATCH_SIZE]
+                values = ', '.join(['(%s::bigint, %s::timestamptz)'] * len(batch))
+                cursor.execute(
+                    f'UPDATE "{table}" AS p SET last_activity = v.last_activity '
+                    f'FROM (VALUES {values}) AS v(id, last_activity) '
+                    f'WHERE p.id = v.id AND p.last_activity < v.last_activity',
+                    [value for entry in batch for value in entry]
+                )
+        rollups.record_user_activity_bulk(entries)
+        # Active user counts are cached under the people version
+        caching.bump_version_on_commit('people')
+    return len(entries)
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ActivityTracker()
+                atexit.register(_tracker.flush)
+    return _tracker
+
+def record_activity(person_id, when=None):
+    get_tracker().record(person_id, when)
+
+def flush():
+    return get_tracker().flush()
@@ -0,0 +1,115 @@
+"""
+Buffered ActivityLog ingestion.
+
+``log_action`` only appends to an in-process queue. A background thread
+writes the queue with ``bulk_create`` every ``ACTIVITY_LOG_FLUSH_INTERVAL``
+seconds, or sooner once ``ACTIVITY_LOG_BATCH_SIZE`` entries are waiting, so
+requests never wait on the insert.
+"""
+
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+class ActivityLogBuffer:
+    def __init__(self):
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def add(self, entry):
+        queue_size = len(self._queue)
+        if queue_size >= settings.ACTIVITY_LOG_MAX_BUFFER:
+            # The database is not keeping up; shed load rather than memory
+            logger.warning('Activity log buffer full, dropping entry')
+            return
+        self._queue.append(entry)
+        self._ensure_worker()
+        if queue_size + 1 >= settings.ACTIVITY_LOG_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='activity-log-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # The worker owns its own connection
+                close_old_connections()
+
+    def flush(self):
+        with self._flush_lock:
+            flushed = 0
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < settings.ACTIVITY_LOG_BATCH_SIZE:
+                    batch.append(self._queue.popleft())
+                try:
+                    ActivityLog.objects.bulk_create(batch)
+                except Exception:
+                    # Put the batch back and retry on the next cycle
+                    logger.exception('Activity log flush failed, re-buffering %d entries', len(batch))
+                    self._queue.extendleft(reversed(batch))
+                    break
+                flushed += len(batch)
+            return flushed
+
+def client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityLogBuffer()
+                atexit.register(_buffer.flush)
+    return _buffer
+
+def log_action(user, action, description='', request=None, **metadata):
+    """
+    Queue an ActivityLog entry for ``user``. ``request`` fills in the client
+    address and user agent; keyword arguments are stored as metadata.
+    """
+    entry = ActivityLog(
+        user_id=getattr(user, 'pk', user),
+        action=action,
+        description=description,
+        metadata=metadata,
+        created_at=timezone.now(),
+    )
+    if request is not None:
+        entry.ip_address = client_ip(request)
+        entry.user_agent = request.META.get('HTTP_USER_AGENT', '')
+    get_buffer().add(entry)
+
+def flush():
+    return get_buffer().flush()
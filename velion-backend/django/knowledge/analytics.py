@@ -0,0 +1,100 @@
+from django.db.models import Q, Count, Sum
+from django.utils import timezone
+from datetime import timedelta
+
+from .models import DailyDocumentStats, DailyUserActivity, DailyValidationStats
+
+TIMEFRAME_DAYS = {
+    '7days': 7,
+    '30days': 30,
+    '90days': 90,
+    'year': 365,
+}
+
+def get_timeframe_range(timeframe, end_date=None):
+    end_date = end_date or timezone.now()
+    days = TIMEFRAME_DAYS.get(timeframe, TIMEFRAME_DAYS['7days'])
+    return end_date - timedelta(days=days), end_date
+
+def get_date_buckets(start_date, end_date):
+    # One bucket per calendar day, both ends inclusive
+    start_day = timezone.localdate(start_date)
+    end_day = timezone.localdate(end_date)
+    return [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+
+def _day_range(start_date, end_date):
+    return Q(
+        date__gte=timezone.localdate(start_date),
+        date__lte=timezone.localdate(end_date)
+    )
+
+def get_document_totals(start_date, end_date):
+    # Total, current/previous period counts and average quality in one round trip
+    period = timedelta(days=(end_date - start_date).days)
+    previous_period_end = start_date - period
+    previous_period_start = previous_period_end - period
+
+    totals = DailyDocumentStats.objects.aggregate(
+        total=Sum('document_count'),
+        current_period=Sum('document_count', filter=_day_range(start_date, end_date)),
+        previous_period=Sum('document_count', filter=_day_range(
+            previous_period_start, previous_period_end
+        )),
+        quality_sum=Sum('quality_sum'),
+        quality_count=Sum('quality_count'),
+    )
+
+    quality_count = totals.pop('quality_count') or 0
+    quality_sum = totals.pop('quality_sum') or 0
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['avg_quality'] = quality_sum / quality_count if quality_count else None
+    return totals
+
+def get_active_user_count(since):
+    return DailyUserActivity.objects.filter(
+        date__gte=timezone.localdate(since)
+    ).values('person').distinct().count()
+
+def get_activity_trend(start_date, end_date):
+    # One grouped query per rollup table, gaps filled in Python
+    day_range = _day_range(start_date, end_date)
+    documents = {
+        row['date']: row
+        for row in DailyDocumentStats.objects.filter(day_range).values('date').annotate(
+            count=Sum('document_count'),
+            quality_sum=Sum('quality_sum'),
+            quality_count=Sum('quality_count'),
+        ).order_by()
+    }
+    users = {
+        row['date']: row['count']
+        for row in DailyUserActivity.objects.filter(day_range).values('date').annotate(
+            count=Count('id'),
+        ).order_by()
+    }
+
+    trend = []
+    for day in get_date_buckets(start_date, end_date):
+        document_row = documents.get(day, {})
+        quality_count = document_row.get('quality_count') or 0
+        trend.append({
+            'date': day.isoformat(),
+            'documents': document_row.get('count', 0),
+            'users': users.get(day, 0),
+            'quality': document_row['quality_sum'] / quality_count if quality_count else 0,
+        })
+    return trend
+
+def get_document_type_distribution():
+    return list(
+        DailyDocumentStats.objects.values('document_type').annotate(
+            count=Sum('document_count')
+        ).filter(count__gt=0).order_by('-count')
+    )
+
+def get_validation_outcomes(start_date, end_date):
+    return list(
+        DailyValidationStats.objects.filter(_day_range(start_date, end_date)).values(
+            'action'
+        ).annotate(count=Sum('count')).order_by('-count')
+    )
@@ -0,0 +1,249 @@
+"""
+Merkle-batched blockchain anchoring of document content hashes.
+
+Instead of one transaction per document, unanchored documents are grouped
+into a batch, hashed into a Merkle tree, and only the root is written to
+the chain. Each document keeps its inclusion proof (the sibling hashes on
+its path to the root), so verifying it later takes O(log n) hashes and one
+chain lookup.
+
+Leaves and inner nodes are hashed with different prefixes, and an odd node
+is promoted to the next level rather than paired with itself, so a proof
+cannot be replayed for a different tree shape.
+"""
+
+import hashlib
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Document, AnchorBatch, DocumentAnchor, SimulatedBlock
+
+logger = logging.getLogger(__name__)
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+def leaf_hash(document_id, content_hash):
+    # Bind the content to the document it was uploaded as
+    return hashlib.sha256(
+        LEAF_PREFIX + str(document_id).encode('utf-8') + b':' + content_hash.encode('utf-8')
+    ).digest()
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def build_levels(leaves):
+    """Return every level of the tree, leaves first and the root last."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def inclusion_proof(levels, index):
+    """Sibling hashes from leaf ``index`` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append([level[sibling].hex(), 'L' if sibling < index else 'R'])
+        index //= 2
+    return proof
+
+def verify_proof(leaf, proof, root):
+    node = leaf
+    for sibling, side in proof:
+        sibling = bytes.fromhex(sibling)
+        node = node_hash(sibling, node) if side == 'L' else node_hash(node, sibling)
+    return node.hex() == root
+
+class AnchorReceipt:
+    def __init__(self, transaction_hash, block_number, network):
+        self.transaction_hash = transaction_hash
+        self.block_number = block_number
+        self.network = network
+
+class ChainClient:
+    network = 'CUSTOM'
+
+    def anchor(self, root):
+        """Write ``root`` (hex) to the chain and return an AnchorReceipt."""
+        raise NotImplementedError
+
+    def is_anchored(self, transaction_hash, root):
+        """Whether ``transaction_hash`` recorded ``root`` on the chain."""
+        raise NotImplementedError
+
+class SimulatedLedger(ChainClient):
+    """
+    A local hash-chained ledger, for development and tests. Blocks are
+    stored in the database, so a root anchored by the worker verifies in
+    the web process.
+    """
+    network = 'CUSTOM'
+
+    def anchor(self, root):
+        with transaction.atomic():
+            # The latest block is locked so each block chains onto the one before
+            previous = SimulatedBlock.objects.select_for_update().order_by('-id').first()
+            previous_hash = previous.block_hash if previous else '0' * 64
+            block = SimulatedBlock.objects.create(
+                block_hash=hashlib.sha256(f'{previous_hash}{root}'.encode('utf-8')).hexdigest(),
+                merkle_root=root,
+                transaction_hash='0x' + uuid.uuid4().hex + uuid.uuid4().hex,
+            )
+        return AnchorReceipt(block.transaction_hash, block.pk, self.network)
+
+    def is_anchored(self, transaction_hash, root):
+        return SimulatedBlock.objects.filter(transaction_hash=transaction_hash, merkle_root=root).exists()
+
+def get_chain_client():
+    return import_string(settings.ANCHOR_CHAIN_CLIENT)()
+
+def create_batch(max_size=None, network=ChainClient.network):
+    """
+    Put up to ``max_size`` unanchored documents into a new batch and store
+    their proofs. Returns the batch, or None when nothing is pending.
+    """
+    max_size = max_size or settings.ANCHOR_BATCH_MAX_SIZE
+    with transaction.atomic():
+        # Concurrent schedulers take disjoint sets of documents
+        pending = list(
+            Document.objects.filter(anchors__isnull=True).exclude(content_hash='')
+            .order_by('created_at').select_for_update(skip_locked=True, of=('self',))
+            .values_list('id', 'content_hash')[:max_size]
+        )
+        if not pending:
+            return None
+
+        levels = build_levels(leaf_hash(pk, content_hash) for pk, content_hash in pending)
+        batch = AnchorBatch.objects.create(
+            merkle_root=levels[-1][0].hex(),
+            leaf_count=len(pending),
+            network=network,
+        )
+        DocumentAnchor.objects.bulk_create([
+            DocumentAnchor(
+                document_id=pk,
+                batch=batch,
+                content_hash=content_hash,
+                leaf_index=index,
+                proof=inclusion_proof(levels, index),
+            )
+            for index, (pk, content_hash) in enumerate(pending)
+        ], batch_size=1000)
+    return batch
+
+def mark_submitting(batch):
+    batch.status = 'SUBMITTING'
+    batch.attempts += 1
+    batch.submitted_at = timezone.now()
+    batch.save(update_fields=['status', 'attempts', 'submitted_at'])
+
+def claim_batch(exclude=()):
+    """
+    Mark the oldest batch due for a retry SUBMITTING and commit, so other
+    runs leave it alone while its chain call is in flight.
+    """
+    # A run that died mid-call may have anchored the root already; anchoring
+    # it again only costs a transaction, the stored proofs hold either way
+    abandoned = timezone.now() - timedelta(seconds=settings.ANCHOR_SUBMIT_TIMEOUT)
+    with transaction.atomic():
+        batch = (
+            AnchorBatch.objects.filter(
+                Q(status__in=['PENDING', 'FAILED']) | Q(status='SUBMITTING', submitted_at__lt=abandoned)
+            ).exclude(pk__in=exclude)
+            .order_by('created_at').select_for_update(skip_locked=True).first()
+        )
+        if batch is not None:
+            mark_submitting(batch)
+    return batch
+
+def submit_batch(batch, client):
+    """
+    Anchor a claimed batch's root; a failed batch is retried on the next
+    run. Called outside any transaction: the chain call can take a while,
+    and no row lock or connection should wait on it.
+    """
+    try:
+        receipt = client.anchor(batch.merkle_root)
+    except Exception:
+        logger.exception('Anchoring batch %s failed', batch.pk)
+        batch.status = 'FAILED'
+        batch.save(update_fields=['status'])
+        return False
+
+    with transaction.atomic():
+        batch.transaction_hash = receipt.transaction_hash
+        batch.block_number = receipt.block_number
+        batch.network = receipt.network
+        batch.status = 'CONFIRMED'
+        batch.anchored_at = timezone.now()
+        batch.save()
+        Document.objects.filter(anchors__batch=batch).update(
+            blockchain_tx_id=receipt.transaction_hash
+        )
+    return True
+
+def anchor_pending(client=None, max_size=None):
+    """Retry failed batches, then anchor new batches until nothing is pending."""
+    client = client or get_chain_client()
+    anchored = 0
+    retried = set()
+    while True:
+        batch = claim_batch(exclude=retried)
+        if batch is None:
+            break
+        retried.add(batch.pk)
+        if submit_batch(batch, client):
+            anchored += batch.leaf_count
+    while True:
+        # A new batch commits already SUBMITTING, so no other run takes it
+        with transaction.atomic():
+            batch = create_batch(max_size, client.network)
+            if batch is None:
+                return anchored
+            mark_submitting(batch)
+        if not submit_batch(batch, client):
+            return anchored
+        anchored += batch.leaf_count
+
+def verify_document(document, client=None):
+    """
+    Check ``document`` against its latest anchored root: the leaf is
+    rebuilt from the document's current content hash and walked up its
+    stored proof, then the root is looked up on the chain.
+    """
+    anchor = DocumentAnchor.objects.select_related('batch').filter(
+        document=document, batch__status='CONFIRMED'
+    ).first()
+    if anchor is None:
+        return None
+
+    batch = anchor.batch
+    leaf = leaf_hash(document.pk, document.content_hash)
+    in_tree = verify_proof(leaf, anchor.proof, batch.merkle_root)
+    client = client or get_chain_client()
+    on_chain = client.is_anchored(batch.transaction_hash, batch.merkle_root)
+    return {
+        'verified': in_tree and on_chain,
+        'content_matches': in_tree,
+        'root_on_chain': on_chain,
+        'merkle_root': batch.merkle_root,
+        'leaf_index': anchor.leaf_index,
+        'proof': anchor.proof,
+        'transaction_hash': batch.transaction_hash,
+        'block_number': batch.block_number,
+        'network': batch.network,
+        'anchored_at': batch.anchored_at,
+    }
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+class KnowledgeConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'knowledge'
+    
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,13 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+class ActivityJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that records the user's activity on every
+    authenticated request. Recording is throttled and written in batches
+    (see knowledge.activity), so this costs no query per request.
+    """
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            result[0].record_activity()
+        return result
@@ -0,0 +1,259 @@
+"""
+Endpoint benchmarks.
+
+A dataset of configurable size is seeded with bulk inserts, each endpoint
+is requested through the DRF test client, and its p50/p95 latency, query
+count and peak Python memory are compared with a committed baseline.
+Timed requests run without instrumentation; queries and memory come from
+one extra request under ``CaptureQueriesContext`` and ``tracemalloc``.
+The response cache is cleared before every request, so the numbers are
+for uncached responses.
+
+Latencies depend on the machine, so a baseline is only meaningful for the
+machine that recorded it; query counts are exact everywhere.
+"""
+
+import json
+import math
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from . import rollups, testing
+from .models import (
+    Document, Person, Project, ValidationActivity, Workspace, WorkspaceMembership
+)
+from .search import document_search_vector
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+DATASETS = {
+    'small': {'people': 200, 'documents': 5000, 'projects': 50, 'workspaces': 20, 'validations': 2000},
+    'medium': {'people': 2000, 'documents': 50000, 'projects': 500, 'workspaces': 200, 'validations': 20000},
+    'large': {'people': 10000, 'documents': 200000, 'projects': 2000, 'workspaces': 1000, 'validations': 80000},
+}
+
+# name -> (method, url, data)
+ENDPOINTS = {
+    'documents.list': ('get', '/api/documents/', None),
+    'documents.list_by_workspace': ('get', '/api/documents/?workspace={workspace}&status=PUBLISHED', None),
+    'documents.search': ('post', '/api/documents/search/', {'query': 'pipeline migration'}),
+    'documents.search_filtered': ('post', '/api/documents/search/', {
+        'tags': ['finance'], 'document_type': ['REPORT', 'PROPOSAL'], 'quality_min': 50, 'sort_by': 'date',
+    }),
+    'documents.pending_validations': ('get', '/api/documents/pending_validations/', None),
+    'documents.recent': ('get', '/api/documents/recent/', None),
+    'projects.list': ('get', '/api/projects/', None),
+    'workspaces.list': ('get', '/api/workspaces/', None),
+    'workspaces.activity': ('get', '/api/workspaces/{workspace}/activity/', None),
+    'users.list': ('get', '/api/users/', None),
+    'validations.list': ('get', '/api/validations/', None),
+    'analytics.dashboard': ('get', '/api/analytics/dashboard/?timeframe=30days', None),
+    'analytics.skill_gap': ('get', '/api/analytics/skill_gap/', None),
+}
+
+# metric -> (ratio, absolute slack): a result regresses above baseline * ratio + slack
+TOLERANCES = {
+    'p50_ms': (1.5, 5.0),
+    'p95_ms': (2.5, 25.0),  # tail latency is noisy over a few dozen requests
+    'queries': (1.0, 0),
+    'peak_memory_kb': (1.5, 256),
+}
+
+WORDS = (
+    'data platform reporting pipeline finance operations migration legacy systems monitoring '
+    'incidents stakeholders proposal architecture documentation onboarding quarterly analysis '
+    'growth subsidiaries contract research guideline template client delivery review'
+).split()
+SKILLS = (
+    'python', 'django', 'sql', 'finance', 'analytics', 'design', 'security', 'cloud',
+    'negotiation', 'research', 'writing', 'compliance', 'machine-learning', 'devops',
+)
+DEPARTMENTS = ('Consulting', 'Finance', 'Engineering', 'Research', 'Operations')
+REGIONS = ('EMEA', 'APAC', 'AMER')
+BATCH_SIZE = 5000
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+def seed(sizes, seed=0):
+    """
+    Fill an empty database with ``sizes`` (see ``DATASETS``) worth of rows
+    and return the administrator the benchmarks authenticate as.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    admin = Person.objects.create_user(
+        email='benchmark-admin@example.com', password=None, employee_id='BENCH-ADMIN',
+        first_name='Benchmark', last_name='Admin', role='ADMIN', is_staff=True
+    )
+    people = Person.objects.bulk_create([
+        Person(
+            email=f'person{i}@example.com', employee_id=f'BENCH-{i:06d}', password='!',
+            first_name=rng.choice(WORDS).title(), last_name=rng.choice(WORDS).title(),
+            department=rng.choice(DEPARTMENTS), region=rng.choice(REGIONS),
+            skills=rng.sample(SKILLS, rng.randint(1, 5)),
+            expertise_level=rng.choice(('JUNIOR', 'INTERMEDIATE', 'SENIOR', 'LEAD')),
+            last_activity=now - timedelta(days=rng.randint(0, 60)),
+        )
+        for i in range(sizes['people'])
+    ], batch_size=BATCH_SIZE) + [admin]
+
+    workspaces = Workspace.objects.bulk_create([
+        Workspace(
+            name=f'Workspace {i}', workspace_type=rng.choice(('PROJECT', 'DEPARTMENT', 'INTEREST', 'CLIENT')),
+            created_by=rng.choice(people), is_private=rng.random() < 0.3, tags=rng.sample(SKILLS, 2),
+        )
+        for i in range(sizes['workspaces'])
+    ])
+    memberships = {
+        (workspace.pk, person.pk): WorkspaceMembership(workspace=workspace, person=person)
+        for workspace in workspaces
+        for person in rng.sample(people, min(len(people), 10))
+    }
+    WorkspaceMembership.objects.bulk_create(memberships.values(), batch_size=BATCH_SIZE)
+
+    statuses = [choice for choice, _ in Document.STATUS_CHOICES]
+    types = [choice for choice, _ in Document.TYPE_CHOICES]
+    for start in range(0, sizes['documents'], BATCH_SIZE):
+        Document.objects.bulk_create([
+            Document(
+                title=_words(rng, 6).capitalize(), description=_words(rng, 40),
+                content_hash=f'{i:064x}', uploader=rng.choice(people),
+                status=rng.choices(statuses, weights=(2, 1, 1, 1, 6, 1, 1))[0],
+                document_type=rng.choice(types), quality_score=round(rng.uniform(0, 100), 1),
+                tags=rng.sample(SKILLS, rng.randint(1, 4)), file_url=f'https://files.example.com/{i}.pdf',
+                file_size=rng.randint(10_000, 10_000_000), file_type='pdf',
+                workspace=rng.choice(workspaces) if workspaces and rng.random() < 0.7 else None,
+                view_count=rng.randint(0, 500),
+            )
+            for i in range(start, min(start + BATCH_SIZE, sizes['documents']))
+        ])
+    with connection.cursor() as cursor:
+        # created_at is auto_now_add; spread it over the last year
+        cursor.execute(
+            f'UPDATE "{Document._meta.db_table}" '
+            f"SET created_at = now() - random() * interval '365 days', "
+            f"published_at = CASE WHEN status = 'PUBLISHED' THEN now() END"
+        )
+    Document.objects.update(search_vector=document_search_vector())
+
+    document_ids = list(Document.objects.values_list('pk', flat=True))
+    projects = Project.objects.bulk_create([
+        Project(
+            name=f'Project {i}', description=_words(rng, 20),
+            start_date=date.today() - timedelta(days=rng.randint(0, 365)),
+            status=rng.choice(('PLANNING', 'ACTIVE', 'ON_HOLD', 'COMPLETED')),
+            created_by=rng.choice(people), tags=rng.sample(SKILLS, rng.randint(1, 4)),
+        )
+        for i in range(sizes['projects'])
+    ])
+    Project.team_members.through.objects.bulk_create([
+        Project.team_members.through(project_id=project.pk, person_id=person.pk)
+        for project in projects
+        for person in rng.sample(people, min(len(people), 8))
+    ], batch_size=BATCH_SIZE)
+    if document_ids:
+        Project.documents.through.objects.bulk_create([
+            Project.documents.through(project_id=project.pk, document_id=document_id)
+            for project in projects
+            for document_id in rng.sample(document_ids, min(len(document_ids), 20))
+        ], batch_size=BATCH_SIZE)
+
+    actions = [choice for choice, _ in ValidationActivity.ACTION_CHOICES]
+    if document_ids:
+        ValidationActivity.objects.bulk_create([
+            ValidationActivity(
+                document_id=rng.choice(document_ids), validator=rng.choice(people),
+                action=rng.choice(actions), previous_status='PENDING_REVIEW', new_status='PUBLISHED',
+            )
+            for _ in range(sizes['validations'])
+        ], batch_size=BATCH_SIZE)
+
+    # Bulk inserts skip the signals that keep the rollups current
+    rollups.backfill_document_stats()
+    rollups.backfill_user_activity()
+    rollups.backfill_validation_stats()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return admin
+
+def percentile(values, pct):
+    # Nearest rank
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def measure(client, method, url, data=None, iterations=30, warmup=3):
+    """Latency percentiles, query count and peak memory of one endpoint."""
+    extra = {'format': 'json'} if data is not None else {}
+    for _ in range(warmup):
+        cache.clear()
+        response = getattr(client, method)(url, data, **extra)
+        if response.status_code >= 400:
+            raise AssertionError(f'{method.upper()} {url} returned {response.status_code}')
+
+    timings = []
+    for _ in range(iterations):
+        cache.clear()
+        started = time.perf_counter()
+        getattr(client, method)(url, data, **extra)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        _, queries = testing.count_queries(client, method, url, data, **extra)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+def run(client, endpoints=None, iterations=30, warmup=3):
+    """``{endpoint name: metrics}`` for ``endpoints`` (default all)."""
+    workspace = Document.objects.filter(workspace__isnull=False).values_list('workspace_id', flat=True).first()
+    results = {}
+    for name in endpoints or ENDPOINTS:
+        method, url, data = ENDPOINTS[name]
+        results[name] = measure(client, method, url.format(workspace=workspace), data, iterations, warmup)
+    return results
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def compare(results, baseline, tolerances=TOLERANCES):
+    """
+    ``[(endpoint, metric, value, limit)]`` for every result above its
+    baseline plus tolerance. Endpoints without a baseline are skipped.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric, (ratio, slack) in tolerances.items():
+            if metric not in expected:
+                continue
+            limit = expected[metric] * ratio + slack
+            if metrics[metric] > limit:
+                regressions.append((name, metric, metrics[metric], round(limit, 2)))
+    return regressions
@@ -0,0 +1,117 @@
+"""
+Versioned response caching for read-heavy endpoints.
+
+Each cached endpoint declares the resources it reads. Every resource has a
+version number in the cache that model signals bump on write, so a write
+invalidates every dependent response without enumerating keys.
+"""
+
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'dkn:version:{}'
+LOCK_TIMEOUT = 10  # seconds a rebuild may hold the lock
+LOCK_WAIT = 2.0  # seconds a request waits for a concurrent rebuild
+LOCK_POLL_INTERVAL = 0.05
+STALE_GRACE = 60  # seconds an expired entry may still be served during a rebuild
+
+def get_versions(resources):
+    keys = [VERSION_KEY.format(resource) for resource in resources]
+    versions = cache.get_many(keys)
+    return [versions.get(key, 0) for key in keys]
+
+def bump_version(resource):
+    key = VERSION_KEY.format(resource)
+    # add() is a no-op when the key exists, incr() is atomic on shared backends
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+def bump_version_on_commit(resource):
+    # Readers must not cache pre-commit data under the new version
+    transaction.on_commit(lambda: bump_version(resource))
+
+def visibility_scope(request, per_user):
+    if not per_user:
+        return 'all'
+    user = request.user
+    if getattr(user, 'role', None) == 'ADMIN':
+        return 'admin'
+    return f'user:{user.pk}'
+
+def build_cache_key(name, request, resources, per_user):
+    versions = '.'.join(str(version) for version in get_versions(resources))
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'dkn:response:{name}:{versions}:{visibility_scope(request, per_user)}:{path}'
+
+def get_or_build(key, build, timeout):
+    """
+    Return the cached value for ``key`` or build it, letting only one caller
+    rebuild at a time. Entries are kept ``STALE_GRACE`` seconds past their
+    soft expiry so other callers can serve the stale copy meanwhile.
+    """
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time.time():
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, {'value': value, 'expires': time.time() + timeout}, timeout + STALE_GRACE)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry['value']
+
+    # No stale copy: wait briefly for the rebuild, then build ourselves
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+    return build()
+
+class UncacheableResponse(Exception):
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+def cached_response(resources, timeout=60, per_user=False):
+    """
+    Cache a viewset handler's successful response data.
+
+    ``resources`` are the version keys the response depends on, and
+    ``per_user`` scopes entries to the requesting user for endpoints whose
+    results depend on visibility. Permission checks run before the handler,
+    so they are never bypassed.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            name = f'{self.__class__.__name__}.{handler.__name__}'
+            key = build_cache_key(name, request, resources, per_user)
+
+            def build():
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    raise UncacheableResponse(response)
+                return response.data
+
+            try:
+                return Response(get_or_build(key, build, timeout))
+            except UncacheableResponse as error:
+                return error.response
+        return wrapper
+    return decorator
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends that keep entries inside the process that wrote them
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # Graph change events (graph.py) reach other processes through the cache
+    if settings.CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            'The default cache is local to each process, so graph changes made in one '
+            'worker never reach the others until the next graph snapshot.',
+            hint='Set REDIS_URL to use a shared cache.',
+            id='knowledge.W001',
+        )]
+    return []
@@ -0,0 +1,183 @@
+"""
+Write-buffered view/download counters for documents.
+
+Increments accumulate in Redis (when ``REDIS_URL`` is set) or in a
+per-process buffer, and are flushed as batched ``F()`` updates.
+"""
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('view_count', 'download_count')
+
+class LocalCounterBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: defaultdict(int))
+
+    def add(self, pk, field, amount):
+        with self._lock:
+            self._pending[str(pk)][field] += amount
+
+    def pending(self, pks):
+        with self._lock:
+            return {
+                str(pk): dict(self._pending[str(pk)])
+                for pk in pks if str(pk) in self._pending
+            }
+
+    def drain(self):
+        with self._lock:
+            drained, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        return {pk: dict(fields) for pk, fields in drained.items()}
+
+class RedisCounterBuffer:
+    key = 'dkn:counters:pending'
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, pk, field, amount):
+        self.client.hincrby(self.key, f'{pk}:{field}', amount)
+
+    def pending(self, pks):
+        names = [f'{pk}:{field}' for pk in pks for field in COUNTER_FIELDS]
+        if not names:
+            return {}
+        result = defaultdict(dict)
+        for name, value in zip(names, self.client.hmget(self.key, names)):
+            if value is not None:
+                pk, field = name.rsplit(':', 1)
+                result[pk][field] = int(value)
+        return dict(result)
+
+    def drain(self):
+        # Renaming hands the current hash to exactly one flusher
+        processing_key = f'{self.key}:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(self.key, processing_key)
+        except redis.ResponseError:
+            return {}  # Nothing pending
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(processing_key)
+        pipeline.delete(processing_key)
+        values, _ = pipeline.execute()
+
+        drained = defaultdict(dict)
+        for name, value in values.items():
+            pk, field = name.decode('utf-8').rsplit(':', 1)
+            drained[pk][field] = int(value)
+        return dict(drained)
+
+class CounterStore:
+    def __init__(self):
+        self.local = LocalCounterBuffer()
+        self.remote = None
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+        redis_url = getattr(settings, 'REDIS_URL', None)
+        if redis_url:
+            self.remote = RedisCounterBuffer(redis.Redis.from_url(redis_url))
+
+    @property
+    def buffers(self):
+        return [buffer for buffer in (self.remote, self.local) if buffer is not None]
+
+    def increment(self, pk, field, amount=1):
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f'Unknown counter field: {field}')
+        try:
+            (self.remote or self.local).add(pk, field, amount)
+        except redis.RedisError:
+            # Redis is unreachable, keep the increment in this process
+            logger.warning('Counter buffer unavailable, buffering locally', exc_info=True)
+            self.local.add(pk, field, amount)
+
+        if time.monotonic() - self._last_flush >= settings.COUNTER_FLUSH_INTERVAL:
+            self.flush()
+
+    def pending(self, pks):
+        merged = defaultdict(lambda: defaultdict(int))
+        for buffer in self.buffers:
+            try:
+                for pk, fields in buffer.pending(pks).items():
+                    for field, amount in fields.items():
+                        merged[pk][field] += amount
+            except redis.RedisError:
+                logger.warning('Could not read pending counters', exc_info=True)
+        return merged
+
+    def flush(self):
+        if not self._flush_lock.acquire(blocking=False):
+            return 0  # Another thread is already flushing
+        try:
+            self._last_flush = time.monotonic()
+            flushed = 0
+            for buffer in self.buffers:
+                try:
+                    deltas = buffer.drain()
+                except redis.RedisError:
+                    logger.warning('Could not drain counter buffer', exc_info=True)
+                    continue
+                try:
+                    flushed += apply_counter_deltas(deltas)
+                except Exception:
+                    # Keep the increments for the next flush
+                    logger.exception('Counter flush failed, re-buffering deltas')
+                    for pk, fields in deltas.items():
+                        for field, amount in fields.items():
+                            self.local.add(pk, field, amount)
+            return flushed
+        finally:
+            self._flush_lock.release()
+
+def apply_counter_deltas(deltas):
+    # Documents with identical deltas share one UPDATE
+    groups = defaultdict(list)
+    for pk, fields in deltas.items():
+        key = tuple(fields.get(field, 0) for field in COUNTER_FIELDS)
+        if any(key):
+            groups[key].append(pk)
+
+    with transaction.atomic():
+        for key, pks in groups.items():
+            Document.objects.filter(pk__in=pks).update(**{
+                field: F(field) + amount
+                for field, amount in zip(COUNTER_FIELDS, key) if amount
+            })
+    return len(deltas)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CounterStore()
+                atexit.register(_store.flush)
+    return _store
+
+def increment(pk, field, amount=1):
+    get_store().increment(pk, field, amount)
+
+def pending(pks):
+    return get_store().pending(pks)
+
+def flush():
+    return get_store().flush()
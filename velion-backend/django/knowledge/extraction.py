@@ -0,0 +1,222 @@
+"""
+Asynchronous knowledge extraction into KnowledgeComponent.
+
+Saving a document (or importing a batch) marks its component PENDING and
+queues ``knowledge.tasks.extract_knowledge`` once the transaction commits,
+so uploads never wait for analysis. The task reads the document text in
+the Celery worker and hands the CPU-bound analysis to a process pool (see
+``knowledge.text_analysis``).
+
+Every stage records the version and the input fingerprint it ran with in
+``extraction_stages``; a stage whose version and input are unchanged is
+skipped, so redelivered or duplicate tasks are cheap and re-processing
+after an algorithm change only recomputes the stages that changed.
+
+The pool cannot be started from a daemonic process (Celery's default
+prefork pool), where analysis runs inline instead; run the extraction
+queue with ``celery -A dkn worker -Q extraction --pool threads`` to use it.
+"""
+
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
+from . import text_analysis, uploads
+from .models import Document, KnowledgeComponent
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILE_TYPES = ('application/json', 'application/xml', 'application/x-ndjson')
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv', '.json', '.xml', '.html', '.htm', '.rst')
+EXTRACTED_FIELDS = (
+    'summary', 'key_topics', 'entities', 'sentiment_score', 'complexity_score', 'readability_score'
+)
+CORPUS_CHUNK_SIZE = 500
+
+# Failures worth retrying: the database or storage went away, or a pool
+# process died
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError, BrokenProcessPool)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """The per-process analysis pool, or None to analyse inline."""
+    global _executor
+    if settings.EXTRACTION_PROCESSES <= 0 or multiprocessing.current_process().daemon:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: forking a threaded worker can deadlock its children
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.EXTRACTION_PROCESSES,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                atexit.register(_executor.shutdown)
+    return _executor
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+def analyze(text, stage_names):
+    executor = get_executor()
+    if executor is None:
+        return text_analysis.analyze(text, stage_names)
+    try:
+        return executor.submit(text_analysis.analyze, text, stage_names).result()
+    except BrokenProcessPool:
+        reset_executor()
+        raise
+
+def _is_text_file(document, name):
+    file_type = (document.file_type or '').lower()
+    return (
+        file_type.startswith('text/') or file_type in TEXT_FILE_TYPES
+        or name.lower().endswith(TEXT_EXTENSIONS)
+    )
+
+def document_text(document):
+    """
+    Title, description and tags, plus the stored file when it is text.
+    Binary formats are not parsed; their metadata is analysed on its own.
+    """
+    parts = [document.title, document.description, ' '.join(document.tags)]
+    if document.content_hash:
+        name = uploads.storage_name(document.content_hash, urlparse(document.file_url).path)
+        if _is_text_file(document, name) and default_storage.exists(name):
+            with default_storage.open(name, 'rb') as stored:
+                parts.append(stored.read(settings.EXTRACTION_MAX_BYTES).decode('utf-8', errors='replace'))
+    return '\n\n'.join(part for part in parts if part)
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def stale_stages(component, input_fingerprint, force=False):
+    stages = component.extraction_stages or {}
+    return [
+        name for name, version in text_analysis.stage_versions().items()
+        if force or stages.get(name) != {'version': version, 'input': input_fingerprint}
+    ]
+
+def process_document(document_id, force=False):
+    """
+    Run the stale extraction stages for one document and return their
+    names. Raises on failure; the task decides whether to retry.
+    """
+    with transaction.atomic():
+        component = KnowledgeComponent.objects.select_for_update().select_related('document').filter(
+            document_id=document_id
+        ).first()
+        if component is None:
+            # Deleted since it was queued
+            return []
+        component.extraction_status = 'PROCESSING'
+        component.extraction_attempts += 1
+        component.save(update_fields=['extraction_status', 'extraction_attempts', 'updated_at'])
+
+    text = document_text(component.document)
+    input_fingerprint = fingerprint(text)
+    stages = stale_stages(component, input_fingerprint, force)
+    results = analyze(text, stages) if stages else {}
+
+    versions = text_analysis.stage_versions()
+    for field, value in results.items():
+        setattr(component, field, value)
+    component.extraction_stages = {
+        **(component.extraction_stages or {}),
+        **{name: {'version': versions[name], 'input': input_fingerprint} for name in stages},
+    }
+    component.extraction_status = 'COMPLETED'
+    component.extraction_error = ''
+    component.extracted_at = timezone.now()
+    component.save(update_fields=[
+        *results, 'extraction_stages', 'extraction_status', 'extraction_error',
+        'extracted_at', 'updated_at'
+    ])
+    return stages
+
+def mark_failed(document_id, error):
+    KnowledgeComponent.objects.filter(document_id=document_id).update(
+        extraction_status='FAILED',
+        extraction_error=str(error)[:2000],
+        updated_at=timezone.now(),
+    )
+
+def request_extraction(document_ids, force=False):
+    """
+    Mark the components of ``document_ids`` PENDING (creating missing ones)
+    and queue one task per document after the transaction commits.
+    """
+    document_ids = list(document_ids)
+    if not document_ids:
+        return 0
+    KnowledgeComponent.objects.bulk_create(
+        [KnowledgeComponent(document_id=pk) for pk in document_ids],
+        ignore_conflicts=True,
+    )
+    KnowledgeComponent.objects.filter(document_id__in=document_ids).update(
+        extraction_status='PENDING', updated_at=timezone.now()
+    )
+
+    def enqueue():
+        from .tasks import enqueue, extract_knowledge
+
+        for pk in document_ids:
+            enqueue(extract_knowledge, str(pk), force=force)
+
+    transaction.on_commit(enqueue)
+    return len(document_ids)
+
+def corpus_document_ids(stale_only=True):
+    """
+    Document ids to re-process: every document, or with ``stale_only`` the
+    ones without a completed extraction at the current stage versions.
+    """
+    documents = Document.objects.all()
+    if stale_only:
+        # jsonb containment matches the version and ignores the input fingerprint
+        current = {name: {'version': version} for name, version in text_analysis.stage_versions().items()}
+        documents = documents.exclude(
+            knowledge_component__extraction_status='COMPLETED',
+            knowledge_component__extraction_stages__contains=current,
+        )
+    return documents.order_by('pk').values_list('pk', flat=True)
+
+def request_corpus_extraction(stale_only=True, force=False, chunk_size=CORPUS_CHUNK_SIZE):
+    """Queue the corpus in chunks; workers process it in parallel."""
+    queued = 0
+    chunk = []
+    for pk in corpus_document_ids(stale_only).iterator(chunk_size=chunk_size):
+        chunk.append(pk)
+        if len(chunk) >= chunk_size:
+            with transaction.atomic():
+                queued += request_extraction(chunk, force)
+            chunk = []
+    if chunk:
+        with transaction.atomic():
+            queued += request_extraction(chunk, force)
+    return queued
+
+# Signal helpers (see signals.py)
+SOURCE_FIELDS = ('title', 'description', 'tags', 'content_hash')
+
+def schedule_extraction(document, created=False, previous=None):
+    # ``previous`` is the snapshot taken when the instance was loaded
+    state = (document.title, document.description, tuple(document.tags or ()), document.content_hash)
+    if created or not previous or state != tuple(previous.get(field) for field in SOURCE_FIELDS):
+        request_extraction([document.pk])
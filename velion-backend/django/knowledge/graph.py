@@ -0,0 +1,552 @@
+"""
+In-process knowledge graph behind ``/api/graph/``.
+
+Each process keeps the Person/Document/Project/Workspace graph as CSR
+arrays (``offsets`` into flat ``targets``/``edge_types``) plus a small
+delta of edges added and removed since the last compaction. Model signals
+publish change events to the shared cache after commit (a per-process cache
+cannot carry them, see checks.py); every process replays the events it has
+not seen before answering a query.
+
+The graph itself is never loaded from the database inside a request.
+``manage.py build_graph`` or the ``rebuild_graph_snapshot`` task writes a
+snapshot under ``settings.GRAPH_SNAPSHOT_DIR``, which processes load and
+replay from. A process that has fallen too far behind, or has seen a
+``rebuild`` event, queues a fresh snapshot and picks it up once written.
+"""
+
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from array import array
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Person, Document, Project, Workspace, GraphOutbox
+
+logger = logging.getLogger(__name__)
+
+NODE_TYPES = ('person', 'document', 'project', 'workspace')
+
+# Edges are stored in both directions: +n on the source, -n on the target
+EDGE_TYPES = ('AUTHORED', 'WORKS_ON', 'INCLUDES', 'BELONGS_TO')
+AUTHORED, WORKS_ON, INCLUDES, BELONGS_TO = range(1, len(EDGE_TYPES) + 1)
+
+SEQUENCE_KEY = 'dkn:graph:sequence'
+EVENT_KEY = 'dkn:graph:event:{}'
+EVENT_TIMEOUT = 3600
+SNAPSHOT_QUEUED_KEY = 'graph:snapshot-queued'
+SNAPSHOT_FILE = 'graph.pickle'
+SNAPSHOT_RETRY_AFTER = 10  # seconds clients are asked to wait for the first snapshot
+MAX_REPLAY = 5000  # events; further behind than this, wait for a new snapshot
+COMPACT_MIN_DELTA = 1000  # delta edges before compaction is considered
+COMPACT_RATIO = 0.1  # ...and compaction happens past this share of all edges
+
+def person_label(first_name, last_name, email):
+    return f'{first_name} {last_name}'.strip() or email
+
+class KnowledgeGraph:
+    def __init__(self):
+        self.index = {}  # (node_type, id) -> node number
+        self.keys = []
+        self.labels = []
+        self.dead = set()
+        self.offsets = array('q', [0])
+        self.targets = array('q')
+        self.edge_types = array('b')
+        self.added = defaultdict(set)  # node -> {(neighbor, signed type)}
+        self.removed = set()  # (node, neighbor, signed type) hidden from the CSR arrays
+        self.delta_size = 0
+
+    # Nodes
+    def node(self, key, label=None):
+        number = self.index.get(key)
+        if number is None:
+            number = len(self.keys)
+            self.index[key] = number
+            self.keys.append(key)
+            self.labels.append(label or '')
+        else:
+            self.dead.discard(number)
+            if label is not None:
+                self.labels[number] = label
+        return number
+
+    def drop_node(self, key):
+        number = self.index.get(key)
+        if number is None:
+            return
+        for neighbor, edge_type in list(self.neighbors(number)):
+            self._remove(number, neighbor, edge_type)
+            self._remove(neighbor, number, -edge_type)
+        self.dead.add(number)
+
+    # Edges
+    def _csr_has(self, node, neighbor, edge_type):
+        if node >= len(self.offsets) - 1:
+            return False
+        for position in range(self.offsets[node], self.offsets[node + 1]):
+            if self.targets[position] == neighbor and self.edge_types[position] == edge_type:
+                return True
+        return False
+
+    def _add(self, node, neighbor, edge_type):
+        entry = (node, neighbor, edge_type)
+        if entry in self.removed:
+            self.removed.discard(entry)
+            self.delta_size -= 1
+        elif not self._csr_has(*entry) and (neighbor, edge_type) not in self.added[node]:
+            self.added[node].add((neighbor, edge_type))
+            self.delta_size += 1
+
+    def _remove(self, node, neighbor, edge_type):
+        if (neighbor, edge_type) in self.added.get(node, ()):
+            self.added[node].discard((neighbor, edge_type))
+            self.delta_size -= 1
+        elif self._csr_has(node, neighbor, edge_type) and (node, neighbor, edge_type) not in self.removed:
+            self.removed.add((node, neighbor, edge_type))
+            self.delta_size += 1
+
+    def add_edge(self, source, target, edge_type):
+        # Never revive a node through an edge: hidden documents and inactive
+        # people have no node, or a dead one
+        source, target = self.index.get(source), self.index.get(target)
+        if source is None or target is None or source in self.dead or target in self.dead:
+            return
+        self._add(source, target, edge_type)
+        self._add(target, source, -edge_type)
+
+    def remove_edge(self, source, target, edge_type):
+        source, target = self.index.get(source), self.index.get(target)
+        if source is None or target is None:
+            return
+        self._remove(source, target, edge_type)
+        self._remove(target, source, -edge_type)
+
+    def neighbors(self, node):
+        if node < len(self.offsets) - 1:
+            for position in range(self.offsets[node], self.offsets[node + 1]):
+                neighbor, edge_type = self.targets[position], self.edge_types[position]
+                if self.removed and (node, neighbor, edge_type) in self.removed:
+                    continue
+                yield neighbor, edge_type
+        yield from self.added.get(node, ())
+
+    def degree(self, node):
+        if not self.added and not self.removed and node < len(self.offsets) - 1:
+            return self.offsets[node + 1] - self.offsets[node]
+        return sum(1 for _ in self.neighbors(node))
+
+    @property
+    def edge_count(self):
+        return len(self.targets) + self.delta_size
+
+    # Compaction
+    def compact(self, edges=None):
+        """Fold the delta into fresh CSR arrays."""
+        if edges is None:
+            edges = [
+                (node, neighbor, edge_type)
+                for node in range(len(self.keys))
+                for neighbor, edge_type in self.neighbors(node)
+            ]
+        counts = [0] * (len(self.keys) + 1)
+        for node, _, _ in edges:
+            counts[node + 1] += 1
+        for node in range(len(self.keys)):
+            counts[node + 1] += counts[node]
+
+        targets = array('q', bytes(8 * len(edges)))
+        edge_types = array('b', bytes(len(edges)))
+        cursor = counts[:-1]
+        for node, neighbor, edge_type in edges:
+            position = cursor[node]
+            targets[position] = neighbor
+            edge_types[position] = edge_type
+            cursor[node] = position + 1
+
+        self.offsets = array('q', counts)
+        self.targets = targets
+        self.edge_types = edge_types
+        self.added = defaultdict(set)
+        self.removed = set()
+        self.delta_size = 0
+
+    def maybe_compact(self):
+        if self.delta_size > max(COMPACT_MIN_DELTA, COMPACT_RATIO * len(self.targets)):
+            self.compact()
+
+    # Queries
+    def describe(self, node):
+        node_type, entity_id = self.keys[node]
+        return {
+            'id': f'{node_type}:{entity_id}',
+            'entity_id': entity_id,
+            'type': node_type,
+            'label': self.labels[node],
+            'degree': self.degree(node),
+        }
+
+    def _edges_between(self, nodes):
+        edges = []
+        for node in nodes:
+            for neighbor, edge_type in self.neighbors(node):
+                # Each edge once, from its source side
+                if edge_type > 0 and neighbor in nodes:
+                    edges.append({
+                        'source': f'{self.keys[node][0]}:{self.keys[node][1]}',
+                        'target': f'{self.keys[neighbor][0]}:{self.keys[neighbor][1]}',
+                        'type': EDGE_TYPES[edge_type - 1],
+                    })
+        return edges
+
+    def neighborhood(self, key, depth, limit):
+        """Breadth-first neighborhood of ``key``, at most ``limit`` nodes."""
+        start = self.index.get(key)
+        if start is None or start in self.dead:
+            return None
+        seen = {start}
+        queue = deque([(start, 0)])
+        while queue and len(seen) < limit:
+            node, distance = queue.popleft()
+            if distance >= depth:
+                continue
+            for neighbor, _ in self.neighbors(node):
+                if neighbor in seen or neighbor in self.dead:
+                    continue
+                seen.add(neighbor)
+                if len(seen) >= limit:
+                    break
+                queue.append((neighbor, distance + 1))
+        return {
+            'nodes': [self.describe(node) for node in seen],
+            'edges': self._edges_between(seen),
+        }
+
+    def overview(self, limit):
+        """The ``limit`` best-connected nodes and the edges among them."""
+        live = (node for node in range(len(self.keys)) if node not in self.dead)
+        nodes = set(heapq.nlargest(limit, live, key=self.degree))
+        return {
+            'nodes': [self.describe(node) for node in nodes],
+            'edges': self._edges_between(nodes),
+        }
+
+    # Change events
+    def apply(self, event):
+        kind = event[0]
+        if kind == 'node':
+            self.node(event[1], event[2])
+        elif kind == 'drop':
+            self.drop_node(event[1])
+        elif kind == 'add':
+            self.add_edge(event[1], event[2], event[3])
+        elif kind == 'remove':
+            self.remove_edge(event[1], event[2], event[3])
+
+def graph_documents(queryset):
+    """
+    The documents in ``queryset`` that belong in the graph: published, and
+    not in a private workspace. The graph is shared by every user, so
+    anything narrower than that stays out of it.
+    """
+    return queryset.filter(status='PUBLISHED').filter(
+        Q(workspace__isnull=True) | Q(workspace__is_private=False)
+    )
+
+def iter_graph():
+    """
+    Yield the whole graph from the database as ``node`` and ``add`` events,
+    with one query per relation.
+    """
+    people = Person.objects.filter(is_active=True).values_list('id', 'first_name', 'last_name', 'email')
+    for pk, first_name, last_name, email in people.iterator():
+        yield ('node', ('person', str(pk)), person_label(first_name, last_name, email))
+    for pk, name in Project.objects.values_list('id', 'name').iterator():
+        yield ('node', ('project', str(pk)), name)
+
+    documents = graph_documents(Document.objects.all()).values_list('id', 'title', 'uploader_id')
+    for pk, title, uploader_id in documents.iterator():
+        yield ('node', ('document', str(pk)), title)
+        yield ('add', ('person', str(uploader_id)), ('document', str(pk)), AUTHORED)
+
+    workspaces = Workspace.objects.filter(is_private=False).values_list('id', 'name', 'project_id')
+    for pk, name, project_id in workspaces.iterator():
+        yield ('node', ('workspace', str(pk)), name)
+        if project_id:
+            yield ('add', ('workspace', str(pk)), ('project', str(project_id)), BELONGS_TO)
+
+    members = Project.team_members.through.objects.values_list('person_id', 'project_id')
+    for person_id, project_id in members.iterator():
+        yield ('add', ('person', str(person_id)), ('project', str(project_id)), WORKS_ON)
+    documents = Project.documents.through.objects.values_list('project_id', 'document_id')
+    for project_id, document_id in documents.iterator():
+        yield ('add', ('project', str(project_id)), ('document', str(document_id)), INCLUDES)
+
+def load_graph():
+    graph = KnowledgeGraph()
+    edges = []
+    for event in iter_graph():
+        if event[0] == 'node':
+            graph.node(event[1], event[2])
+            continue
+        # Skip edges to inactive people
+        source, target = graph.index.get(event[1]), graph.index.get(event[2])
+        if source is not None and target is not None:
+            edges.append((source, target, event[3]))
+            edges.append((target, source, -event[3]))
+    graph.compact(edges)
+    return graph
+
+def current_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+def publish(events):
+    """
+    Queue ``events`` for every process once the transaction commits, and
+    for the graph database sync in the current transaction.
+    """
+    if not events:
+        return
+    if settings.GRAPH_OUTBOX_ENABLED:
+        # Outside a transaction the change would already be committed, and
+        # a failure here would lose its events for good
+        if not transaction.get_connection().in_atomic_block:
+            raise transaction.TransactionManagementError(
+                'Graph events must be published in the transaction that makes the change'
+            )
+        GraphOutbox.objects.bulk_create([GraphOutbox(event=event) for event in events])
+    transaction.on_commit(lambda: _publish(events))
+
+def _publish(events):
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.set(SEQUENCE_KEY, 1, timeout=None)
+        sequence = 1
+    cache.set(EVENT_KEY.format(sequence), events, EVENT_TIMEOUT)
+
+class GraphUnavailable(Exception):
+    """No graph snapshot has been written yet."""
+
+def snapshot_path():
+    return os.path.join(settings.GRAPH_SNAPSHOT_DIR, SNAPSHOT_FILE)
+
+def write_snapshot():
+    """
+    Load the graph from the database and replace the snapshot on disk.
+    Slow on a large graph, so it runs from ``manage.py build_graph`` or a
+    task, never inside a request.
+    """
+    # Events published while loading are replayed on top; apply() is idempotent
+    sequence = current_sequence()
+    graph = load_graph()
+    os.makedirs(settings.GRAPH_SNAPSHOT_DIR, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=settings.GRAPH_SNAPSHOT_DIR, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as output:
+        pickle.dump((sequence, graph), output, protocol=pickle.HIGHEST_PROTOCOL)
+    # Replaced atomically, so readers see the old or the new snapshot
+    os.replace(temporary, snapshot_path())
+    logger.info('Knowledge graph snapshot written: %d nodes, %d edges', len(graph.keys), graph.edge_count)
+    return graph
+
+def snapshot_version():
+    path = snapshot_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # The file is replaced, never rewritten, so a new inode means a new snapshot
+    return (path, stat.st_ino, stat.st_mtime_ns)
+
+def request_snapshot():
+    # One queued build covers every process waiting for it
+    if cache.add(SNAPSHOT_QUEUED_KEY, True, timeout=300):
+        from .tasks import enqueue, rebuild_graph_snapshot
+
+        enqueue(rebuild_graph_snapshot)
+
+class GraphStore:
+    def __init__(self):
+        self.graph = None
+        self.sequence = 0
+        self.snapshot_version = None
+        self.waiting = False  # behind the event log until a newer snapshot lands
+        self._lock = threading.Lock()
+
+    def load_snapshot(self):
+        version = snapshot_version()
+        if version == self.snapshot_version:
+            return
+        self.graph, self.sequence, self.snapshot_version = None, 0, version
+        if version is None:
+            return
+        with open(version[0], 'rb') as handle:
+            self.sequence, self.graph = pickle.load(handle)
+        self.waiting = False
+
+    def wait_for_snapshot(self):
+        self.waiting = True
+        request_snapshot()
+
+    def refresh(self):
+        self.load_snapshot()
+        if self.graph is None:
+            request_snapshot()
+            # Without a broker the build ran inline, so it may be there now
+            self.load_snapshot()
+            if self.graph is None:
+                raise GraphUnavailable()
+        if self.waiting:
+            # Queued again should the last build have failed
+            request_snapshot()
+            return
+        latest = current_sequence()
+        if latest <= self.sequence:
+            return
+        if latest - self.sequence > MAX_REPLAY:
+            self.wait_for_snapshot()
+            return
+        keys = [EVENT_KEY.format(sequence) for sequence in range(self.sequence + 1, latest + 1)]
+        batches = cache.get_many(keys)
+        if len(batches) < len(keys):
+            # Some events expired before this process saw them
+            self.wait_for_snapshot()
+            return
+        events = [event for key in keys for event in batches[key]]
+        for event in events:
+            self.graph.apply(event)
+        self.sequence = latest
+        self.graph.maybe_compact()
+        if any(event[0] == 'rebuild' for event in events):
+            # Edges that came back with a reactivated person are only in the database
+            request_snapshot()
+
+    def query(self, method, *args):
+        with self._lock:
+            self.refresh()
+            return getattr(self.graph, method)(*args)
+
+_store = GraphStore()
+
+def neighborhood(node_type, entity_id, depth, limit):
+    return _store.query('neighborhood', (node_type, str(entity_id)), depth, limit)
+
+def overview(limit):
+    return _store.query('overview', limit)
+
+# Signal helpers (see signals.py)
+DOCUMENT_FIELDS = ('uploader_id', 'status', 'workspace_id')
+
+def remember_state(instance, fields):
+    # Avoid loading deferred fields, which would cost a query per instance
+    loaded = instance.__dict__
+    if all(field in loaded for field in fields):
+        instance._graph_state = tuple(loaded[field] for field in fields)
+    else:
+        instance._graph_state = None
+
+def person_events(person, created=False):
+    key = ('person', str(person.pk))
+    if not person.is_active:
+        return [('drop', key)]
+    previous = None if created else getattr(person, '_graph_state', None)
+    if previous is not None and not previous[0]:
+        # Reactivated: the dropped edges have to come back from the database
+        return [('rebuild',)]
+    return [('node', key, person_label(person.first_name, person.last_name, person.email))]
+
+def document_visible(document):
+    if document.status != 'PUBLISHED':
+        return False
+    if document.workspace_id is None:
+        return True
+    if Document.workspace.is_cached(document):
+        return not document.workspace.is_private
+    return not Workspace.objects.filter(pk=document.workspace_id, is_private=True).exists()
+
+def restore_documents(documents):
+    """Node and edge events that put ``documents`` back into the graph."""
+    events = []
+    for pk, title, uploader_id in documents.values_list('id', 'title', 'uploader_id'):
+        key = ('document', str(pk))
+        events.append(('node', key, title))
+        events.append(('add', ('person', str(uploader_id)), key, AUTHORED))
+    includes = Project.documents.through.objects.filter(document__in=documents)
+    for project_id, document_id in includes.values_list('project_id', 'document_id'):
+        events.append(('add', ('project', str(project_id)), ('document', str(document_id)), INCLUDES))
+    return events
+
+def document_events(document, created=False, previous=None):
+    """
+    Events for a saved document. ``previous`` is the field snapshot taken
+    when the instance was loaded (see signals.py).
+    """
+    key = ('document', str(document.pk))
+    previous = None if created else previous
+    if previous is not None and not all(field in previous for field in DOCUMENT_FIELDS):
+        previous = None
+    if document.status != 'PUBLISHED':
+        # A draft that never was published is not in the graph to drop
+        if created or (previous is not None and previous['status'] != 'PUBLISHED'):
+            return []
+        return [('drop', key)]
+    if not document_visible(document):
+        return [('drop', key)]
+    if not created and (
+        previous is None or previous['status'] != 'PUBLISHED'
+        or previous['workspace_id'] != document.workspace_id
+    ):
+        # Possibly hidden until now: its project edges come from the database
+        return [('drop', key)] + restore_documents(Document.objects.filter(pk=document.pk))
+    events = [('node', key, document.title)]
+    if previous is None or previous['uploader_id'] != document.uploader_id:
+        if previous is not None:
+            events.append(('remove', ('person', str(previous['uploader_id'])), key, AUTHORED))
+        events.append(('add', ('person', str(document.uploader_id)), key, AUTHORED))
+    return events
+
+def workspace_events(workspace, created=False):
+    key = ('workspace', str(workspace.pk))
+    previous = None if created else getattr(workspace, '_graph_state', None)
+    if workspace.is_private:
+        events = [('drop', key)]
+        if not created and (previous is None or not previous[1]):
+            documents = workspace.documents.values_list('pk', flat=True)
+            events.extend(('drop', ('document', str(pk))) for pk in documents)
+        return events
+    events = [('node', key, workspace.name)]
+    if not created and (previous is None or previous[1]):
+        events.extend(restore_documents(graph_documents(workspace.documents.all())))
+    old_project = previous[0] if previous is not None else None
+    # A workspace that was private has no edges yet
+    if previous is None or previous[1] or old_project != workspace.project_id:
+        if old_project:
+            events.append(('remove', key, ('project', str(old_project)), BELONGS_TO))
+        if workspace.project_id:
+            events.append(('add', key, ('project', str(workspace.project_id)), BELONGS_TO))
+    return events
+
+# Project M2M relations: field name -> (edge type, related node type, project is source)
+PROJECT_RELATIONS = {
+    'team_members': (WORKS_ON, 'person', False),
+    'documents': (INCLUDES, 'document', True),
+}
+
+def membership_events(relation, project_ids, related_ids, kind):
+    edge_type, related_type, project_is_source = PROJECT_RELATIONS[relation]
+    events = []
+    for project_id in project_ids:
+        for related_id in related_ids:
+            project, related = ('project', str(project_id)), (related_type, str(related_id))
+            source, target = (project, related) if project_is_source else (related, project)
+            events.append((kind, source, target, edge_type))
+    return events
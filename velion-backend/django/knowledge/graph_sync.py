@@ -0,0 +1,284 @@
+"""
+Outbox-based sync of the knowledge graph to a graph database.
+
+``graph.publish`` writes every change event to the GraphOutbox table in
+the same transaction as the model change. ``GraphSyncWorker`` drains the
+outbox in id order: each batch is coalesced, written to the sink in one
+transaction of ``UNWIND`` statements, then deleted from the outbox while
+the checkpoint advances. Sink writes are idempotent (MERGE / DETACH
+DELETE), so a batch replayed after a crash does no harm.
+
+The sink is pluggable through ``settings.GRAPH_SINK``;
+``InMemoryGraphSink`` stands in for Neo4j in tests.
+"""
+
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils.module_loading import import_string
+
+from .graph import EDGE_TYPES, iter_graph
+from .models import GraphOutbox, GraphSyncCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Node type -> (Neo4j label, property holding the display label)
+NODE_LABELS = {
+    'person': ('User', 'name'),
+    'document': ('Document', 'title'),
+    'project': ('Project', 'name'),
+    'workspace': ('Workspace', 'name'),
+}
+
+MIN_BATCH_SIZE = 10
+TARGET_BATCH_SECONDS = 2.0  # batches slower than this shrink, faster ones grow
+MAX_BACKOFF = 60  # seconds between retries against a failing sink
+CAPACITY_POLL_INTERVAL = 1.0
+CAPACITY_RETRY_AFTER = 30  # seconds clients are asked to wait while the backlog drains
+
+class ChangeSet:
+    """
+    A batch of events reduced to its net effect: nodes dropped (applied
+    first), nodes upserted, and edges removed or added.
+    """
+    def __init__(self, events):
+        self.drops = set()
+        self.upserts = {}
+        self.edges = {}
+        for event in events:
+            kind = event[0]
+            if kind == 'node':
+                self.upserts[tuple(event[1])] = event[2]
+            elif kind == 'drop':
+                key = tuple(event[1])
+                self.drops.add(key)
+                self.upserts.pop(key, None)
+                # DETACH DELETE supersedes earlier edge changes on the node
+                self.edges = {
+                    edge: added for edge, added in self.edges.items()
+                    if key not in (edge[0], edge[1])
+                }
+            elif kind in ('add', 'remove'):
+                edge = (tuple(event[1]), tuple(event[2]), event[3])
+                self.edges[edge] = kind == 'add'
+            else:
+                # 'rebuild' only matters to in-process graphs; see sync_graph --snapshot
+                logger.debug('Ignoring graph event %r', kind)
+
+    @property
+    def edge_adds(self):
+        return [edge for edge, added in self.edges.items() if added]
+
+    @property
+    def edge_removes(self):
+        return [edge for edge, added in self.edges.items() if not added]
+
+    def __len__(self):
+        return len(self.drops) + len(self.upserts) + len(self.edges)
+
+class GraphSink:
+    def write(self, changes):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InMemoryGraphSink(GraphSink):
+    def __init__(self):
+        self.nodes = {}
+        self.edges = set()
+        self.writes = 0
+
+    def write(self, changes):
+        self.writes += 1
+        for key in changes.drops:
+            self.nodes.pop(key, None)
+            self.edges = {edge for edge in self.edges if key not in (edge[0], edge[1])}
+        self.nodes.update(changes.upserts)
+        for edge in changes.edge_removes:
+            self.edges.discard(edge)
+        for edge in changes.edge_adds:
+            # MERGE creates missing endpoints without properties
+            self.nodes.setdefault(edge[0], None)
+            self.nodes.setdefault(edge[1], None)
+            self.edges.add(edge)
+
+class Neo4jGraphSink(GraphSink):
+    def __init__(self, uri=None, user=None, password=None):
+        import neo4j
+
+        self.driver = neo4j.GraphDatabase.driver(
+            uri or settings.NEO4J_BOLT_URL,
+            auth=(user or settings.NEO4J_USER, password or settings.NEO4J_PASSWORD)
+        )
+        self.ensure_constraints()
+
+    def ensure_constraints(self):
+        # MERGE on an indexed id keeps every UNWIND write a lookup per row
+        with self.driver.session() as session:
+            for label, _ in NODE_LABELS.values():
+                session.run(
+                    f'CREATE CONSTRAINT {label.lower()}_id IF NOT EXISTS '
+                    f'FOR (n:{label}) REQUIRE n.id IS UNIQUE'
+                )
+
+    def statements(self, changes):
+        """Yield ``(cypher, parameters)`` pairs, one per label or relationship kind."""
+        drops = defaultdict(list)
+        for node_type, entity_id in changes.drops:
+            drops[node_type].append(entity_id)
+        for node_type, ids in drops.items():
+            label, _ = NODE_LABELS[node_type]
+            yield f'UNWIND $ids AS id MATCH (n:{label} {{id: id}}) DETACH DELETE n', {'ids': ids}
+
+        upserts = defaultdict(list)
+        for (node_type, entity_id), name in changes.upserts.items():
+            upserts[node_type].append({'id': entity_id, 'label': name})
+        for node_type, rows in upserts.items():
+            label, prop = NODE_LABELS[node_type]
+            yield (
+                f'UNWIND $rows AS row MERGE (n:{label} {{id: row.id}}) SET n.{prop} = row.label',
+                {'rows': rows}
+            )
+
+        for edges, template in (
+            (changes.edge_removes,
+             'UNWIND $rows AS row MATCH (a:{a} {{id: row.source}})-[r:{rel}]->(b:{b} {{id: row.target}}) DELETE r'),
+            (changes.edge_adds,
+             'UNWIND $rows AS row MERGE (a:{a} {{id: row.source}}) MERGE (b:{b} {{id: row.target}}) '
+             'MERGE (a)-[:{rel}]->(b)'),
+        ):
+            grouped = defaultdict(list)
+            for source, target, edge_type in edges:
+                grouped[(source[0], edge_type, target[0])].append({'source': source[1], 'target': target[1]})
+            for (source_type, edge_type, target_type), rows in grouped.items():
+                cypher = template.format(
+                    a=NODE_LABELS[source_type][0],
+                    rel=EDGE_TYPES[edge_type - 1],
+                    b=NODE_LABELS[target_type][0],
+                )
+                yield cypher, {'rows': rows}
+
+    def write(self, changes):
+        statements = list(self.statements(changes))
+
+        def run(tx):
+            for cypher, parameters in statements:
+                tx.run(cypher, **parameters)
+
+        with self.driver.session() as session:
+            session.execute_write(run)
+
+    def close(self):
+        self.driver.close()
+
+def get_sink():
+    return import_string(settings.GRAPH_SINK)()
+
+def backlog():
+    """Approximate number of undrained events, from two index lookups."""
+    bounds = GraphOutbox.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0
+    return bounds['last'] - bounds['first'] + 1
+
+def has_capacity():
+    return not settings.GRAPH_OUTBOX_ENABLED or backlog() <= settings.GRAPH_OUTBOX_HIGH_WATERMARK
+
+def wait_for_capacity(timeout=60):
+    """
+    Block bulk writers while the outbox backlog is above the high
+    watermark. Returns False if it is still above after ``timeout`` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while not has_capacity():
+        if time.monotonic() >= deadline:
+            logger.warning('Graph outbox still above its high watermark, continuing')
+            return False
+        time.sleep(CAPACITY_POLL_INTERVAL)
+    return True
+
+class GraphSyncWorker:
+    def __init__(self, sink, name='neo4j', batch_size=None):
+        self.sink = sink
+        self.name = name
+        self.max_batch_size = batch_size or settings.GRAPH_SYNC_BATCH_SIZE
+        self.batch_size = self.max_batch_size
+
+    def drain_batch(self):
+        with transaction.atomic():
+            # The checkpoint row lock keeps concurrent workers from overlapping
+            checkpoint, _ = GraphSyncCheckpoint.objects.select_for_update().get_or_create(name=self.name)
+            rows = list(GraphOutbox.objects.order_by('id').values_list('id', 'event')[:self.batch_size])
+            if not rows:
+                return 0
+
+            self.sink.write(ChangeSet(event for _, event in rows))
+
+            ids = [pk for pk, _ in rows]
+            GraphOutbox.objects.filter(id__in=ids).delete()
+            checkpoint.last_event_id = ids[-1]
+            checkpoint.events_synced += len(ids)
+            checkpoint.save(update_fields=['last_event_id', 'events_synced', 'updated_at'])
+        return len(rows)
+
+    def _adapt(self, seconds):
+        # Slow sink: smaller batches; fast sink: grow back to the maximum
+        if seconds > TARGET_BATCH_SECONDS:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+        elif seconds < TARGET_BATCH_SECONDS / 4:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+
+    def run(self, once=False, idle_interval=1.0):
+        """
+        Drain until stopped, or until the outbox is empty with ``once``.
+        Returns the number of events synced.
+        """
+        synced = 0
+        backoff = 1
+        while True:
+            started = time.monotonic()
+            try:
+                drained = self.drain_batch()
+            except Exception:
+                if once:
+                    raise
+                logger.exception('Graph sync batch failed, retrying in %ss', backoff)
+                self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+                time.sleep(backoff)
+                backoff = min(MAX_BACKOFF, backoff * 2)
+                continue
+
+            backoff = 1
+            synced += drained
+            if drained:
+                self._adapt(time.monotonic() - started)
+                continue
+            if once:
+                return synced
+            time.sleep(idle_interval)
+
+def enqueue_snapshot(batch_size=5000):
+    """Queue the whole graph, e.g. to seed or repair the graph database."""
+    active_people = set()
+    batch = []
+    queued = 0
+    for event in iter_graph():
+        if event[0] == 'node' and event[1][0] == 'person':
+            active_people.add(event[1])
+        elif event[0] == 'add' and event[1][0] == 'person' and event[1] not in active_people:
+            continue
+        batch.append(GraphOutbox(event=event))
+        if len(batch) >= batch_size:
+            wait_for_capacity()
+            GraphOutbox.objects.bulk_create(batch)
+            queued += len(batch)
+            batch = []
+    if batch:
+        GraphOutbox.objects.bulk_create(batch)
+        queued += len(batch)
+    return queued
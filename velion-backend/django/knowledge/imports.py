@@ -0,0 +1,251 @@
+"""
+Streaming bulk import of documents from NDJSON or CSV.
+
+Input is read line by line and handled in fixed-size batches: each batch is
+validated with one reused serializer, resolves its uploaders with a single
+``employee_id`` lookup and is written with ``bulk_create`` (or ``COPY`` for
+very large loads) in its own transaction. Only the current batch and a
+capped list of row errors are held in memory.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, models, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import caching, extraction, graph, graph_sync, related_index, rollups, vector_index
+from .models import Person, Document
+from .search import document_search_vector
+from .serializers import DocumentImportSerializer
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Fields left out of COPY; search vectors are filled in per batch afterwards
+COPY_EXCLUDED_FIELDS = ('search_vector',)
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('ndjson', 'jsonl', 'json'):
+        return 'ndjson'
+    return None
+
+def read_ndjson(lines):
+    """Yield ``(line_number, record, error)`` for each non-blank line."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, {'non_field_errors': [f'Invalid JSON: {error}']}
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, {'non_field_errors': ['Each line must be a JSON object']}
+            continue
+        yield line_number, record, None
+
+def _parse_csv_row(row):
+    # Empty cells mean "use the default"; tags and metadata need decoding
+    record = {key: value for key, value in row.items() if key and value not in ('', None)}
+    if 'tags' in record:
+        tags = record['tags'].strip()
+        if tags.startswith('['):
+            record['tags'] = json.loads(tags)
+        else:
+            record['tags'] = [tag.strip() for tag in tags.split(',') if tag.strip()]
+    if 'metadata' in record:
+        record['metadata'] = json.loads(record['metadata'])
+    return record
+
+def read_csv(lines):
+    """Yield ``(line_number, record, error)`` for each CSV row after the header."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        try:
+            yield reader.line_num, _parse_csv_row(row), None
+        except ValueError as error:
+            yield reader.line_num, None, {'non_field_errors': [f'Invalid JSON value: {error}']}
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+def decode_lines(stream, encoding='utf-8-sig'):
+    # Iterating a Django upload yields byte lines, never the whole file
+    for line in stream:
+        yield line.decode(encoding) if isinstance(line, bytes) else line
+
+class ImportReport:
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+class DocumentImporter:
+    def __init__(self, default_uploader=None, batch_size=DEFAULT_BATCH_SIZE,
+                 use_copy=False, report=None, wait_for_graph=False):
+        self.default_uploader = default_uploader
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        # Blocking on the graph backlog is for offline imports only; request
+        # handlers check graph_sync.has_capacity() up front instead
+        self.wait_for_graph = wait_for_graph
+        self.report = report or ImportReport()
+        self.serializer = DocumentImportSerializer()
+
+    def run(self, rows):
+        """Import ``(line_number, record, error)`` rows and return the report."""
+        batch = []
+        for line, record, error in rows:
+            if error:
+                self.report.add_error(line, error)
+                continue
+            batch.append((line, record))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+
+        if self.report.created:
+            caching.bump_version_on_commit('documents')
+        return self.report
+
+    def _validate(self, batch):
+        valid = []
+        for line, record in batch:
+            try:
+                valid.append((line, self.serializer.run_validation(record)))
+            except ValidationError as error:
+                self.report.add_error(line, error.detail)
+        return valid
+
+    def _resolve_uploaders(self, valid):
+        employee_ids = {
+            data['uploader_employee_id'] for _, data in valid
+            if data.get('uploader_employee_id')
+        }
+        uploaders = dict(
+            Person.objects.filter(employee_id__in=employee_ids).values_list('employee_id', 'pk')
+        ) if employee_ids else {}
+
+        documents = []
+        lines = []
+        for line, data in valid:
+            employee_id = data.pop('uploader_employee_id', None)
+            if employee_id:
+                uploader_id = uploaders.get(employee_id)
+                if uploader_id is None:
+                    self.report.add_error(line, {
+                        'uploader_employee_id': [f'No user with employee ID "{employee_id}"']
+                    })
+                    continue
+            elif self.default_uploader is not None:
+                uploader_id = self.default_uploader.pk
+            else:
+                self.report.add_error(line, {'uploader_employee_id': ['This field is required.']})
+                continue
+            documents.append(Document(uploader_id=uploader_id, **data))
+            lines.append(line)
+        return documents, lines
+
+    def _import_batch(self, batch):
+        documents, lines = self._resolve_uploaders(self._validate(batch))
+        if not documents:
+            return
+        # Let the graph sync catch up instead of growing its backlog unbounded
+        if self.wait_for_graph:
+            graph_sync.wait_for_capacity()
+
+        try:
+            with transaction.atomic():
+                if self.use_copy:
+                    copy_documents(documents)
+                else:
+                    Document.objects.bulk_create(documents)
+                Document.objects.filter(
+                    pk__in=[document.pk for document in documents]
+                ).update(search_vector=document_search_vector())
+                rollups.record_documents_created(documents)
+                graph.publish([
+                    event for document in documents
+                    for event in graph.document_events(document, created=True)
+                ])
+                extraction.request_extraction([document.pk for document in documents])
+                if any(document.status == 'PUBLISHED' for document in documents):
+                    vector_index.request_sync()
+                    related_index.request_sync()
+        except Exception as error:
+            # The batch rolled back as a whole
+            for line in lines:
+                self.report.add_error(line, {'non_field_errors': [f'Could not save batch: {error}']})
+            return
+        self.report.created += len(documents)
+
+def _copy_value(field, value):
+    if value is None:
+        return None
+    if isinstance(field, ArrayField):
+        items = ('"{}"'.format(str(item).replace('\\', '\\\\').replace('"', '\\"')) for item in value)
+        return '{' + ','.join(items) + '}'
+    if isinstance(field, models.JSONField):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _copy_row(values):
+    # In COPY's CSV format an unquoted empty field is NULL and a quoted one
+    # is an empty string, so both arrive as the ORM would write them
+    return ','.join(
+        '' if value is None else '"{}"'.format(value.replace('"', '""')) for value in values
+    ) + '\n'
+
+def copy_documents(documents):
+    """Write ``documents`` with a single ``COPY ... FROM STDIN``."""
+    now = timezone.now()
+    fields = [
+        field for field in Document._meta.concrete_fields
+        if field.name not in COPY_EXCLUDED_FIELDS
+    ]
+
+    buffer = io.StringIO()
+    for document in documents:
+        document.created_at = document.updated_at = now
+        buffer.write(_copy_row(_copy_value(field, getattr(document, field.attname)) for field in fields))
+    buffer.seek(0)
+
+    columns = ', '.join(f'"{field.column}"' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY "{Document._meta.db_table}" ({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+def import_documents(lines, input_format, **options):
+    """Import documents from an iterable of text lines in ``input_format``."""
+    return DocumentImporter(**options).run(READERS[input_format](lines))
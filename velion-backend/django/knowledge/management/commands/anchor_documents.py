@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledge import anchoring
+
+class Command(BaseCommand):
+    help = 'Anchor unanchored documents on the blockchain in Merkle batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ANCHOR_BATCH_MAX_SIZE)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep anchoring a batch every ANCHOR_BATCH_WINDOW seconds'
+        )
+    
+    def handle(self, *args, **options):
+        client = anchoring.get_chain_client()
+        while True:
+            anchored = anchoring.anchor_pending(client, max_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Anchored {anchored} documents'))
+            if not options['loop']:
+                return
+            try:
+                time.sleep(settings.ANCHOR_BATCH_WINDOW)
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from knowledge import rollups
+
+BACKFILLS = {
+    'documents': rollups.backfill_document_stats,
+    'users': rollups.backfill_user_activity,
+    'validations': rollups.backfill_validation_stats,
+}
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily analytics rollups from source tables'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Only rebuild days on or after this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--only',
+            choices=sorted(BACKFILLS),
+            action='append',
+            help='Rollup to rebuild (repeatable, defaults to all)'
+        )
+    
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+        
+        for name in options['only'] or sorted(BACKFILLS):
+            rows = BACKFILLS[name](since)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {name} rollups ({rows} rows)'))
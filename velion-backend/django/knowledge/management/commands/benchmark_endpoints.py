@@ -0,0 +1,111 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from knowledge import activity, activity_log, benchmarks, counters
+
+# Local-only settings: a private cache the benchmarks may clear, no Redis, and
+# activity log writes left to the final flush, so the background flusher holds
+# no connection to the test database when it is dropped
+BENCHMARK_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}},
+    'REDIS_URL': None,
+    'CELERY_TASK_ALWAYS_EAGER': True,
+    'ACTIVITY_LOG_FLUSH_INTERVAL': 24 * 3600,
+    'ACTIVITY_LOG_BATCH_SIZE': 10 ** 6,
+    'ACTIVITY_LOG_MAX_BUFFER': 10 ** 6,
+}
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, time API endpoints through the test client and '
+        'compare p50/p95 latency, query count and peak memory with the committed baseline'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=sorted(benchmarks.DATASETS), default='small')
+        for size in benchmarks.DATASETS['small']:
+            parser.add_argument(f'--{size}', type=int, help=f'Override the dataset\'s number of {size}')
+        parser.add_argument('--endpoint', action='append', choices=sorted(benchmarks.ENDPOINTS),
+                            help='Endpoint to run (repeatable, defaults to all)')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=str(benchmarks.BASELINE_PATH))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Record these results as the baseline for the dataset')
+        parser.add_argument('--latency-tolerance', type=float,
+                            help='Override the allowed latency ratio over the baseline')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    
+    def handle(self, *args, **options):
+        name = options['dataset']
+        sizes = {
+            size: options[size] if options[size] is not None else default
+            for size, default in benchmarks.DATASETS[name].items()
+        }
+        
+        with override_settings(**BENCHMARK_SETTINGS):
+            results = self._run(sizes, options)
+        
+        baseline = benchmarks.load_baseline(options['baseline'])
+        if options['update_baseline']:
+            recorded = baseline.get(name, {})
+            endpoints = recorded.get('endpoints', {}) if recorded.get('sizes') == sizes else {}
+            baseline[name] = {'sizes': sizes, 'endpoints': {**endpoints, **results}}
+            benchmarks.save_baseline(baseline, options['baseline'])
+        
+        expected = baseline.get(name, {})
+        if expected.get('sizes') != sizes:
+            # Numbers from another dataset size say nothing
+            expected = {}
+        tolerances = dict(benchmarks.TOLERANCES)
+        if options['latency_tolerance'] is not None:
+            for metric in ('p50_ms', 'p95_ms'):
+                tolerances[metric] = (options['latency_tolerance'], tolerances[metric][1])
+        regressions = benchmarks.compare(results, expected.get('endpoints', {}), tolerances)
+        
+        if options['json']:
+            self.stdout.write(json.dumps({'sizes': sizes, 'endpoints': results, 'regressions': regressions}))
+        else:
+            self._report(sizes, results, expected.get('endpoints', {}))
+        
+        if regressions:
+            raise CommandError('\n'.join(
+                f'{endpoint} {metric}: {value} exceeds {limit}' for endpoint, metric, value, limit in regressions
+            ))
+        if not expected:
+            self.stdout.write(self.style.WARNING(f'No baseline for {name} at these sizes'))
+        elif not options['json']:
+            self.stdout.write(self.style.SUCCESS('Within baseline tolerances'))
+    
+    def _run(self, sizes, options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            admin = benchmarks.seed(sizes, options['seed'])
+            client = APIClient()
+            client.force_authenticate(admin)
+            return benchmarks.run(client, options['endpoint'], options['iterations'], options['warmup'])
+        finally:
+            # Write-behind buffers must not outlive the test database
+            activity_log.flush()
+            activity.flush()
+            counters.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+    
+    def _report(self, sizes, results, expected):
+        self.stdout.write(', '.join(f'{count} {size}' for size, count in sizes.items()))
+        self.stdout.write(f'{"endpoint":<34}{"p50 ms":>10}{"p95 ms":>10}{"queries":>9}{"peak KiB":>11}{"p50 vs base":>13}')
+        for endpoint, metrics in results.items():
+            base = expected.get(endpoint, {}).get('p50_ms')
+            change = f'{(metrics["p50_ms"] / base - 1) * 100:+.0f}%' if base else '-'
+            self.stdout.write(
+                f'{endpoint:<34}{metrics["p50_ms"]:>10.2f}{metrics["p95_ms"]:>10.2f}'
+                f'{metrics["queries"]:>9}{metrics["peak_memory_kb"]:>11.1f}{change:>13}'
+            )
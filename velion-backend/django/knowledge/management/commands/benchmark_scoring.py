@@ -0,0 +1,74 @@
+import json
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from knowledge import scoring, text_analysis
+
+VOCABULARY = (
+    'the data platform team delivered a reliable reporting pipeline for finance and operations '
+    'migration of legacy systems introduced delays but improved monitoring reduced incidents '
+    'stakeholders reviewed the proposal architecture documentation considerably simplified onboarding '
+    'quarterly analysis shows sustainable growth across international subsidiaries'
+).split()
+
+def synthetic_texts(count, words, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(6, 30))
+            sentence = ' '.join(rng.choice(VOCABULARY) for _ in range(length))
+            sentences.append(sentence.capitalize() + '.')
+            remaining -= length
+        texts.append(' '.join(sentences))
+    return texts
+
+class Command(BaseCommand):
+    help = 'Measure scoring throughput per document, vectorized on one core and in a process pool'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000)
+        parser.add_argument('--words', type=int, default=300, help='Words per synthetic document')
+        parser.add_argument('--chunk-size', type=int, default=scoring.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    
+    def handle(self, *args, **options):
+        texts = synthetic_texts(options['documents'], options['words'])
+        chunk_size = options['chunk_size']
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        
+        results = {}
+        
+        # One document at a time, as the extraction pipeline scores them
+        sample = texts[:max(1, len(texts) // 10)]
+        started = time.perf_counter()
+        for text in sample:
+            text_analysis.scores(text)
+        results['per_document'] = len(sample) / (time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        for chunk in chunks:
+            text_analysis.batch_scores(chunk)
+        results['vectorized_single_core'] = len(texts) / (time.perf_counter() - started)
+        
+        with scoring.process_pool(options['processes']) as executor:
+            # Start the workers before timing
+            list(executor.map(text_analysis.batch_scores, [[''] for _ in range(options['processes'])]))
+            started = time.perf_counter()
+            list(executor.map(text_analysis.batch_scores, chunks))
+            results[f'vectorized_pool_{options["processes"]}'] = len(texts) / (time.perf_counter() - started)
+        
+        if options['json']:
+            self.stdout.write(json.dumps({name: round(rate, 1) for name, rate in results.items()}))
+            return
+        self.stdout.write(
+            f'{len(texts)} documents of {options["words"]} words, chunks of {chunk_size}'
+        )
+        for name, rate in results.items():
+            self.stdout.write(f'{name:<28}{rate:>12,.0f} documents/s')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from knowledge import graph
+
+class Command(BaseCommand):
+    help = 'Write the knowledge graph snapshot every process loads'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep rewriting the snapshot at this interval'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            built = graph.write_snapshot()
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote a snapshot of {len(built.keys)} nodes and {built.edge_count} edges'
+            ))
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from knowledge import extraction
+
+class Command(BaseCommand):
+    help = 'Queue knowledge extraction for the document corpus'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Queue every document, not only those with stale or missing extractions'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute every stage even when its version and input are unchanged'
+        )
+        parser.add_argument('--chunk-size', type=int, default=extraction.CORPUS_CHUNK_SIZE)
+    
+    def handle(self, *args, **options):
+        queued = extraction.request_corpus_extraction(
+            stale_only=not options['all'],
+            force=options['force'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} documents for extraction'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from knowledge import activity
+
+class Command(BaseCommand):
+    help = 'Write buffered Person.last_activity timestamps to the database'
+    
+    def handle(self, *args, **options):
+        flushed = activity.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed activity for {flushed} people'))
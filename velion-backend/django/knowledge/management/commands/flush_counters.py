@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from knowledge import counters
+
+class Command(BaseCommand):
+    help = 'Write buffered document view/download counters to the database'
+    
+    def handle(self, *args, **options):
+        flushed = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed counters for {flushed} documents'))
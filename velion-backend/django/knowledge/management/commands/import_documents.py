@@ -0,0 +1,78 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from knowledge import imports
+from knowledge.models import Person
+
+class StreamingReport(imports.ImportReport):
+    # Write every row error out instead of keeping them in memory
+    def __init__(self, stream):
+        super().__init__(max_errors=0)
+        self.stream = stream
+
+    def add_error(self, line, errors):
+        super().add_error(line, errors)
+        self.stream.write(json.dumps({'line': line, 'errors': errors}) + '\n')
+
+class Command(BaseCommand):
+    help = 'Bulk import documents from an NDJSON or CSV file'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument(
+            '--format',
+            dest='input_format',
+            choices=imports.FORMATS,
+            help='Input format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--default-uploader',
+            help='employee_id used for rows without uploader_employee_id'
+        )
+        parser.add_argument('--batch-size', type=int, default=imports.DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Load batches with COPY instead of INSERT'
+        )
+        parser.add_argument(
+            '--errors',
+            help='Write row errors as NDJSON to this file (defaults to stderr)'
+        )
+    
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or (path != '-' and imports.detect_format(path))
+        if not input_format:
+            raise CommandError('Could not detect the input format, pass --format')
+        
+        default_uploader = None
+        if options['default_uploader']:
+            try:
+                default_uploader = Person.objects.get(employee_id=options['default_uploader'])
+            except Person.DoesNotExist:
+                raise CommandError(f'No user with employee ID "{options["default_uploader"]}"')
+        
+        errors = open(options['errors'], 'w') if options['errors'] else sys.stderr
+        source = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = imports.import_documents(
+                source,
+                input_format,
+                default_uploader=default_uploader,
+                batch_size=options['batch_size'],
+                use_copy=options['copy'],
+                report=StreamingReport(errors),
+                wait_for_graph=True,
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if errors is not sys.stderr:
+                errors.close()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} documents, {report.failed} rows failed'
+        ))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledge import partitions
+
+class Command(BaseCommand):
+    help = 'Create upcoming ActivityLog partitions and drop expired ones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Rebuild a plain activity_log table as a partitioned one'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.ACTIVITY_LOG_PARTITIONS_AHEAD,
+            help='Months of partitions to create ahead of the current one'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.ACTIVITY_LOG_RETENTION_MONTHS,
+            help='Full months of raw log to keep (0 keeps everything)'
+        )
+    
+    def handle(self, *args, **options):
+        result = partitions.maintain_partitions(
+            options['months_ahead'],
+            options['retention_months'],
+            convert=options['convert'],
+        )
+        if result['converted']:
+            self.stdout.write(self.style.SUCCESS(f'Converted {partitions.TABLE} to a partitioned table'))
+        if result['expired_default_rows']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Rolled up and deleted {result['expired_default_rows']} expired rows from {partitions.DEFAULT_PARTITION}"
+            ))
+        for name in result['created']:
+            self.stdout.write(self.style.SUCCESS(f'Created partition {name}'))
+        for name in result['dropped']:
+            self.stdout.write(self.style.SUCCESS(f'Rolled up and dropped partition {name}'))
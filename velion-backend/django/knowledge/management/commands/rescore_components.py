@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from knowledge import scoring
+
+class Command(BaseCommand):
+    help = 'Recompute KnowledgeComponent complexity and readability scores in bulk'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=scoring.DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=0,
+            help='Score chunks in this many processes (0 scores in this process)'
+        )
+        parser.add_argument('--method', choices=scoring.METHODS, default='copy')
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Only components scored with an older version of the formulas'
+        )
+    
+    def handle(self, *args, **options):
+        report = scoring.rescore(
+            chunk_size=options['chunk_size'],
+            processes=options['processes'],
+            method=options['method'],
+            stale_only=options['stale'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {report.scored} components in {report.seconds:.1f}s '
+            f'({report.documents_per_second:.0f} documents/s)'
+        ))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from knowledge import graph_sync
+
+class Command(BaseCommand):
+    help = 'Drain the graph outbox into the graph database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the outbox is empty instead of polling'
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.GRAPH_SYNC_BATCH_SIZE)
+        parser.add_argument(
+            '--snapshot',
+            action='store_true',
+            help='Queue the whole graph first, to seed or repair the graph database'
+        )
+    
+    def handle(self, *args, **options):
+        if not settings.GRAPH_OUTBOX_ENABLED:
+            raise CommandError('Graph sync is disabled, set NEO4J_BOLT_URL or GRAPH_OUTBOX_ENABLED')
+        
+        if options['snapshot']:
+            queued = graph_sync.enqueue_snapshot()
+            self.stdout.write(f'Queued {queued} snapshot events')
+        
+        sink = graph_sync.get_sink()
+        worker = graph_sync.GraphSyncWorker(sink, batch_size=options['batch_size'])
+        try:
+            synced = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            return
+        finally:
+            sink.close()
+        self.stdout.write(self.style.SUCCESS(f'Synced {synced} graph events'))
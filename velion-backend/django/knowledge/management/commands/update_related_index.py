@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from knowledge import related_index
+
+class Command(BaseCommand):
+    help = 'Update the related-documents index with documents changed since the last run'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-sign every published document into a fresh index'
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep syncing at this interval'
+        )
+    
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            changed = related_index.sync_index(rebuild=rebuild)
+            self.stdout.write(self.style.SUCCESS(f'Updated {changed} index rows'))
+            if not options['loop']:
+                return
+            rebuild = False
+            try:
+                time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from knowledge.models import Document
+from knowledge.search import document_search_vector
+
+class Command(BaseCommand):
+    help = 'Populate Document.search_vector for full-text search'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every document, not only those missing a vector'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        queryset = Document.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+        
+        ids = queryset.order_by().values_list('pk', flat=True)
+        batch = []
+        updated = 0
+        for pk in ids.iterator(chunk_size=options['batch_size']):
+            batch.append(pk)
+            if len(batch) >= options['batch_size']:
+                updated += self._update(batch)
+                batch = []
+        if batch:
+            updated += self._update(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'Updated search vectors for {updated} documents'))
+    
+    def _update(self, ids):
+        return Document.objects.filter(pk__in=ids).update(search_vector=document_search_vector())
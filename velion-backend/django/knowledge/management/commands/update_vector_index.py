@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from knowledge import vector_index
+
+class Command(BaseCommand):
+    help = 'Embed published documents changed since the last run into the semantic search index'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-embed every published document into a fresh index'
+        )
+        parser.add_argument(
+            '--train',
+            action='store_true',
+            help='Re-cluster the IVF lists after syncing'
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep syncing at this interval'
+        )
+    
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            changed = vector_index.sync_index(rebuild=rebuild, train=options['train'] or None)
+            self.stdout.write(self.style.SUCCESS(f'Updated {changed} index rows'))
+            if not options['loop']:
+                return
+            rebuild = False
+            try:
+                time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                return
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 import uuid
 
@@ -26,7 +29,16 @@ class UserManager(BaseUserManager):
         
         return self.create_user(email, password, **extra_fields)
 
-class Person(AbstractUser):
+class GraphNodeMixin:
+    """
+    Saves in a transaction, so the graph outbox rows written by post_save
+    (see graph.publish) commit or roll back together with the row.
+    """
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class Person(GraphNodeMixin, AbstractUser):
     ROLE_CHOICES = [
         ('ADMIN', 'Administrator'),
         ('KNOWLEDGE_CHAMPION', 'Knowledge Champion'),
@@ -63,6 +75,15 @@ class Person(AbstractUser):
         verbose_name = 'Person'
         verbose_name_plural = 'People'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes serve the case-insensitive substring matches of the typeahead
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='person_email_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='person_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='person_last_name_trgm_idx'),
+            GinIndex(OpClass(Upper('employee_id'), name='gin_trgm_ops'), name='person_employee_id_trgm_idx'),
+            # Skill overlap and containment lookups of the skill-gap analysis
+            GinIndex(fields=['skills'], name='person_skills_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.employee_id})"
@@ -86,10 +107,12 @@ class Person(AbstractUser):
         self.save()
     
     def record_activity(self):
+        # Persisted in periodic batches, see knowledge.activity
+        from .activity import record_activity
         self.last_activity = timezone.now()
-        self.save()
+        record_activity(self.pk, self.last_activity)
 
-class Document(models.Model):
+class Document(GraphNodeMixin, models.Model):
     STATUS_CHOICES = [
         ('DRAFT', 'Draft'),
         ('PENDING_REVIEW', 'Pending Review'),
@@ -126,19 +149,41 @@ class Document(models.Model):
     file_size = models.BigIntegerField()  # In bytes
     file_type = models.CharField(max_length=100)
     version = models.IntegerField(default=1)
+    previous_version = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='newer_versions')
+    workspace = models.ForeignKey('Workspace', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='documents')
     view_count = models.IntegerField(default=0)
     download_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # Weighted title/tags/description
     
     class Meta:
         db_table = 'document'
         indexes = [
             models.Index(fields=['status']),
-            models.Index(fields=['created_at']),
             models.Index(fields=['quality_score']),
             models.Index(fields=['tags']),
+            models.Index(fields=['content_hash'], name='document_content_hash_idx'),
+            GinIndex(fields=['search_vector'], name='document_search_vector_idx'),
+            # Keyset pagination: (sort field, id) for every orderable field
+            models.Index(fields=['created_at', 'id'], name='document_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='document_updated_id_idx'),
+            models.Index(fields=['view_count', 'id'], name='document_views_id_idx'),
+            models.Index(
+                Coalesce('quality_score', models.Value(-1.0)), 'id',
+                name='document_quality_id_idx'
+            ),
+            models.Index(fields=['status', 'created_at', 'id'], name='document_status_created_id_idx'),
+            # Workspace document lists, by status, newest first
+            models.Index(fields=['workspace', 'status', 'created_at'], name='document_ws_status_created_idx'),
+            # Workspace activity feed: covers its columns for index-only scans
+            models.Index(
+                fields=['workspace', 'created_at'], include=['id', 'title', 'uploader'],
+                name='document_ws_feed_idx'
+            ),
         ]
         ordering = ['-created_at']
     
@@ -149,12 +194,13 @@ class Document(models.Model):
         return round(self.file_size / (1024 * 1024), 2)
     
     def increment_view_count(self):
-        self.view_count += 1
-        self.save()
+        # Buffered and flushed in batches, see knowledge.counters
+        from .counters import increment
+        increment(self.pk, 'view_count')
     
     def increment_download_count(self):
-        self.download_count += 1
-        self.save()
+        from .counters import increment
+        increment(self.pk, 'download_count')
     
     def increment_version(self):
         self.version += 1
@@ -162,9 +208,16 @@ class Document(models.Model):
         self.save()
 
 class KnowledgeComponent(models.Model):
+    EXTRACTION_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed')
+    ]
+    
     document = models.OneToOneField(Document, on_delete=models.CASCADE, 
                                    related_name='knowledge_component')
-    summary = models.TextField()
+    summary = models.TextField(blank=True)
     key_topics = ArrayField(models.CharField(max_length=200), default=list, blank=True)
     entities = models.JSONField(default=list, blank=True)  # Named entities extracted
     sentiment_score = models.FloatField(null=True, blank=True)  # -1 to 1
@@ -180,11 +233,21 @@ class KnowledgeComponent(models.Model):
                                     null=True, blank=True, related_name='validated_components')
     validated_at = models.DateTimeField(null=True, blank=True)
     feedback = models.TextField(blank=True)
+    # Filled in by the extraction pipeline, see knowledge.extraction
+    extraction_status = models.CharField(max_length=50, choices=EXTRACTION_STATUS_CHOICES,
+                                         default='PENDING')
+    extraction_stages = models.JSONField(default=dict, blank=True)  # stage -> {'version', 'input'}
+    extraction_error = models.TextField(blank=True)
+    extraction_attempts = models.IntegerField(default=0)
+    extracted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'knowledge_component'
+        indexes = [
+            models.Index(fields=['extraction_status']),
+        ]
     
     def __str__(self):
         return f"Knowledge Component for {self.document.title}"
@@ -197,7 +260,7 @@ class KnowledgeComponent(models.Model):
             self.feedback = feedback
         self.save()
 
-class Project(models.Model):
+class Project(GraphNodeMixin, models.Model):
     STATUS_CHOICES = [
         ('PLANNING', 'Planning'),
         ('ACTIVE', 'Active'),
@@ -230,6 +293,9 @@ class Project(models.Model):
     class Meta:
         db_table = 'project'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['tags'], name='project_tags_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -239,7 +305,7 @@ class Project(models.Model):
             return (self.end_date - self.start_date).days
         return (timezone.now().date() - self.start_date).days
 
-class Workspace(models.Model):
+class Workspace(GraphNodeMixin, models.Model):
     TYPE_CHOICES = [
         ('PROJECT', 'Project Workspace'),
         ('DEPARTMENT', 'Department Workspace'),
@@ -327,6 +393,67 @@ class BlockchainTransaction(models.Model):
     def __str__(self):
         return f"Tx: {self.transaction_hash[:20]}... ({self.status})"
 
+class AnchorBatch(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SUBMITTING', 'Submitting'),
+        ('CONFIRMED', 'Confirmed'),
+        ('FAILED', 'Failed')
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    merkle_root = models.CharField(max_length=64)
+    leaf_count = models.IntegerField()
+    network = models.CharField(max_length=50, choices=BlockchainTransaction.NETWORK_CHOICES)
+    transaction_hash = models.CharField(max_length=256, blank=True)
+    block_number = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the current attempt started, to retry batches whose run died
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    anchored_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'anchor_batch'
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch {self.merkle_root[:16]}... ({self.leaf_count} documents, {self.status})"
+
+class DocumentAnchor(models.Model):
+    # A document's place in an anchored Merkle tree
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='anchors')
+    batch = models.ForeignKey(AnchorBatch, on_delete=models.CASCADE, related_name='anchors')
+    content_hash = models.CharField(max_length=256)
+    leaf_index = models.IntegerField()
+    proof = models.JSONField(default=list)  # [[sibling hash, 'L' or 'R'], ...] from leaf to root
+    
+    class Meta:
+        db_table = 'document_anchor'
+        unique_together = ['batch', 'document']
+        ordering = ['-batch__created_at']
+    
+    def __str__(self):
+        return f"{self.document_id} in {self.batch_id}"
+
+class SimulatedBlock(models.Model):
+    # The chain of anchoring.SimulatedLedger, shared by every process
+    block_hash = models.CharField(max_length=64)
+    merkle_root = models.CharField(max_length=64)
+    transaction_hash = models.CharField(max_length=256, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'simulated_block'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Block {self.pk}: {self.merkle_root[:16]}..."
+
 class AnalyticsComponent(models.Model):
     REPORT_TYPE_CHOICES = [
         ('SKILL_GAP', 'Skill Gap Analysis'),
@@ -377,6 +504,9 @@ class ValidationActivity(models.Model):
     class Meta:
         db_table = 'validation_activity'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
     
     def __str__(self):
         return f"{self.validator} {self.action}d {self.document}"
@@ -403,9 +533,11 @@ class ActivityLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     metadata = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is logged, not when the buffer is flushed
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
+        # Range-partitioned by month, see knowledge/partitions.py
         db_table = 'activity_log'
         ordering = ['-created_at']
         indexes = [
@@ -414,4 +546,83 @@ class ActivityLog(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.user} - {self.action} at {self.created_at}"
\ No newline at end of file
+        return f"{self.user} - {self.action} at {self.created_at}"
+
+class ActivityLogMonthlyStats(models.Model):
+    # Kept for months whose ActivityLog partition has been dropped
+    month = models.DateField()
+    user = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='monthly_activity')
+    action = models.CharField(max_length=50, choices=ActivityLog.ACTION_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'activity_log_monthly_stats'
+        unique_together = ['month', 'user', 'action']
+        ordering = ['-month']
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.user} {self.action}: {self.count}"
+
+class DailyDocumentStats(models.Model):
+    date = models.DateField()
+    document_type = models.CharField(max_length=50, choices=Document.TYPE_CHOICES)
+    document_count = models.IntegerField(default=0)
+    quality_sum = models.FloatField(default=0)
+    quality_count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_document_stats'
+        unique_together = ['date', 'document_type']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.date} {self.document_type}: {self.document_count}"
+
+class DailyUserActivity(models.Model):
+    date = models.DateField()
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='daily_activity')
+    
+    class Meta:
+        db_table = 'daily_user_activity'
+        unique_together = ['date', 'person']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.person} active on {self.date}"
+
+class DailyValidationStats(models.Model):
+    date = models.DateField()
+    action = models.CharField(max_length=50, choices=ValidationActivity.ACTION_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_validation_stats'
+        unique_together = ['date', 'action']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.date} {self.action}: {self.count}"
+
+class GraphOutbox(models.Model):
+    # Graph change events written in the same transaction as the model change
+    event = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'graph_outbox'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.id}: {self.event[0]}"
+
+class GraphSyncCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    events_synced = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'graph_sync_checkpoint'
+    
+    def __str__(self):
+        return f"{self.name} at {self.last_event_id}"
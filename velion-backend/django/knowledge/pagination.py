@@ -0,0 +1,192 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import BooleanField, Expression, F
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+def estimate_count(queryset):
+    # Planner row estimate: no COUNT(*) scan, but can drift from the exact total
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+class StandardPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class KeysetPredicate(Expression):
+    """Row-value comparison such as ``(created_at, id) < (%s, %s)``."""
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, expressions, values, operator):
+        super().__init__()
+        self.expressions = list(expressions)
+        self.values = list(values)
+        self.operator = operator
+
+    def get_source_expressions(self):
+        return self.expressions
+
+    def set_source_expressions(self, exprs):
+        self.expressions = list(exprs)
+
+    def as_sql(self, compiler, connection):
+        sqls, params = [], []
+        for expression in self.expressions:
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+        placeholders = ', '.join(['%s'] * len(self.values))
+        return f"({', '.join(sqls)}) {self.operator} ({placeholders})", params + self.values
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(<sort field>, pk)``.
+
+    The sort field is taken from the queryset ordering, so the ordering
+    filter keeps working. Views can map a sort field to an expression through
+    ``keyset_expressions``, e.g. to coalesce a nullable column.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        unpaged = queryset
+
+        self.sort_field, descending = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = cursor['reverse'] if cursor else False
+
+        expressions = getattr(view, 'keyset_expressions', {})
+        queryset = queryset.annotate(
+            keyset_value=expressions.get(self.sort_field, F(self.sort_field))
+        )
+
+        # Walking backwards flips the index scan direction
+        scan_descending = descending != reverse
+        prefix = '-' if scan_descending else ''
+        queryset = queryset.order_by(f'{prefix}keyset_value', f'{prefix}pk')
+        if cursor:
+            queryset = queryset.filter(KeysetPredicate(
+                [F('keyset_value'), F('pk')],
+                [cursor['value'], cursor['pk']],
+                '<' if scan_descending else '>'
+            ))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Totals only come with the first page: exact when it holds every
+        # row, otherwise the planner's estimate, never below what was seen
+        self.approximate_count = None
+        if cursor is None:
+            self.approximate_count = (
+                max(estimate_count(unpaged), len(results) + 1) if has_more else len(results)
+            )
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        for field in ordering:
+            if isinstance(field, str) and field not in ('pk', '-pk', '?'):
+                return field.lstrip('-'), field.startswith('-')
+        return 'pk', True
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            # Clients can send anything, so check the shape encode_cursor gives
+            if not isinstance(cursor, dict) or not {'value', 'pk', 'reverse'} <= cursor.keys():
+                raise ValueError(encoded)
+            if cursor.get('datetime'):
+                cursor['value'] = parse_datetime(cursor['value'])
+                if cursor['value'] is None:
+                    raise ValueError(encoded)
+            return cursor
+        except (TypeError, ValueError, UnicodeEncodeError, AttributeError, KeyError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, instance, reverse):
+        value = instance.keyset_value
+        cursor = {
+            'value': value.isoformat() if isinstance(value, datetime) else value,
+            'datetime': isinstance(value, datetime),
+            'pk': str(instance.pk),
+            'reverse': reverse,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('approximate_count', self.approximate_count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'approximate_count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+class KeysetPaginationMixin:
+    """Opt into keyset pagination per request with ``?pagination=cursor``."""
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = None if self.pagination_class is None else self.pagination_class()
+        return self._paginator
@@ -0,0 +1,212 @@
+"""
+Monthly range partitioning of the ActivityLog table.
+
+The table is partitioned on ``created_at`` with one partition per calendar
+month (UTC) plus a default partition that catches rows for months without
+one. ``maintain_partitions`` creates upcoming partitions and, past the
+retention window, folds each expired month into ActivityLogMonthlyStats
+before dropping its partition; expired rows the default partition caught
+are folded in and deleted the same way. Run it daily via ``manage.py
+maintain_activity_log``.
+"""
+
+import logging
+import re
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import ActivityLog, ActivityLogMonthlyStats
+
+logger = logging.getLogger(__name__)
+
+TABLE = ActivityLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_PATTERN = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+def is_partitioned(cursor, table=TABLE):
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt '
+        'JOIN pg_class c ON c.oid = pt.partrelid '
+        'WHERE c.relname = %s AND pg_table_is_visible(c.oid))',
+        [table]
+    )
+    return cursor.fetchone()[0]
+
+def list_partitions(cursor):
+    """Return ``{month: partition_name}`` for the monthly partitions."""
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent '
+        'WHERE p.relname = %s AND pg_table_is_visible(p.oid)',
+        [TABLE]
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+def _months_in(cursor, table):
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date "
+        f'FROM "{table}"'
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def _bounds(month):
+    return [f'{month.isoformat()} 00:00:00+00', f'{add_months(month, 1).isoformat()} 00:00:00+00']
+
+def create_partition(cursor, month):
+    """
+    Create the partition for ``month``, moving any rows the default
+    partition caught for that month into it.
+    """
+    name = partition_name(month)
+    lower, upper = _bounds(month)
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+        f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        [lower, upper]
+    )
+    cursor.execute(
+        f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    )
+    return name
+
+def ensure_partitions(cursor, months_ahead, today=None):
+    """
+    Create partitions from the current month through ``months_ahead``
+    months ahead, plus any month with rows in the default partition.
+    """
+    current = month_start(today or date.today())
+    existing = list_partitions(cursor)
+    wanted = {add_months(current, offset) for offset in range(months_ahead + 1)}
+    wanted |= _months_in(cursor, DEFAULT_PARTITION)
+
+    created = []
+    for month in sorted(wanted - existing.keys()):
+        created.append(create_partition(cursor, month))
+    return created
+
+def expire_default_rows(cursor, retention_months, today=None):
+    """
+    Roll up and delete rows of the default partition older than
+    ``retention_months`` full months, so no partition is created just to
+    be dropped. Returns the number of rows removed.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    stats_table = ActivityLogMonthlyStats._meta.db_table
+    lower = _bounds(cutoff)[0]
+    # Added to, not replaced: the month's partition may have been rolled up already
+    cursor.execute(
+        f'INSERT INTO "{stats_table}" AS stats (month, user_id, action, count) '
+        f"SELECT date_trunc('month', created_at AT TIME ZONE 'UTC')::date, user_id, action, count(*) "
+        f'FROM "{DEFAULT_PARTITION}" WHERE created_at < %s GROUP BY 1, user_id, action '
+        f'ON CONFLICT (month, user_id, action) DO UPDATE SET count = stats.count + EXCLUDED.count',
+        [lower]
+    )
+    cursor.execute(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at < %s', [lower])
+    return cursor.rowcount
+
+def drop_expired_partitions(cursor, retention_months, today=None):
+    """
+    Roll up and drop partitions older than ``retention_months`` full months.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    stats_table = ActivityLogMonthlyStats._meta.db_table
+
+    dropped = []
+    for month, name in sorted(list_partitions(cursor).items()):
+        if month >= cutoff:
+            continue
+        cursor.execute(
+            f'INSERT INTO "{stats_table}" (month, user_id, action, count) '
+            f'SELECT %s::date, user_id, action, count(*) FROM "{name}" '
+            f'GROUP BY user_id, action '
+            f'ON CONFLICT (month, user_id, action) DO UPDATE SET count = EXCLUDED.count',
+            [month]
+        )
+        cursor.execute(f'DROP TABLE "{name}"')
+        dropped.append(name)
+    return dropped
+
+def convert_to_partitioned(cursor):
+    """
+    Rebuild a plain ActivityLog table as a partitioned one, copying its
+    rows. The primary key becomes ``(id, created_at)`` because Postgres
+    requires the partition key in every unique constraint.
+    """
+    staging = f'{TABLE}_partitioned'
+    cursor.execute(
+        f'CREATE TABLE "{staging}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+        f'PARTITION BY RANGE (created_at)'
+    )
+    cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{staging}" DEFAULT')
+    for month in sorted(_months_in(cursor, TABLE)):
+        lower, upper = _bounds(month)
+        cursor.execute(
+            f'CREATE TABLE "{partition_name(month)}" PARTITION OF "{staging}" '
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    cursor.execute(f'INSERT INTO "{staging}" OVERRIDING SYSTEM VALUE SELECT * FROM "{TABLE}"')
+    cursor.execute(f'DROP TABLE "{TABLE}"')
+    cursor.execute(f'ALTER TABLE "{staging}" RENAME TO "{TABLE}"')
+
+    cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY (id, created_at)')
+    user_column = ActivityLog._meta.get_field('user')
+    cursor.execute(
+        f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_user_id_fk" '
+        f'FOREIGN KEY (user_id) REFERENCES "{user_column.related_model._meta.db_table}" (id) '
+        f'DEFERRABLE INITIALLY DEFERRED'
+    )
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+        f'COALESCE((SELECT MAX(id) FROM "{TABLE}"), 0) + 1, false)'
+    )
+
+    # Indexes on the parent cascade to every partition
+    with connection.schema_editor(atomic=False) as editor:
+        for index in ActivityLog._meta.indexes:
+            editor.add_index(ActivityLog, index)
+
+def maintain_partitions(months_ahead, retention_months, convert=False, today=None):
+    """
+    Create upcoming partitions and apply retention. With ``convert`` a plain
+    table is rebuilt as a partitioned one first; ``retention_months`` of 0
+    keeps every partition.
+    """
+    result = {'converted': False, 'created': [], 'dropped': [], 'expired_default_rows': 0}
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            if not convert:
+                logger.warning('%s is not partitioned, run maintain_activity_log --convert', TABLE)
+                return result
+            convert_to_partitioned(cursor)
+            result['converted'] = True
+        if retention_months:
+            result['expired_default_rows'] = expire_default_rows(cursor, retention_months, today)
+        result['created'] = ensure_partitions(cursor, months_ahead, today)
+        if retention_months:
+            result['dropped'] = drop_expired_partitions(cursor, retention_months, today)
+    return result
+
+def table_is_empty():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT NOT EXISTS (SELECT 1 FROM "{TABLE}")')
+        return cursor.fetchone()[0]
@@ -0,0 +1,106 @@
+"""
+Permission classes.
+
+Workspace checks read the requesting user's ``{workspace id: role}`` map
+(``access.get_memberships``) once per request and keep it on the
+request, so ``has_permission``, ``has_object_permission``, queryset
+filtering and the view body share it. List endpoints apply the same rules
+in bulk through ``filter_queryset``, as one condition in the list query
+instead of a check per object; ``ObjectPermissionFilter`` calls it.
+"""
+
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from . import access
+from .models import Workspace
+
+WORKSPACE_MANAGER_ROLES = ('OWNER', 'ADMIN')
+
+def workspace_memberships(request, build=True):
+    """
+    ``{workspace id: role}`` for ``request.user``, loaded at most once per
+    request. Without ``build`` a cache miss returns None instead of querying.
+    """
+    memberships = getattr(request, '_workspace_memberships', None)
+    if memberships is None:
+        memberships = access.get_memberships(request.user, build=build)
+        request._workspace_memberships = memberships
+    return memberships
+
+def workspace_role(request, workspace_id):
+    return workspace_memberships(request).get(str(workspace_id))
+
+def _workspace_id_of(obj):
+    # The id of a workspace or of the workspace an object is in, checked
+    # against the membership map without loading the workspace
+    if isinstance(obj, Workspace):
+        return obj.pk
+    return getattr(obj, 'workspace_id', None)
+
+def _in_private_workspace(obj):
+    # Only asked of non-members; views using this on objects inside a
+    # workspace should select_related('workspace') to avoid a query each
+    if isinstance(obj, Workspace):
+        return obj.is_private
+    return obj.workspace.is_private
+
+class IsAdminOrKnowledgeChampion(BasePermission):
+    message = 'Only administrators and knowledge champions can do this'
+
+    def has_permission(self, request, view):
+        return getattr(request.user, 'role', None) in ('ADMIN', 'KNOWLEDGE_CHAMPION')
+
+class IsOwnerOrReadOnly(BasePermission):
+    """Writes are limited to the object's uploader or creator, and administrators."""
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in SAFE_METHODS or access.is_admin(request.user):
+            return True
+        owner_id = getattr(obj, 'uploader_id', None) or getattr(obj, 'created_by_id', None)
+        return owner_id == request.user.pk
+
+class IsWorkspaceMember(BasePermission):
+    """
+    Members of a workspace may use it; anyone may read a public one.
+    Objects outside any workspace are not restricted.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        if access.is_admin(request.user):
+            return True
+        workspace_id = _workspace_id_of(obj)
+        if workspace_id is None:
+            return True
+        if workspace_role(request, workspace_id) is not None:
+            return True
+        return request.method in SAFE_METHODS and not _in_private_workspace(obj)
+
+    def filter_queryset(self, request, queryset, view):
+        # Reads only: writes to public workspaces still need a membership,
+        # which has_object_permission checks on the object
+        if queryset.model is not Workspace or access.is_admin(request.user):
+            return queryset
+        # Without a cached map, an EXISTS subquery is cheaper than loading one
+        return access.visible_workspaces(queryset, request.user, workspace_memberships(request, build=False))
+
+class IsWorkspaceOwnerOrAdmin(BasePermission):
+    message = 'Only workspace owners and admins can do this'
+
+    def has_object_permission(self, request, view, obj):
+        if access.is_admin(request.user):
+            return True
+        workspace_id = _workspace_id_of(obj)
+        return workspace_id is not None and workspace_role(request, workspace_id) in WORKSPACE_MANAGER_ROLES
+
+class ObjectPermissionFilter(BaseFilterBackend):
+    """
+    Narrow list and detail querysets with the ``filter_queryset`` of every
+    permission class of the view that has one.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for permission in view.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                queryset = permission.filter_queryset(request, queryset, view)
+        return queryset
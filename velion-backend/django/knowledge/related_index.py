@@ -0,0 +1,495 @@
+"""
+"Related documents" from a MinHash/LSH index.
+
+Every published document is reduced to a MinHash signature of its title
+and description words and bigrams plus its tags. Signatures are split
+into bands; documents sharing any band are candidates, and their
+signature agreement estimates the Jaccard similarity of their shingles.
+The top ``TOP_N`` neighbours of every document are precomputed, so a
+lookup reads one row and never compares documents at request time.
+
+Layout, under ``settings.RELATED_INDEX_DIR``::
+
+    meta.json                 generation, row count, sync watermark
+    g<N>/ids.bin              16-byte document UUID per row
+    g<N>/signatures.u32       NUM_PERM hashes per row
+    g<N>/neighbours.i32       TOP_N neighbour rows per row (-1 when unused)
+    g<N>/scores.f32           their estimated similarities
+    g<N>/removed.u8           1 for documents no longer published
+    g<N>/lookup.npz           sorted ids with their rows, up to the last re-sort
+    g<N>/recent.npz           the same for rows appended since
+    g<N>/bands.npz            sorted band keys with their rows, for the writer
+    g<N>/unsorted.i32         rows appended or edited since the re-sort
+
+Rows are stable: an edited document keeps its row and its signature and
+neighbour lists are overwritten in place. Rows missing from the band
+tables are scanned directly until the next re-sort. As with the vector
+index, one writer (``sync_index``) holds a file lock and readers remap
+when meta.json is replaced.
+"""
+
+import os
+import threading
+import uuid
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Document
+from .text_analysis import content_words
+from .vector_index import (
+    SYNC_OVERLAP, new_generation_path, read_meta, remove_old_generations, write_meta, writer_lock
+)
+
+NUM_PERM = 120
+BANDS = 40
+ROWS_PER_BAND = NUM_PERM // BANDS  # candidates from a similarity of about 0.3
+TOP_N = 20
+MIN_SIMILARITY = 0.1
+MAX_BUCKET_SIZE = 500  # bigger buckets are boilerplate shared by everything
+MAX_UNSORTED = 10000  # rows scanned directly before the band tables are re-sorted
+SYNC_CHUNK_SIZE = 1000
+SYNC_QUEUED_KEY = 'related-index:sync-queued'
+
+# Fixed seeds: signatures have to be reproducible across processes and runs
+_rng = np.random.default_rng(7919)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+PERMUTATION_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+PERMUTATION_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+BAND_MIX = _rng.integers(1, 1 << 63, ROWS_PER_BAND, dtype=np.uint64) | np.uint64(1)
+BAND_SALT = _rng.integers(0, 1 << 63, BANDS, dtype=np.uint64)  # keeps equal bands of different positions apart
+EMPTY_HASH = np.uint32(0xFFFFFFFF)
+
+def shingles(title, description, tags):
+    terms = content_words(f'{title}\n{description}')
+    result = set(terms)
+    result.update(f'{first} {second}' for first, second in zip(terms, terms[1:]))
+    result.update(f'#{tag.strip().lower()}' for tag in tags or () if tag.strip())
+    return result
+
+def signature(shingle_set):
+    if not shingle_set:
+        return np.full(NUM_PERM, EMPTY_HASH, dtype=np.uint32)
+    values = np.fromiter(
+        (zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set), np.uint64, len(shingle_set)
+    )
+    hashed = (np.outer(PERMUTATION_A, values) + PERMUTATION_B[:, None]) % MERSENNE_PRIME
+    return hashed.min(axis=1).astype(np.uint32)
+
+def band_keys(signatures):
+    """One 64-bit key per band for each signature row."""
+    banded = np.asarray(signatures).reshape(len(signatures), BANDS, ROWS_PER_BAND).astype(np.uint64)
+    return (banded * BAND_MIX).sum(axis=2, dtype=np.uint64) ^ BAND_SALT
+
+def similarity(signatures, row, others):
+    return (signatures[others] == signatures[row]).mean(axis=1)
+
+class RelatedIndex:
+    """Read-only view used by request handlers."""
+    def __init__(self, root, meta):
+        self.meta = meta
+        self.count = count = meta['count']
+        path = os.path.join(root, f'g{meta["generation"]}')
+        if not count:
+            return
+        self.ids = np.memmap(os.path.join(path, 'ids.bin'), 'S16', 'r', shape=(count,))
+        self.neighbours = np.memmap(os.path.join(path, 'neighbours.i32'), np.int32, 'r', shape=(count, TOP_N))
+        self.scores = np.memmap(os.path.join(path, 'scores.f32'), np.float32, 'r', shape=(count, TOP_N))
+        self.removed = np.memmap(os.path.join(path, 'removed.u8'), np.uint8, 'r', shape=(count,))
+        self.lookups = []
+        for name in ('lookup.npz', 'recent.npz'):
+            with np.load(os.path.join(path, name)) as lookup:
+                self.lookups.append((lookup['ids'], lookup['rows']))
+
+    def row_of(self, pk):
+        if not self.count:
+            return None
+        key = pk.bytes
+        for ids, rows in self.lookups:
+            position = np.searchsorted(ids, key)
+            # Rows past count were appended after this meta was written
+            found = position < len(ids) and ids[position] == key.rstrip(b'\0')  # S16 drops trailing NULs
+            if found and rows[position] < self.count:
+                return int(rows[position])
+        return None
+
+    def related(self, pk):
+        """``[(document_id, similarity)]``, most similar first."""
+        row = self.row_of(pk)
+        if row is None or self.removed[row]:
+            return []
+        result = []
+        for neighbour, score in zip(self.neighbours[row], self.scores[row]):
+            if 0 <= neighbour < self.count and not self.removed[neighbour]:
+                raw = self.ids[neighbour].ljust(16, b'\0')  # S16 drops trailing NULs
+                result.append((uuid.UUID(bytes=raw), float(score)))
+        return result
+
+_loaded = None
+_loaded_version = None
+_load_lock = threading.Lock()
+
+def get_index():
+    global _loaded, _loaded_version
+    root = settings.RELATED_INDEX_DIR
+    try:
+        stat = os.stat(os.path.join(root, 'meta.json'))
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if version != _loaded_version:
+        with _load_lock:
+            if version != _loaded_version:
+                _loaded = RelatedIndex(root, read_meta(root))
+                _loaded_version = version
+    return _loaded
+
+def related_documents(queryset, document, limit):
+    """Up to ``limit`` documents of ``queryset`` related to ``document``, with a ``similarity``."""
+    index = get_index()
+    if index is None:
+        return []
+    neighbours = index.related(document.pk)[:limit * 2]
+    allowed = {related.pk: related for related in queryset.filter(pk__in=[pk for pk, _ in neighbours])}
+    documents = []
+    for pk, score in neighbours:
+        related = allowed.get(pk)
+        if related is not None:
+            related.similarity = score
+            documents.append(related)
+    return documents[:limit]
+
+# Writer side
+# name -> (dtype, values per row, fill for new rows); new rows start removed
+FILES = {
+    'signatures.u32': (np.uint32, NUM_PERM, 0),
+    'neighbours.i32': (np.int32, TOP_N, -1),
+    'scores.f32': (np.float32, TOP_N, 0),
+    'removed.u8': (np.uint8, None, 1),
+}
+RESORT_CHUNK_SIZE = 100000
+
+def _save_npz(path, **arrays):
+    # Readers may load the file while it is being replaced
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as handle:
+        np.savez(handle, **arrays)
+    os.replace(temporary, path)
+
+class IndexWriter:
+    def __init__(self, root, meta):
+        self.root = root
+        self.meta = meta
+        self.path = os.path.join(root, f'g{meta["generation"]}')
+        count = meta['count']
+        # Drops whatever an interrupted run appended past the last meta
+        self._truncate('ids.bin', count * 16)
+        for name, (dtype, width, _) in FILES.items():
+            self._truncate(name, count * (width or 1) * np.dtype(dtype).itemsize)
+        ids = np.fromfile(self._file('ids.bin'), 'V16', count)
+        self.rows = {pk.tobytes(): row for row, pk in enumerate(ids)}
+        unsorted = np.fromfile(self._file('unsorted.i32'), np.int32)
+        self.unsorted = set(unsorted[unsorted < count].tolist())
+        with np.load(self._file('bands.npz')) as bands:
+            self.band_keys = bands['keys']
+            self.band_rows = bands['rows']
+        self._unsorted_index = None
+        self._map()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _truncate(self, name, size):
+        if os.path.getsize(self._file(name)) > size:
+            os.truncate(self._file(name), size)
+
+    def _map(self):
+        count = self.meta['count']
+        for name, (dtype, width, _) in FILES.items():
+            shape = (count, width) if width else (count,)
+            if count:
+                array = np.memmap(self._file(name), dtype, 'r+', shape=shape)
+            else:
+                array = np.zeros(shape, dtype)
+            setattr(self, name.split('.')[0], array)
+
+    def _grow(self, pks):
+        for name, (dtype, width, fill) in FILES.items():
+            with open(self._file(name), 'ab') as handle:
+                handle.write(np.full((len(pks), width or 1), fill, dtype).tobytes())
+        with open(self._file('ids.bin'), 'ab') as handle:
+            handle.write(b''.join(pks))
+        for offset, pk in enumerate(pks):
+            self.rows[pk] = self.meta['count'] + offset
+        self.flush()
+        self.meta['count'] += len(pks)
+        self._map()
+
+    def flush(self):
+        for name in FILES:
+            array = getattr(self, name.split('.')[0])
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def candidates(self, row):
+        keys = band_keys(self.signatures[row:row + 1])[0]
+        left = np.searchsorted(self.band_keys, keys, 'left')
+        right = np.searchsorted(self.band_keys, keys, 'right')
+        parts = [self.band_rows[start:end] for start, end in zip(left, right) if end - start <= MAX_BUCKET_SIZE]
+        if self.unsorted:
+            if self._unsorted_index is None:
+                unsorted = np.fromiter(self.unsorted, np.int32, len(self.unsorted))
+                self._unsorted_index = unsorted, band_keys(self.signatures[unsorted])
+            unsorted, unsorted_keys = self._unsorted_index
+            parts.append(unsorted[(unsorted_keys == keys).any(axis=1)])
+        if not parts:
+            return np.zeros(0, dtype=np.int32)
+        # Band tables keep stale entries of edited and removed rows
+        found = np.unique(np.concatenate(parts))
+        return found[(found != row) & (self.removed[found] == 0)]
+
+    def compute_neighbours(self, row):
+        """Every candidate of ``row`` above MIN_SIMILARITY with its score, best first."""
+        others = self.candidates(row)
+        scores = similarity(self.signatures, row, others)
+        keep = scores >= MIN_SIMILARITY
+        others, scores = others[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')
+        return others[order], scores[order]
+
+    def _set_list(self, row, neighbours, scores):
+        neighbours, scores = neighbours[:TOP_N], scores[:TOP_N]
+        self.neighbours[row] = -1
+        self.scores[row] = 0
+        self.neighbours[row, :len(neighbours)] = neighbours
+        self.scores[row, :len(scores)] = scores
+
+    def _offer(self, row, neighbour, score):
+        """Put ``neighbour`` into the list of ``row`` if it ranks there."""
+        neighbours = self.neighbours[row]
+        if neighbour in neighbours:
+            return
+        used = int((neighbours >= 0).sum())
+        if used == TOP_N and score <= self.scores[row, -1]:
+            return
+        merged = np.append(neighbours[:used], neighbour)
+        merged_scores = np.append(self.scores[row, :used], score)
+        order = np.argsort(-merged_scores, kind='stable')[:TOP_N]
+        self._set_list(row, merged[order], merged_scores[order])
+
+    def apply(self, published, removed, link=True):
+        """
+        Index ``published`` ``[(document_id, signature)]`` unless unchanged
+        and retire the rows of ``removed`` document ids. With ``link``, the
+        neighbour lists of the changed rows and of the rows pointing at them
+        are updated; otherwise ``rebuild_neighbours`` is expected to follow.
+        Returns the number of rows changed.
+        """
+        new = [pk.bytes for pk, _ in published if pk.bytes not in self.rows]
+        if new:
+            self._grow(new)
+        retired = [
+            self.rows[pk.bytes] for pk in removed
+            if pk.bytes in self.rows and not self.removed[self.rows[pk.bytes]]
+        ]
+        changed = []
+        for pk, values in published:
+            row = self.rows[pk.bytes]
+            if self.removed[row] or not np.array_equal(self.signatures[row], values):
+                self.signatures[row] = values
+                self.removed[row] = 0
+                changed.append(row)
+        for row in retired:
+            self.removed[row] = 1
+            self._set_list(row, np.zeros(0), np.zeros(0))
+        if not changed and not retired:
+            return 0
+        self.unsorted.update(changed)
+        self._unsorted_index = None
+        if not link:
+            return len(changed) + len(retired)
+
+        # Lists that point at a changed or retired row hold a stale score
+        referrers = set(np.flatnonzero(np.isin(self.neighbours, changed + retired).any(axis=1)).tolist())
+        for row in changed:
+            neighbours, scores = self.compute_neighbours(row)
+            self._set_list(row, neighbours, scores)
+            # Not only its own top rows: similarity is symmetric but ranks are not
+            for neighbour, score in zip(neighbours, scores):
+                if neighbour not in referrers:
+                    self._offer(neighbour, row, score)
+        for row in referrers.difference(changed, retired):
+            self._set_list(row, *self.compute_neighbours(row))
+        return len(changed) + len(retired)
+
+    def resort(self):
+        """Rebuild the band tables and the reader lookup over every row."""
+        count = self.meta['count']
+        live = np.flatnonzero(self.removed == 0).astype(np.int32)
+        keys = np.concatenate([np.zeros(0, dtype=np.uint64)] + [
+            band_keys(self.signatures[live[start:start + RESORT_CHUNK_SIZE]]).ravel()
+            for start in range(0, len(live), RESORT_CHUNK_SIZE)
+        ])
+        order = np.argsort(keys, kind='stable')
+        self.band_keys = keys[order]
+        self.band_rows = np.repeat(live, BANDS)[order]
+        np.savez(self._file('bands.npz'), keys=self.band_keys, rows=self.band_rows)
+        self.unsorted.clear()
+        self._unsorted_index = None
+
+        ids = np.fromfile(self._file('ids.bin'), 'S16', count)
+        order = np.argsort(ids, kind='stable')
+        _save_npz(self._file('lookup.npz'), ids=ids[order], rows=order.astype(np.int32))
+        self.meta['sorted_count'] = count
+
+    def rebuild_neighbours(self):
+        """Recompute every neighbour list from the band tables in one pass."""
+        count = self.meta['count']
+        bounds = np.flatnonzero(np.diff(self.band_keys)) + 1
+        starts = np.concatenate(([0], bounds)) if len(self.band_keys) else np.zeros(0, dtype=np.int64)
+        sizes = np.diff(np.concatenate((starts, [len(self.band_keys)])))
+        firsts, seconds = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        # Every pair within a bucket, for all buckets of one size at a time
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_BUCKET_SIZE)]):
+            upper = np.triu_indices(size, 1)
+            bucket_starts = starts[sizes == size][:, None]
+            firsts.append(self.band_rows[(bucket_starts + upper[0]).ravel()].astype(np.int64))
+            seconds.append(self.band_rows[(bucket_starts + upper[1]).ravel()].astype(np.int64))
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        pairs = np.unique(np.minimum(first, second) * count + np.maximum(first, second))
+        first, second = pairs // count, pairs % count
+
+        scores = np.concatenate([np.zeros(0)] + [
+            (self.signatures[first[start:start + RESORT_CHUNK_SIZE]]
+             == self.signatures[second[start:start + RESORT_CHUNK_SIZE]]).mean(axis=1)
+            for start in range(0, len(pairs), RESORT_CHUNK_SIZE)
+        ])
+        keep = scores >= MIN_SIMILARITY
+        sources = np.concatenate((first[keep], second[keep]))
+        targets = np.concatenate((second[keep], first[keep]))
+        scores = np.concatenate((scores[keep], scores[keep]))
+        # Rank within each source row, best first
+        order = np.lexsort((-scores, sources))
+        sources, targets, scores = sources[order], targets[order], scores[order]
+        group_starts = np.searchsorted(sources, sources, 'left')
+        rank = np.arange(len(sources)) - group_starts
+        top = rank < TOP_N
+        self.neighbours[:] = -1
+        self.scores[:] = 0
+        self.neighbours[sources[top], rank[top]] = targets[top]
+        self.scores[sources[top], rank[top]] = scores[top]
+
+    def save(self):
+        self.flush()
+        count, sorted_count = self.meta['count'], self.meta['sorted_count']
+        np.fromiter(self.unsorted, np.int32, len(self.unsorted)).tofile(self._file('unsorted.i32'))
+        ids = np.fromfile(self._file('ids.bin'), 'S16', count)[sorted_count:]
+        order = np.argsort(ids, kind='stable')
+        _save_npz(self._file('recent.npz'), ids=ids[order], rows=(order + sorted_count).astype(np.int32))
+
+def _empty_meta(generation):
+    return {
+        'generation': generation,
+        'signature': [NUM_PERM, BANDS],
+        'count': 0,
+        'sorted_count': 0,
+        'synced_until': None,
+    }
+
+def _create_generation(root, meta):
+    path = new_generation_path(root, meta['generation'])
+    for name in ['ids.bin', 'unsorted.i32', *FILES]:
+        open(os.path.join(path, name), 'wb').close()
+    np.savez(os.path.join(path, 'bands.npz'), keys=np.zeros(0, dtype=np.uint64), rows=np.zeros(0, dtype=np.int32))
+    for name in ('lookup.npz', 'recent.npz'):
+        np.savez(os.path.join(path, name), ids=np.zeros(0, dtype='S16'), rows=np.zeros(0, dtype=np.int32))
+
+def _signature_rows(rows):
+    published, removed = [], []
+    for pk, status, _, title, description, tags in rows:
+        shingle_set = shingles(title, description, tags) if status == 'PUBLISHED' else None
+        # A document without words or tags has nothing to be related by
+        if shingle_set:
+            published.append((pk, signature(shingle_set)))
+        else:
+            removed.append(pk)
+    return published, removed
+
+def sync_index(rebuild=False):
+    """
+    Bring the index up to date with published documents: re-sign documents
+    changed since the last sync and update the neighbour lists they touch,
+    or build everything afresh with ``rebuild``. Returns the number of rows
+    changed.
+    """
+    root = settings.RELATED_INDEX_DIR
+    with writer_lock(root):
+        try:
+            meta = read_meta(root)
+        except FileNotFoundError:
+            meta = None
+        if meta is not None and meta['signature'] != [NUM_PERM, BANDS]:
+            rebuild = True
+        if meta is None or rebuild:
+            meta = _empty_meta(meta['generation'] + 1 if meta else 1)
+            _create_generation(root, meta)
+
+        writer = IndexWriter(root, meta)
+        documents = Document.objects.order_by('updated_at', 'pk')
+        if rebuild or meta['synced_until'] is None:
+            documents = documents.filter(status='PUBLISHED')
+        else:
+            documents = documents.filter(updated_at__gte=parse_datetime(meta['synced_until']) - SYNC_OVERLAP)
+        # An empty index is filled first and linked in one pass
+        link = meta['count'] > 0
+
+        started = timezone.now()
+        changed = 0
+        chunk = []
+        with transaction.atomic():
+            rows = documents.values_list('pk', 'status', 'updated_at', 'title', 'description', 'tags')
+            for row in rows.iterator(chunk_size=SYNC_CHUNK_SIZE):
+                chunk.append(row)
+                if len(chunk) >= SYNC_CHUNK_SIZE:
+                    changed += writer.apply(*_signature_rows(chunk), link=link)
+                    chunk = []
+            if chunk:
+                changed += writer.apply(*_signature_rows(chunk), link=link)
+        if not link:
+            writer.resort()
+            writer.rebuild_neighbours()
+        elif len(writer.unsorted) > MAX_UNSORTED:
+            writer.resort()
+        writer.save()
+        # Changes committed while this ran fall inside the next overlap
+        meta['synced_until'] = started.isoformat()
+        write_meta(root, meta)
+        remove_old_generations(root, meta['generation'])
+    return changed
+
+# Signal helpers (see signals.py)
+RELATED_FIELDS = ('status', 'title', 'description', 'tags')
+
+def schedule_related_sync(document, created, previous=None):
+    # ``previous`` is the snapshot taken when the instance was loaded
+    previous = previous or {}
+    state = (document.status, document.title, document.description, tuple(document.tags or ()))
+    if not created and state == tuple(previous.get(field) for field in RELATED_FIELDS):
+        return
+    if 'PUBLISHED' in (document.status, previous.get('status')):
+        request_sync()
+
+def request_sync():
+    def enqueue():
+        # One queued sync covers every change committed before it runs
+        if cache.add(SYNC_QUEUED_KEY, True, timeout=300):
+            from .tasks import enqueue, update_related_index
+
+            enqueue(update_related_index)
+
+    transaction.on_commit(enqueue)
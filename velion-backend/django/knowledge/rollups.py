@@ -0,0 +1,176 @@
+"""
+Daily rollup maintenance for the analytics endpoints.
+
+Rollups are updated incrementally from model signals (see signals.py).
+Bulk paths that bypass signals, such as ``QuerySet.update()``, can leave
+them stale; ``manage.py backfill_rollups`` rebuilds them from source rows.
+"""
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Person, Document, ValidationActivity, ActivityLog,
+    DailyDocumentStats, DailyUserActivity, DailyValidationStats
+)
+
+BACKFILL_BATCH_SIZE = 5000
+
+def _increment(model, keys, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**keys).update(**updates)
+
+def _document_state(document):
+    return (document.document_type, document.quality_score)
+
+def _apply_document_state(day, state, sign):
+    document_type, quality_score = state
+    _increment(
+        DailyDocumentStats,
+        {'date': day, 'document_type': document_type},
+        document_count=sign,
+        quality_sum=sign * (quality_score or 0),
+        quality_count=sign if quality_score is not None else 0,
+    )
+
+def _previous_state(previous):
+    # ``previous`` is the snapshot taken when the instance was loaded
+    if previous and 'document_type' in previous and 'quality_score' in previous:
+        return (previous['document_type'], previous['quality_score'])
+    return None
+
+def record_document_saved(document, created, previous=None):
+    day = timezone.localdate(document.created_at)
+    new_state = _document_state(document)
+    old_state = _previous_state(previous)
+
+    if created:
+        _apply_document_state(day, new_state, 1)
+    elif old_state is not None and old_state != new_state:
+        _apply_document_state(day, old_state, -1)
+        _apply_document_state(day, new_state, 1)
+
+def record_documents_created(documents):
+    # bulk_create() skips post_save, so bulk paths report their rows here
+    totals = defaultdict(lambda: [0, 0, 0])
+    for document in documents:
+        key = (timezone.localdate(document.created_at), document.document_type)
+        totals[key][0] += 1
+        if document.quality_score is not None:
+            totals[key][1] += document.quality_score
+            totals[key][2] += 1
+    for (day, document_type), (count, quality_sum, quality_count) in totals.items():
+        _increment(
+            DailyDocumentStats,
+            {'date': day, 'document_type': document_type},
+            document_count=count,
+            quality_sum=quality_sum,
+            quality_count=quality_count,
+        )
+
+def record_document_deleted(document, previous=None):
+    state = _previous_state(previous) or _document_state(document)
+    _apply_document_state(timezone.localdate(document.created_at), state, -1)
+
+def record_user_activity(person_id, when):
+    DailyUserActivity.objects.bulk_create(
+        [DailyUserActivity(date=timezone.localdate(when), person_id=person_id)],
+        ignore_conflicts=True
+    )
+
+def record_user_activity_bulk(entries):
+    DailyUserActivity.objects.bulk_create(
+        [
+            DailyUserActivity(date=timezone.localdate(when), person_id=person_id)
+            for person_id, when in entries
+        ],
+        batch_size=BACKFILL_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+def record_validation(validation):
+    _increment(
+        DailyValidationStats,
+        {'date': timezone.localdate(validation.created_at), 'action': validation.action},
+        count=1,
+    )
+
+def _date_filter(field, since):
+    return Q(**{f'{field}__date__gte': since}) if since else Q()
+
+@transaction.atomic
+def backfill_document_stats(since=None):
+    DailyDocumentStats.objects.filter(Q(date__gte=since) if since else Q()).delete()
+    rows = Document.objects.filter(_date_filter('created_at', since)).annotate(
+        day=TruncDate('created_at')
+    ).values('day', 'document_type').annotate(
+        document_count=Count('id'),
+        quality_sum=Sum('quality_score'),
+        quality_count=Count('quality_score'),
+    ).order_by()
+
+    stats = [
+        DailyDocumentStats(
+            date=row['day'],
+            document_type=row['document_type'],
+            document_count=row['document_count'],
+            quality_sum=row['quality_sum'] or 0,
+            quality_count=row['quality_count'],
+        )
+        for row in rows
+    ]
+    DailyDocumentStats.objects.bulk_create(stats, batch_size=BACKFILL_BATCH_SIZE)
+    return len(stats)
+
+@transaction.atomic
+def backfill_user_activity(since=None):
+    DailyUserActivity.objects.filter(Q(date__gte=since) if since else Q()).delete()
+
+    # Activity history comes from the activity log plus each person's last_activity
+    sources = [
+        ActivityLog.objects.filter(_date_filter('created_at', since)).annotate(
+            day=TruncDate('created_at')
+        ).values_list('day', 'user_id').distinct().order_by(),
+        Person.objects.filter(_date_filter('last_activity', since)).annotate(
+            day=TruncDate('last_activity')
+        ).values_list('day', 'id').order_by(),
+    ]
+
+    processed = 0
+    for source in sources:
+        batch = []
+        for day, person_id in source.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            batch.append(DailyUserActivity(date=day, person_id=person_id))
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                DailyUserActivity.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+                batch = []
+        if batch:
+            DailyUserActivity.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+    return processed
+
+@transaction.atomic
+def backfill_validation_stats(since=None):
+    DailyValidationStats.objects.filter(Q(date__gte=since) if since else Q()).delete()
+    rows = ValidationActivity.objects.filter(_date_filter('created_at', since)).annotate(
+        day=TruncDate('created_at')
+    ).values('day', 'action').annotate(count=Count('id')).order_by()
+
+    stats = [
+        DailyValidationStats(date=row['day'], action=row['action'], count=row['count'])
+        for row in rows
+    ]
+    DailyValidationStats.objects.bulk_create(stats, batch_size=BACKFILL_BATCH_SIZE)
+    return len(stats)
@@ -0,0 +1,173 @@
+"""
+Batch re-scoring of KnowledgeComponent complexity and readability.
+
+After a change to the scoring formulas, the corpus is re-scored in chunks
+of components: the texts of a chunk are scored together as NumPy arrays
+(``text_analysis.batch_scores``), optionally spread over a process pool,
+and each chunk is written back in one statement, either ``COPY`` into a
+temporary table followed by ``UPDATE ... FROM`` or ``bulk_update``.
+
+The ``scores`` stage record is updated with the results, so the
+extraction pipeline treats re-scored components as current.
+"""
+
+import csv
+import io
+import math
+import multiprocessing
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import text_analysis
+from .extraction import document_text, fingerprint
+from .models import KnowledgeComponent
+
+DEFAULT_CHUNK_SIZE = 2000
+METHODS = ('copy', 'bulk_update')
+STAGE = 'scores'
+
+# The Document fields document_text() reads
+SourceDocument = namedtuple(
+    'SourceDocument', ['title', 'description', 'tags', 'content_hash', 'file_url', 'file_type']
+)
+SOURCE_FIELDS = ['id', 'extraction_stages'] + [f'document__{field}' for field in SourceDocument._fields]
+
+class ScoringReport:
+    def __init__(self):
+        self.scored = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def documents_per_second(self):
+        return self.scored / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            'scored': self.scored,
+            'chunks': self.chunks,
+            'seconds': round(self.seconds, 3),
+            'documents_per_second': round(self.documents_per_second, 1),
+        }
+
+def iter_chunks(chunk_size=DEFAULT_CHUNK_SIZE, stale_only=False):
+    """Yield lists of component rows, in id order with keyset pagination."""
+    components = KnowledgeComponent.objects.all()
+    if stale_only:
+        version = text_analysis.STAGES[STAGE][0]
+        components = components.exclude(extraction_stages__contains={STAGE: {'version': version}})
+    last_id = 0
+    while True:
+        rows = list(
+            components.filter(id__gt=last_id).order_by('id').values_list(*SOURCE_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+def chunk_texts(rows):
+    return [document_text(SourceDocument(*row[2:])) for row in rows]
+
+def _score_value(value):
+    return None if math.isnan(value) else float(value)
+
+def write_scores_copy(rows, texts, complexity, readability):
+    """``COPY`` the chunk into a temporary table and apply it with one UPDATE."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row, text, complexity_score, readability_score in zip(rows, texts, complexity, readability):
+        writer.writerow([
+            row[0],
+            '' if math.isnan(complexity_score) else repr(float(complexity_score)),
+            '' if math.isnan(readability_score) else repr(float(readability_score)),
+            fingerprint(text),
+        ])
+    buffer.seek(0)
+
+    table = KnowledgeComponent._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE knowledge_scores ('
+            'id bigint PRIMARY KEY, complexity double precision, '
+            'readability double precision, input text'
+            ') ON COMMIT DROP'
+        )
+        cursor.copy_expert('COPY knowledge_scores FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(
+            f'UPDATE "{table}" AS k SET '
+            'complexity_score = s.complexity, readability_score = s.readability, '
+            "extraction_stages = jsonb_set(k.extraction_stages, %s, "
+            "jsonb_build_object('version', %s, 'input', s.input)), "
+            'updated_at = %s '
+            'FROM knowledge_scores AS s WHERE k.id = s.id',
+            [[STAGE], text_analysis.STAGES[STAGE][0], timezone.now()]
+        )
+
+def write_scores_bulk_update(rows, texts, complexity, readability):
+    version = text_analysis.STAGES[STAGE][0]
+    now = timezone.now()
+    components = [
+        KnowledgeComponent(
+            id=row[0],
+            complexity_score=_score_value(complexity_score),
+            readability_score=_score_value(readability_score),
+            extraction_stages={**(row[1] or {}), STAGE: {'version': version, 'input': fingerprint(text)}},
+            updated_at=now,
+        )
+        for row, text, complexity_score, readability_score in zip(rows, texts, complexity, readability)
+    ]
+    KnowledgeComponent.objects.bulk_update(
+        components,
+        ['complexity_score', 'readability_score', 'extraction_stages', 'updated_at'],
+    )
+
+WRITERS = {
+    'copy': write_scores_copy,
+    'bulk_update': write_scores_bulk_update,
+}
+
+def process_pool(processes):
+    # spawn: the children only import text_analysis, never Django
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+def rescore(chunk_size=DEFAULT_CHUNK_SIZE, processes=0, method='copy', stale_only=False):
+    """
+    Re-score components and return a ScoringReport. With ``processes``,
+    chunks are scored in a pool while the next chunks are read and earlier
+    results are written.
+    """
+    write = WRITERS[method]
+    report = ScoringReport()
+    started = time.perf_counter()
+
+    def finish(rows, texts, scores):
+        complexity, readability = scores
+        write(rows, texts, complexity, readability)
+        report.scored += len(rows)
+        report.chunks += 1
+
+    if processes <= 0:
+        for rows in iter_chunks(chunk_size, stale_only):
+            texts = chunk_texts(rows)
+            finish(rows, texts, text_analysis.batch_scores(texts))
+    else:
+        with process_pool(processes) as executor:
+            in_flight = deque()
+            for rows in iter_chunks(chunk_size, stale_only):
+                texts = chunk_texts(rows)
+                in_flight.append((rows, texts, executor.submit(text_analysis.batch_scores, texts)))
+                # Bounded, so memory stays at a few chunks per process
+                if len(in_flight) >= processes * 2:
+                    rows, texts, future = in_flight.popleft()
+                    finish(rows, texts, future.result())
+            while in_flight:
+                rows, texts, future = in_flight.popleft()
+                finish(rows, texts, future.result())
+
+    report.seconds = time.perf_counter() - started
+    return report
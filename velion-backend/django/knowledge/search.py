@@ -0,0 +1,167 @@
+import hashlib
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from django.core.cache import cache
+from django.db.models import Q, F, Case, When, Func, TextField, FloatField, Value
+from django.db.models.functions import Concat, Greatest
+
+from . import caching
+from .models import Person, Document
+
+SEARCH_CONFIG = 'english'
+
+SORT_FIELDS = {
+    'date': 'created_at',
+    'quality': 'quality_score',
+    'views': 'view_count',
+}
+
+PERSON_TYPEAHEAD_TIMEOUT = 30  # seconds, hot prefixes repeat within a typing burst
+# Person fields the typeahead matches, shows or filters on
+PERSON_SEARCH_FIELDS = ('email', 'first_name', 'last_name', 'employee_id', 'is_active')
+EMPLOYEE_ID_PREFIX_BOOST = 1.0
+
+HEADLINE_OPTIONS = {
+    'start_sel': '<mark>',
+    'stop_sel': '</mark>',
+    'max_words': 35,
+    'min_words': 15,
+    'max_fragments': 2,
+}
+
+def document_search_vector():
+    tags = Func(F('tags'), Value(' '), function='array_to_string', output_field=TextField())
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(tags, weight='B', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+def update_search_vector(document, created=False, previous=None):
+    # ``previous`` is the snapshot taken when the instance was loaded
+    state = (document.title, document.description, tuple(document.tags or ()))
+    if not created and previous and state == tuple(
+        previous.get(field) for field in ('title', 'description', 'tags')
+    ):
+        return
+    Document.objects.filter(pk=document.pk).update(search_vector=document_search_vector())
+
+def build_search_query(query):
+    return SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+
+def filter_documents(queryset, data):
+    # Structured filters shared by every document search entry point
+    if data.get('document_type'):
+        queryset = queryset.filter(document_type__in=data['document_type'])
+
+    if data.get('tags'):
+        for tag in data['tags']:
+            queryset = queryset.filter(tags__contains=[tag])
+
+    if data.get('date_from'):
+        queryset = queryset.filter(created_at__date__gte=data['date_from'])
+
+    if data.get('date_to'):
+        queryset = queryset.filter(created_at__date__lte=data['date_to'])
+
+    if data.get('quality_min') is not None:
+        queryset = queryset.filter(quality_score__gte=data['quality_min'])
+
+    if data.get('quality_max') is not None:
+        queryset = queryset.filter(quality_score__lte=data['quality_max'])
+
+    return queryset
+
+def search_documents(queryset, data):
+    search_query = build_search_query(data['query']) if data.get('query') else None
+    if search_query is not None:
+        queryset = queryset.filter(search_vector=search_query)
+
+    queryset = filter_documents(queryset, data)
+
+    prefix = '-' if data['sort_order'] == 'desc' else ''
+    if data['sort_by'] == 'relevance' and search_query is not None:
+        queryset = queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by(f'{prefix}rank', '-created_at')
+    else:
+        # Relevance without a query has nothing to rank on
+        sort_field = SORT_FIELDS.get(data['sort_by'], 'created_at')
+        queryset = queryset.order_by(f'{prefix}{sort_field}')
+
+    return queryset, search_query
+
+def attach_highlights(documents, search_query):
+    # Headlines are costly, so only build them for the rows being returned
+    documents = list(documents)
+    if search_query is None or not documents:
+        return documents
+
+    highlights = {
+        row['pk']: row
+        for row in Document.objects.filter(
+            pk__in=[document.pk for document in documents]
+        ).annotate(
+            title_highlight=SearchHeadline(
+                'title', search_query, config=SEARCH_CONFIG, highlight_all=True,
+                start_sel=HEADLINE_OPTIONS['start_sel'], stop_sel=HEADLINE_OPTIONS['stop_sel']
+            ),
+            description_highlight=SearchHeadline(
+                'description', search_query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS
+            ),
+        ).values('pk', 'title_highlight', 'description_highlight')
+    }
+
+    for document in documents:
+        row = highlights.get(document.pk, {})
+        document.highlight = {
+            'title': row.get('title_highlight'),
+            'description': row.get('description_highlight'),
+        }
+    return documents
+
+def _person_typeahead_key(query, limit):
+    # Keyed on its own version, bumped only by edits to searched fields, so
+    # edits show up before the entry expires but activity does not evict it
+    version = caching.get_versions(['people-search'])[0]
+    digest = hashlib.md5(query.lower().encode('utf-8')).hexdigest()
+    return f'person-typeahead:{version}:{limit}:{digest}'
+
+def search_people(query, limit=10):
+    # Substring matches are served by the trigram GIN indexes on Person
+    full_name = Concat('first_name', Value(' '), 'last_name', output_field=TextField())
+    return Person.objects.filter(is_active=True).filter(
+        Q(email__icontains=query) |
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(employee_id__icontains=query)
+    ).annotate(
+        rank=Greatest(
+            TrigramSimilarity('email', query),
+            TrigramSimilarity(full_name, query),
+            TrigramSimilarity('employee_id', query),
+        ) + Case(
+            When(employee_id__istartswith=query, then=Value(EMPLOYEE_ID_PREFIX_BOOST)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    ).order_by('-rank', 'last_name', 'first_name')[:limit]
+
+def remember_person_search_state(person):
+    loaded = person.__dict__
+    person._search_state = tuple(loaded.get(field) for field in PERSON_SEARCH_FIELDS)
+
+def person_search_changed(person, created):
+    previous = getattr(person, '_search_state', None)
+    remember_person_search_state(person)
+    return created or person._search_state != previous
+
+def cached_people_search(query, limit, serialize):
+    key = _person_typeahead_key(query, limit)
+    results = cache.get(key)
+    if results is None:
+        results = serialize(search_people(query, limit))
+        cache.set(key, results, PERSON_TYPEAHEAD_TIMEOUT)
+    return results
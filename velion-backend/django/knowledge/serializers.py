@@ -1,13 +1,27 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import models
 from .models import (
     Person, Document, KnowledgeComponent, Project, 
     Workspace, WorkspaceMembership, BlockchainTransaction,
     AnalyticsComponent, ValidationActivity, ActivityLog
 )
+from . import access, counters
 
 User = get_user_model()
 
+def validate_workspace_member(serializer, workspace):
+    # Documents are filed into a workspace only by its members
+    request = serializer.context.get('request')
+    instance = getattr(serializer, 'instance', None)
+    if workspace is None or request is None or access.is_admin(request.user):
+        return workspace
+    if instance is not None and instance.workspace_id == workspace.pk:
+        return workspace
+    if str(workspace.pk) not in access.get_memberships(request.user):
+        raise serializers.ValidationError('You are not a member of this workspace')
+    return workspace
+
 class PersonSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     
@@ -22,6 +36,19 @@ class PersonSerializer(serializers.ModelSerializer):
     
     def get_full_name(self, obj):
         return obj.get_full_name()
+    
+    def validate_skills(self, value):
+        # Skill-gap counts assume each skill appears once per person
+        return list(dict.fromkeys(skill.strip() for skill in value if skill.strip()))
+
+class DocumentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Fetch buffered counter deltas for the whole page in one call
+        documents = list(data.all() if isinstance(data, models.Manager) else data)
+        pending = counters.pending([document.pk for document in documents])
+        for document in documents:
+            document._pending_counters = pending.get(str(document.pk), {})
+        return super().to_representation(documents)
 
 class DocumentSerializer(serializers.ModelSerializer):
     uploader_name = serializers.SerializerMethodField()
@@ -29,22 +56,88 @@ class DocumentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Document
+        list_serializer_class = DocumentListSerializer
         fields = [
             'id', 'title', 'description', 'content_hash', 'blockchain_tx_id',
             'uploader', 'uploader_name', 'status', 'document_type', 'quality_score',
             'metadata', 'tags', 'file_url', 'file_size', 'file_size_mb', 'file_type',
-            'version', 'view_count', 'download_count', 'created_at', 'updated_at',
-            'published_at'
+            'version', 'previous_version', 'workspace', 'view_count', 'download_count',
+            'created_at', 'updated_at', 'published_at'
         ]
         read_only_fields = [
-            'content_hash', 'view_count', 'download_count', 'created_at', 'updated_at'
+            'content_hash', 'previous_version', 'view_count', 'download_count',
+            'created_at', 'updated_at'
         ]
     
+    def validate_workspace(self, value):
+        return validate_workspace_member(self, value)
+    
     def get_uploader_name(self, obj):
         return obj.uploader.get_full_name() if obj.uploader else None
     
     def get_file_size_mb(self, obj):
         return obj.get_file_size_mb()
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        
+        # Merge increments that have not been flushed to the database yet
+        pending = getattr(instance, '_pending_counters', None)
+        if pending is None:
+            pending = counters.pending([instance.pk]).get(str(instance.pk), {})
+        for field in counters.COUNTER_FIELDS:
+            if field in data:
+                data[field] += pending.get(field, 0)
+        return data
+
+class DocumentSearchResultSerializer(DocumentSerializer):
+    rank = serializers.FloatField(read_only=True, default=None)
+    highlight = serializers.DictField(read_only=True, default=None)
+    
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ['rank', 'highlight']
+
+class SemanticSearchResultSerializer(DocumentSerializer):
+    score = serializers.FloatField(read_only=True)
+    
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ['score']
+
+class RelatedDocumentSerializer(DocumentSerializer):
+    similarity = serializers.FloatField(read_only=True)
+    
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ['similarity']
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    file = serializers.FileField(write_only=True)
+    # Multipart fields arrive as strings
+    metadata = serializers.JSONField(binary=True, required=False)
+    # What to do when identical content already exists
+    on_duplicate = serializers.ChoiceField(choices=['return', 'version'], default='return')
+    
+    class Meta:
+        model = Document
+        fields = [
+            'file', 'title', 'description', 'document_type', 'tags', 'metadata',
+            'workspace', 'on_duplicate'
+        ]
+        extra_kwargs = {'title': {'required': False}}
+    
+    def validate_workspace(self, value):
+        return validate_workspace_member(self, value)
+
+class DocumentImportSerializer(serializers.ModelSerializer):
+    # Uploaders are resolved in bulk by the importer, not per row
+    uploader_employee_id = serializers.CharField(required=False, allow_blank=True)
+    
+    class Meta:
+        model = Document
+        fields = [
+            'title', 'description', 'content_hash', 'uploader_employee_id',
+            'status', 'document_type', 'quality_score', 'metadata', 'tags',
+            'file_url', 'file_size', 'file_type', 'version', 'published_at'
+        ]
 
 class KnowledgeComponentSerializer(serializers.ModelSerializer):
     document_title = serializers.SerializerMethodField()
@@ -56,9 +149,12 @@ class KnowledgeComponentSerializer(serializers.ModelSerializer):
             'id', 'document', 'document_title', 'summary', 'key_topics', 'entities',
             'sentiment_score', 'complexity_score', 'readability_score',
             'validation_status', 'validated_by', 'validated_by_name', 'validated_at',
-            'feedback', 'created_at', 'updated_at'
+            'feedback', 'extraction_status', 'extraction_error', 'extracted_at',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'extraction_status', 'extraction_error', 'extracted_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
     
     def get_document_title(self, obj):
         return obj.document.title if obj.document else None
@@ -86,7 +182,14 @@ class ProjectSerializer(serializers.ModelSerializer):
     def get_duration_days(self, obj):
         return obj.get_duration_days()
     
+    def validate_tags(self, value):
+        # Skill-gap demand counts each tag once per project
+        return list(dict.fromkeys(tag.strip() for tag in value if tag.strip()))
+    
     def get_team_members_count(self, obj):
+        # Use the viewset's annotation when present
+        if hasattr(obj, 'team_members_count'):
+            return obj.team_members_count
         return obj.team_members.count()
 
 class WorkspaceSerializer(serializers.ModelSerializer):
@@ -106,6 +209,9 @@ class WorkspaceSerializer(serializers.ModelSerializer):
         return obj.created_by.get_full_name() if obj.created_by else None
     
     def get_member_count(self, obj):
+        # Use the viewset's annotation when present
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
         return obj.memberships.count()
 
 class WorkspaceMembershipSerializer(serializers.ModelSerializer):
@@ -214,11 +320,39 @@ class DocumentSearchSerializer(serializers.Serializer):
         default='desc'
     )
 
+class SemanticSearchSerializer(DocumentSearchSerializer):
+    # Same filters as keyword search; results are always ordered by similarity
+    query = serializers.CharField()
+    sort_by = None
+    sort_order = None
+
+class SkillGapQuerySerializer(serializers.Serializer):
+    # Supply filters; demand always covers every planned or active project
+    department = serializers.CharField(required=False)
+    region = serializers.CharField(required=False)
+    expertise_level = serializers.ChoiceField(
+        choices=['JUNIOR', 'INTERMEDIATE', 'SENIOR', 'LEAD'],
+        required=False
+    )
+    segment_by = serializers.ChoiceField(
+        choices=['department', 'region', 'expertise_level'],
+        required=False
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=500, required=False)
+
 class GraphQuerySerializer(serializers.Serializer):
-    entity_id = serializers.UUIDField(required=False)
+    # People have integer ids, everything else UUIDs
+    entity_id = serializers.CharField(required=False)
     entity_type = serializers.ChoiceField(
-        choices=['document', 'person', 'topic', 'project'],
+        choices=['document', 'person', 'project', 'workspace'],
         required=False
     )
     depth = serializers.IntegerField(min_value=1, max_value=5, default=2)
-    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
\ No newline at end of file
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+    
+    def validate(self, data):
+        if bool(data.get('entity_id')) != bool(data.get('entity_type')):
+            raise serializers.ValidationError(
+                'entity_id and entity_type must be given together'
+            )
+        return data
@@ -0,0 +1,215 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import (
+    post_init, post_save, post_delete, pre_migrate, post_migrate, m2m_changed
+)
+from django.dispatch import receiver
+
+from . import (
+    access, caching, extraction, graph, partitions, related_index, rollups, search, skills,
+    vector_index
+)
+from .models import (
+    Person, Document, Project, ValidationActivity, Workspace, WorkspaceMembership
+)
+
+@receiver(pre_migrate)
+def install_postgres_extensions(sender, using, **kwargs):
+    # The Person typeahead indexes use gin_trgm_ops
+    if sender.name != 'knowledge':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+@receiver(post_migrate)
+def prepare_activity_log_partitions(sender, using, **kwargs):
+    # A fresh (empty) activity_log is converted in place; existing data
+    # needs an explicit maintain_activity_log --convert
+    if sender.name != 'knowledge':
+        return
+    partitions.maintain_partitions(
+        settings.ACTIVITY_LOG_PARTITIONS_AHEAD,
+        retention_months=0,
+        convert=partitions.table_is_empty(),
+    )
+
+# Every Document field a save handler below compares, snapshotted once
+# per instance and diffed by a single post_save dispatcher
+DOCUMENT_STATE_FIELDS = (
+    'title', 'description', 'tags', 'content_hash', 'status', 'document_type', 'quality_score',
+    'uploader_id', 'workspace_id',
+)
+
+@receiver(post_init, sender=Document)
+def remember_document_state(sender, instance, **kwargs):
+    # Avoid loading deferred fields, which would cost a query per instance
+    loaded = instance.__dict__
+    instance._saved_state = {
+        field: tuple(loaded[field] or ()) if field == 'tags' else loaded[field]
+        for field in DOCUMENT_STATE_FIELDS if field in loaded
+    }
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, created, **kwargs):
+    previous = instance._saved_state
+    rollups.record_document_saved(instance, created, previous)
+    search.update_search_vector(instance, created, previous)
+    extraction.schedule_extraction(instance, created, previous)
+    vector_index.schedule_sync(instance, previous)
+    related_index.schedule_related_sync(instance, created, previous)
+    graph.publish(graph.document_events(instance, created, previous))
+    remember_document_state(sender, instance)
+
+@receiver(post_delete, sender=Document)
+def remove_document_rollups(sender, instance, **kwargs):
+    rollups.record_document_deleted(instance, instance._saved_state)
+
+@receiver(post_init, sender=Person)
+def remember_last_activity(sender, instance, **kwargs):
+    instance._rollup_last_activity = instance.__dict__.get('last_activity')
+
+@receiver(post_save, sender=Person)
+def update_activity_rollups(sender, instance, created, **kwargs):
+    if created or instance.last_activity != instance._rollup_last_activity:
+        rollups.record_user_activity(instance.pk, instance.last_activity)
+        instance._rollup_last_activity = instance.last_activity
+        caching.bump_version_on_commit('people')
+
+@receiver(post_delete, sender=Person)
+def bump_people_version_on_delete(sender, **kwargs):
+    caching.bump_version_on_commit('people')
+    caching.bump_version_on_commit('people-search')
+
+# People typeahead results
+@receiver(post_init, sender=Person)
+def remember_person_search_state(sender, instance, **kwargs):
+    search.remember_person_search_state(instance)
+
+@receiver(post_save, sender=Person)
+def bump_people_version_on_search_change(sender, instance, created, **kwargs):
+    if search.person_search_changed(instance, created):
+        caching.bump_version_on_commit('people-search')
+
+@receiver(post_save, sender=ValidationActivity)
+def update_validation_rollups(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_validation(instance)
+
+# Cached workspace memberships (access.py)
+@receiver(post_init, sender=WorkspaceMembership)
+def remember_membership_access_state(sender, instance, **kwargs):
+    access.remember_membership_state(instance)
+
+@receiver(post_save, sender=WorkspaceMembership)
+def invalidate_saved_membership_access(sender, instance, created, **kwargs):
+    access.membership_saved(instance, created)
+
+@receiver(post_delete, sender=WorkspaceMembership)
+def invalidate_deleted_membership_access(sender, instance, **kwargs):
+    access.invalidate_memberships(instance.person_id)
+
+# Response cache invalidation
+CACHE_RESOURCES = {
+    Document: 'documents',
+    ValidationActivity: 'validations',
+    Workspace: 'workspaces',
+    WorkspaceMembership: 'workspaces',
+}
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_cache_version(sender, **kwargs):
+    resource = CACHE_RESOURCES.get(sender)
+    if resource:
+        caching.bump_version_on_commit(resource)
+
+# Skill-gap results depend on a few fields only; logins and other
+# profile edits leave them cached
+@receiver(post_init, sender=Person)
+def remember_person_skills_state(sender, instance, **kwargs):
+    skills.remember_state(instance, skills.PERSON_FIELDS)
+
+@receiver(post_init, sender=Project)
+def remember_project_skills_state(sender, instance, **kwargs):
+    skills.remember_state(instance, skills.PROJECT_FIELDS)
+
+@receiver(post_save, sender=Person)
+def bump_person_skills_version(sender, instance, created, **kwargs):
+    if skills.state_changed(instance, skills.PERSON_FIELDS, created):
+        caching.bump_version_on_commit('skills')
+
+@receiver(post_save, sender=Project)
+def bump_project_skills_version(sender, instance, created, **kwargs):
+    if skills.state_changed(instance, skills.PROJECT_FIELDS, created):
+        caching.bump_version_on_commit('skills')
+
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=Project)
+def bump_skills_version_on_delete(sender, **kwargs):
+    caching.bump_version_on_commit('skills')
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+def bump_team_skills_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.bump_version_on_commit('skills')
+
+# Knowledge graph change events
+@receiver(post_init, sender=Person)
+def remember_person_graph_state(sender, instance, **kwargs):
+    graph.remember_state(instance, ('is_active',))
+
+@receiver(post_init, sender=Workspace)
+def remember_workspace_graph_state(sender, instance, **kwargs):
+    graph.remember_state(instance, ('project_id', 'is_private'))
+
+@receiver(post_save, sender=Person)
+def update_person_graph(sender, instance, created, **kwargs):
+    graph.publish(graph.person_events(instance, created))
+    graph.remember_state(instance, ('is_active',))
+
+@receiver(post_save, sender=Project)
+def update_project_graph(sender, instance, **kwargs):
+    graph.publish([('node', ('project', str(instance.pk)), instance.name)])
+
+@receiver(post_save, sender=Workspace)
+def update_workspace_graph(sender, instance, created, **kwargs):
+    graph.publish(graph.workspace_events(instance, created))
+    graph.remember_state(instance, ('project_id', 'is_private'))
+
+GRAPH_NODE_TYPES = {
+    Person: 'person',
+    Document: 'document',
+    Project: 'project',
+    Workspace: 'workspace',
+}
+
+@receiver(post_delete)
+def remove_graph_node(sender, instance, **kwargs):
+    node_type = GRAPH_NODE_TYPES.get(sender)
+    if node_type:
+        graph.publish([('drop', (node_type, str(instance.pk)))])
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+@receiver(m2m_changed, sender=Project.documents.through)
+def update_project_graph_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    relation = 'team_members' if sender is Project.team_members.through else 'documents'
+    if action == 'pre_clear':
+        # clear() does not report which rows it removes
+        if reverse:
+            related = Project.objects.filter(**{relation: instance})
+        else:
+            related = getattr(instance, relation).all()
+        instance._graph_cleared = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        kind, pk_set = 'remove', getattr(instance, '_graph_cleared', [])
+    elif action in ('post_add', 'post_remove'):
+        kind = 'add' if action == 'post_add' else 'remove'
+    else:
+        return
+    
+    if reverse:
+        project_ids, related_ids = pk_set, [instance.pk]
+    else:
+        project_ids, related_ids = [instance.pk], pk_set
+    graph.publish(graph.membership_events(relation, project_ids, related_ids, kind))
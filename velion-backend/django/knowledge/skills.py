@@ -0,0 +1,142 @@
+"""
+Skill-gap analysis: supply from ``Person.skills``, demand from the tags
+of planned and active projects.
+
+Each tag of a demand project asks for at least one person with that
+skill. A project is staffed for a skill when one of its team members has
+it. Both sides are grouped aggregations over ``unnest`` of the arrays,
+one query each. Skills and tags match exactly, as tag filters do
+elsewhere, and are kept free of duplicates by the serializers, so rows
+are counted without a per-row DISTINCT.
+
+Results are cached under the ``skills`` version, bumped only by changes
+to the fields read here (see signals.py).
+"""
+
+from django.db import connection
+
+from .models import Person, Project
+
+DEMAND_STATUSES = ('PLANNING', 'ACTIVE')
+SEGMENTS = ('department', 'region', 'expertise_level')
+# Fields whose changes invalidate cached results
+PERSON_FIELDS = ('skills', 'is_active') + SEGMENTS
+PROJECT_FIELDS = ('status', 'tags')
+# The GIN index on skills narrows supply to people with a demanded skill;
+# past this many skills it would match nearly everyone anyway
+OVERLAP_FILTER_MAX_SKILLS = 50
+HIGH_GAP_RATIO = 0.5  # share of demand without supply that makes a gap urgent
+
+def get_demand():
+    """``{skill: (projects, staffed)}`` over the tags of demand projects."""
+    project_table = Project._meta.db_table
+    team_table = Project.team_members.through._meta.db_table
+    person_table = Person._meta.db_table
+    with connection.cursor() as cursor:
+        # The (project, skill) pairs its team covers, joined back to the tags
+        cursor.execute(
+            f'SELECT t.skill, count(*), count(covered.project_id) '
+            f'FROM "{project_table}" AS pr CROSS JOIN LATERAL unnest(pr.tags) AS t(skill) '
+            f'LEFT JOIN ('
+            f'  SELECT DISTINCT m.project_id, s.skill FROM "{team_table}" AS m '
+            f'  JOIN "{project_table}" AS q ON q.id = m.project_id '
+            f'  JOIN "{person_table}" AS p ON p.id = m.person_id '
+            f'  CROSS JOIN LATERAL unnest(p.skills) AS s(skill) '
+            f'  WHERE q.status = ANY(%s) AND p.is_active AND s.skill = ANY(q.tags)'
+            f') AS covered ON covered.project_id = pr.id AND covered.skill = t.skill '
+            f'WHERE pr.status = ANY(%s) '
+            f'GROUP BY t.skill',
+            [list(DEMAND_STATUSES), list(DEMAND_STATUSES)]
+        )
+        return {skill: (projects, staffed) for skill, projects, staffed in cursor.fetchall()}
+
+def get_supply(skills, filters=None, segment_by=None):
+    """
+    ``({skill: people}, {skill: {segment value: people}})`` for active
+    people with any of ``skills``, restricted to ``filters`` (segment field
+    -> value). The breakdown is empty without ``segment_by``.
+    """
+    if not skills:
+        return {}, {}
+    person_table = Person._meta.db_table
+    skills = list(skills)
+    conditions = ['p.is_active', 's.skill = ANY(%s::varchar[])']
+    params = [skills]
+    if len(skills) <= OVERLAP_FILTER_MAX_SKILLS:
+        conditions.append('p.skills && %s::varchar[]')
+        params.append(skills)
+    for field, value in (filters or {}).items():
+        conditions.append(f'p.{SEGMENTS[SEGMENTS.index(field)]} = %s')
+        params.append(value)
+    # Totals and the per-segment breakdown in one pass
+    if segment_by:
+        segment = f'p.{SEGMENTS[SEGMENTS.index(segment_by)]}'
+        grouping = f'GROUPING SETS ((s.skill), (s.skill, {segment}))'
+        selected = f'{segment}, GROUPING({segment}) = 0'
+    else:
+        grouping = 's.skill'
+        selected = 'NULL, false'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT s.skill, {selected}, count(*) '
+            f'FROM "{person_table}" AS p CROSS JOIN LATERAL unnest(p.skills) AS s(skill) '
+            f'WHERE {" AND ".join(conditions)} '
+            f'GROUP BY {grouping}',
+            params
+        )
+        totals, breakdown = {}, {}
+        for skill, value, segmented, people in cursor.fetchall():
+            if segmented:
+                breakdown.setdefault(skill, {})[value] = people
+            else:
+                totals[skill] = people
+    return totals, breakdown
+
+def prioritize(required, available, unstaffed):
+    gap = max(required - available, 0)
+    if available == 0:
+        return 'HIGH', 'Hire External Talent'
+    if gap and gap / required >= HIGH_GAP_RATIO:
+        return 'HIGH', 'Contract Hiring'
+    if gap:
+        return 'MEDIUM', 'Training Program'
+    if unstaffed:
+        return 'LOW', 'Internal Staffing'
+    return 'LOW', 'None'
+
+def skill_gaps(filters=None, segment_by=None, limit=None):
+    """Demanded skills, largest gap first."""
+    demand = get_demand()
+    supply, breakdown = get_supply(demand, filters, segment_by)
+    results = []
+    for skill, (required, staffed) in demand.items():
+        available = supply.get(skill, 0)
+        priority, action = prioritize(required, available, required - staffed)
+        row = {
+            'skill': skill,
+            'required': required,
+            'staffed': staffed,
+            'available': available,
+            'gap': max(required - available, 0),
+            'unstaffed': required - staffed,
+            'priority': priority,
+            'action': action,
+        }
+        if segment_by:
+            row['segments'] = [
+                {segment_by: value, 'available': people}
+                for value, people in sorted(breakdown.get(skill, {}).items(), key=lambda item: -item[1])
+            ]
+        results.append(row)
+    results.sort(key=lambda row: (-row['gap'], -row['unstaffed'], -row['required'], row['skill']))
+    return results[:limit] if limit else results
+
+# Signal helpers (see signals.py)
+def remember_state(instance, fields):
+    loaded = instance.__dict__
+    instance._skills_state = tuple(loaded.get(field) for field in fields)
+
+def state_changed(instance, fields, created):
+    previous = getattr(instance, '_skills_state', None)
+    remember_state(instance, fields)
+    return created or instance._skills_state != previous
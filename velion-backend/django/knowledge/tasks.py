@@ -0,0 +1,57 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+
+from . import extraction, graph, related_index, vector_index
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF = 10  # seconds, doubled on every retry
+
+def enqueue(task, *args, **kwargs):
+    """
+    Queue ``task`` for a worker. Without a broker (see settings) it runs
+    inline and holds up the caller, so that is logged.
+    """
+    if settings.CELERY_BROKER_URL or settings.CELERY_TASK_ALWAYS_EAGER:
+        return task.delay(*args, **kwargs)
+    logger.warning('No Celery broker configured, running %s inline', task.name)
+    return task.apply(args=args, kwargs=kwargs)
+
+@shared_task(bind=True, max_retries=settings.EXTRACTION_MAX_RETRIES)
+def extract_knowledge(self, document_id, force=False):
+    try:
+        return extraction.process_document(document_id, force=force)
+    except extraction.TRANSIENT_ERRORS as error:
+        if self.request.retries >= self.max_retries:
+            logger.exception('Extraction for document %s failed after %s retries', document_id, self.max_retries)
+            extraction.mark_failed(document_id, error)
+            return None
+        raise self.retry(exc=error, countdown=RETRY_BACKOFF * 2 ** self.request.retries)
+    except Exception as error:
+        # Analysis errors are deterministic, retrying would not help
+        logger.exception('Extraction for document %s failed', document_id)
+        extraction.mark_failed(document_id, error)
+        return None
+
+@shared_task
+def reprocess_corpus(stale_only=True, force=False):
+    return extraction.request_corpus_extraction(stale_only=stale_only, force=force)
+
+@shared_task
+def update_vector_index():
+    # Cleared first, so a change committed from now on queues another run
+    cache.delete(vector_index.SYNC_QUEUED_KEY)
+    return vector_index.sync_index()
+
+@shared_task
+def update_related_index():
+    cache.delete(related_index.SYNC_QUEUED_KEY)
+    return related_index.sync_index()
+
+@shared_task
+def rebuild_graph_snapshot():
+    cache.delete(graph.SNAPSHOT_QUEUED_KEY)
+    graph.write_snapshot()
@@ -0,0 +1,67 @@
+"""
+Query-budget helpers for tests and benchmarks.
+
+Usage from a test case::
+
+    with assert_max_queries(3):
+        client.get('/api/documents/')
+
+    check_query_budget(client, '/api/documents/', ENDPOINT_QUERY_BUDGETS['/api/documents/'])
+"""
+
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+# Queries per request with force_authenticate (JWT auth adds one user lookup),
+# independent of page size
+ENDPOINT_QUERY_BUDGETS = {
+    '/api/documents/': 2,
+    '/api/documents/pending_validations/': 2,
+    '/api/documents/recent/': 1,
+    '/api/projects/': 2,
+    '/api/workspaces/': 2,
+    '/api/users/': 2,
+}
+
+PAGE_SIZES = (1, 20, 100)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def assert_max_queries(budget, using=DEFAULT_DB_ALIAS):
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > budget:
+        statements = '\n'.join(query['sql'] for query in context.captured_queries)
+        raise QueryBudgetExceeded(
+            f'{executed} queries executed, budget is {budget}:\n{statements}'
+        )
+
+def count_queries(client, method, url, data=None, using=DEFAULT_DB_ALIAS, **extra):
+    with CaptureQueriesContext(connections[using]) as context:
+        response = getattr(client, method)(url, data, **extra)
+    return response, len(context.captured_queries)
+
+def check_query_budget(client, url, budget, method='get', data=None,
+                       page_sizes=PAGE_SIZES, page_size_param='page_size'):
+    """
+    Request ``url`` at several page sizes and check the query count stays
+    within ``budget`` and does not change with the page size.
+    """
+    counts = {}
+    for page_size in page_sizes:
+        separator = '&' if '?' in url else '?'
+        paged_url = f'{url}{separator}{page_size_param}={page_size}'
+        response, counts[page_size] = count_queries(client, method, paged_url, data)
+        if response.status_code >= 400:
+            raise AssertionError(f'{method.upper()} {paged_url} returned {response.status_code}')
+
+    if max(counts.values()) > budget:
+        raise QueryBudgetExceeded(f'{url}: query counts {counts} exceed budget {budget}')
+    if len(set(counts.values())) > 1:
+        raise QueryBudgetExceeded(f'{url}: query count grows with page size {counts}')
+    return counts
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from knowledge import access
+from knowledge.models import Document, Person, Workspace, WorkspaceMembership
+from knowledge.permissions import IsWorkspaceMember
+
+class MembershipCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        cls.workspace = Workspace.objects.create(name='Private', created_by=cls.user, is_private=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def join(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkspaceMembership.objects.create(workspace=self.workspace, person=self.user, role='MEMBER')
+
+    def test_cached_until_a_membership_changes(self):
+        self.assertEqual(access.get_memberships(self.user), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(access.get_memberships(self.user), {})
+        self.join()
+        self.assertIsNone(access.get_memberships(self.user, build=False))
+        self.assertEqual(access.get_memberships(self.user), {str(self.workspace.pk): 'MEMBER'})
+
+    def test_refill_racing_a_change_is_not_served(self):
+        load = access.load_memberships
+
+        def load_then_join(user):
+            # The change commits after the rows were read, before they are cached
+            memberships = load(user)
+            self.join()
+            return memberships
+
+        with mock.patch.object(access, 'load_memberships', load_then_join):
+            self.assertEqual(access.get_memberships(self.user), {})
+        self.assertEqual(access.get_memberships(self.user), {str(self.workspace.pk): 'MEMBER'})
+
+class WorkspacePermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        cls.workspace = Workspace.objects.create(name='Team', created_by=cls.user)
+        WorkspaceMembership.objects.create(workspace=cls.workspace, person=cls.user, role='MEMBER')
+        cls.outsider = Person.objects.create_user(email='o@example.com', password='x', employee_id='O1')
+        cls.document = Document.objects.create(
+            title='Report', content_hash='h', uploader=cls.user, workspace=cls.workspace,
+            file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf'
+        )
+
+    def request(self, user):
+        request = APIRequestFactory().get('/')
+        request.user = user
+        # As loaded once per request by workspace_memberships()
+        request._workspace_memberships = access.load_memberships(user)
+        return request
+
+    def test_members_are_checked_without_loading_the_workspace(self):
+        request = self.request(self.user)
+        document = Document.objects.get(pk=self.document.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsWorkspaceMember().has_object_permission(request, None, document))
+
+    def test_privacy_comes_from_the_selected_workspace(self):
+        request = self.request(self.outsider)
+        document = Document.objects.select_related('workspace').get(pk=self.document.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsWorkspaceMember().has_object_permission(request, None, document))
@@ -0,0 +1,68 @@
+import os
+from datetime import timedelta
+
+import redis
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from knowledge import activity
+from knowledge.models import Person
+
+@override_settings(REDIS_URL=None, ACTIVITY_RESOLUTION=60, ACTIVITY_FLUSH_INTERVAL=3600)
+class ActivityTrackerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        Person.objects.filter(pk=cls.user.pk).update(last_activity=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        previous, activity._tracker = activity._tracker, activity.ActivityTracker()
+        self.addCleanup(setattr, activity, '_tracker', previous)
+
+    def last_activity(self):
+        return Person.objects.values_list('last_activity', flat=True).get(pk=self.user.pk)
+
+    def test_authenticated_requests_record_activity(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        before = timezone.now()
+        self.assertEqual(client.get('/api/documents/').status_code, 200)
+        # Nothing is written until the flush
+        self.assertLess(self.last_activity(), before)
+        self.assertEqual(activity.flush(), 1)
+        self.assertGreaterEqual(self.last_activity(), before.replace(microsecond=0))
+
+    def test_repeat_activity_is_throttled(self):
+        now = timezone.now().replace(microsecond=0)
+        activity.record_activity(self.user.pk, now)
+        activity.record_activity(self.user.pk, now + timedelta(seconds=30))
+        self.assertEqual(activity.get_tracker().local.drain(), {self.user.pk: now.timestamp()})
+
+        activity.record_activity(self.user.pk, now + timedelta(seconds=90))
+        self.assertEqual(activity.flush(), 1)
+        self.assertEqual(self.last_activity(), now + timedelta(seconds=90))
+
+    def test_flush_never_moves_activity_backwards(self):
+        now = timezone.now().replace(microsecond=0)
+        Person.objects.filter(pk=self.user.pk).update(last_activity=now)
+        activity.record_activity(self.user.pk, now - timedelta(hours=1))
+        activity.flush()
+        self.assertEqual(self.last_activity(), now)
+
+class RedisActivityBufferTests(TestCase):
+    def setUp(self):
+        url = os.environ.get('REDIS_URL')
+        if not url:
+            self.skipTest('REDIS_URL is not set')
+        client = redis.Redis.from_url(url)
+        self.buffer = activity.RedisActivityBuffer(client)
+        self.buffer.key = f'{activity.RedisActivityBuffer.key}:test'
+        self.addCleanup(client.delete, self.buffer.key)
+
+    def test_keeps_the_newest_timestamp(self):
+        self.buffer.add(1, 200.5)
+        self.buffer.add(1, 100.0)  # a worker reporting late
+        self.buffer.add(2, 50.0)
+        self.assertEqual(self.buffer.drain(), {1: 200.5, 2: 50.0})
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from knowledge.models import Document, Person, ValidationActivity, Workspace
+
+# Rollup totals, active users, workspaces, two trend series, document types
+# and validation outcomes, whatever the timeframe or the number of rows
+DASHBOARD_QUERIES = 7
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Person.objects.create_user(
+            email='admin@example.com', password='x', employee_id='A1', role='ADMIN'
+        )
+        for i in range(5):
+            document = Document.objects.create(
+                title=f'Report {i}', content_hash=f'h{i}', uploader=cls.admin,
+                file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf',
+                document_type='REPORT', quality_score=50 + i,
+            )
+            ValidationActivity.objects.create(
+                document=document, validator=cls.admin, action='APPROVE',
+                previous_status='PENDING_REVIEW', new_status='PUBLISHED',
+            )
+        Workspace.objects.create(name='Team', workspace_type='INTEREST', created_by=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_query_count_is_constant(self):
+        for timeframe in ('7days', '90days', 'year'):
+            with self.assertNumQueries(DASHBOARD_QUERIES):
+                response = self.client.get(f'/api/analytics/dashboard/?timeframe={timeframe}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['totalDocuments'], 5)
+
+    def test_cache_follows_workspaces_and_people(self):
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.data['activeWorkspaces'], 1)
+        active_users = response.data['activeUsers']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Workspace.objects.create(name='Other', workspace_type='INTEREST', created_by=self.admin)
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.data['activeWorkspaces'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Person.objects.create_user(email='new@example.com', password='x', employee_id='N1')
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.data['activeUsers'], active_users + 1)
@@ -0,0 +1,105 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from knowledge import anchoring
+from knowledge.models import AnchorBatch, Document, Person, SimulatedBlock
+
+class RecordingClient(anchoring.ChainClient):
+    def __init__(self):
+        self.roots = []
+
+    def anchor(self, root):
+        self.roots.append(root)
+        return anchoring.AnchorReceipt(f'0x{len(self.roots):064x}', len(self.roots), self.network)
+
+class CheckingClient(RecordingClient):
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def anchor(self, root):
+        # What another run would see while the chain call is in flight
+        self.seen.append((connection.in_atomic_block, AnchorBatch.objects.get(merkle_root=root).status))
+        return super().anchor(root)
+
+class SimulatedLedgerTests(TestCase):
+    def test_blocks_are_stored_and_chained(self):
+        first = anchoring.SimulatedLedger().anchor('a' * 64)
+        second = anchoring.SimulatedLedger().anchor('b' * 64)
+        blocks = list(SimulatedBlock.objects.all())
+        self.assertEqual(
+            [block.transaction_hash for block in blocks], [first.transaction_hash, second.transaction_hash]
+        )
+        self.assertNotEqual(blocks[0].block_hash, blocks[1].block_hash)
+        # A fresh client, as in another process, reads the same chain
+        self.assertTrue(anchoring.SimulatedLedger().is_anchored(first.transaction_hash, 'a' * 64))
+        self.assertFalse(anchoring.SimulatedLedger().is_anchored(first.transaction_hash, 'b' * 64))
+
+    def test_anchored_document_verifies(self):
+        user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        document = Document.objects.create(
+            title='Report', content_hash='c' * 64, uploader=user,
+            file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf'
+        )
+        self.assertEqual(anchoring.anchor_pending(anchoring.SimulatedLedger()), 1)
+        self.assertTrue(anchoring.verify_document(document, anchoring.SimulatedLedger())['verified'])
+
+class AnchorRetryTests(TransactionTestCase):
+    def test_locked_batch_is_not_resubmitted(self):
+        locked = AnchorBatch.objects.create(merkle_root='a' * 64, leaf_count=1, network='CUSTOM', status='FAILED')
+        free = AnchorBatch.objects.create(merkle_root='b' * 64, leaf_count=1, network='CUSTOM', status='FAILED')
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            # Another run in the middle of submitting ``locked``
+            try:
+                with transaction.atomic():
+                    AnchorBatch.objects.select_for_update().get(pk=locked.pk)
+                    holding.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(holding.wait(10))
+            client = RecordingClient()
+            anchoring.anchor_pending(client)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(client.roots, [free.merkle_root])
+        self.assertEqual(AnchorBatch.objects.get(pk=locked.pk).status, 'FAILED')
+        self.assertEqual(AnchorBatch.objects.get(pk=free.pk).status, 'CONFIRMED')
+
+    def test_chain_call_runs_outside_a_transaction(self):
+        user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        Document.objects.create(
+            title='Report', content_hash='c' * 64, uploader=user,
+            file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf'
+        )
+        AnchorBatch.objects.create(merkle_root='a' * 64, leaf_count=1, network='CUSTOM', status='FAILED')
+        client = CheckingClient()
+        # The failed batch is retried, then the document gets a new one
+        self.assertEqual(anchoring.anchor_pending(client), 2)
+        self.assertEqual(client.seen, [(False, 'SUBMITTING'), (False, 'SUBMITTING')])
+        self.assertEqual(set(AnchorBatch.objects.values_list('status', flat=True)), {'CONFIRMED'})
+
+    def test_abandoned_submission_is_retried(self):
+        now = timezone.now()
+        abandoned = AnchorBatch.objects.create(
+            merkle_root='a' * 64, leaf_count=1, network='CUSTOM', status='SUBMITTING',
+            submitted_at=now - timedelta(hours=2)
+        )
+        AnchorBatch.objects.create(
+            merkle_root='b' * 64, leaf_count=1, network='CUSTOM', status='SUBMITTING', submitted_at=now
+        )
+        client = RecordingClient()
+        anchoring.anchor_pending(client)
+        # The other one is still in flight elsewhere
+        self.assertEqual(client.roots, [abandoned.merkle_root])
@@ -0,0 +1,85 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from knowledge import caching
+from knowledge.models import Person
+
+class CountingView:
+    def __init__(self):
+        self.builds = 0
+        self.status = status.HTTP_200_OK
+
+    @caching.cached_response(['documents'], timeout=60)
+    def shared(self, request):
+        self.builds += 1
+        return Response({'build': self.builds}, status=self.status)
+
+    @caching.cached_response(['documents'], timeout=60, per_user=True)
+    def mine(self, request):
+        self.builds += 1
+        return Response({'user': request.user.pk, 'build': self.builds})
+
+class CachedResponseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = Person.objects.create_user(email='a@example.com', password='x', employee_id='A')
+        cls.bob = Person.objects.create_user(email='b@example.com', password='x', employee_id='B')
+        cls.admin = Person.objects.create_user(email='c@example.com', password='x', employee_id='C', role='ADMIN')
+        cls.other_admin = Person.objects.create_user(
+            email='d@example.com', password='x', employee_id='D', role='ADMIN'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.view = CountingView()
+
+    def request(self, user, path='/cached/'):
+        request = APIRequestFactory().get(path)
+        request.user = user
+        return request
+
+    def test_version_bump_invalidates(self):
+        self.assertEqual(self.view.shared(self.request(self.alice)).data, {'build': 1})
+        self.assertEqual(self.view.shared(self.request(self.bob)).data, {'build': 1})
+        # Query strings are part of the key
+        self.assertEqual(self.view.shared(self.request(self.bob, '/cached/?page=2')).data, {'build': 2})
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            caching.bump_version_on_commit('documents')
+        # Not before commit, so readers cannot cache old rows under the new version
+        self.assertEqual(self.view.shared(self.request(self.alice)).data, {'build': 1})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.view.shared(self.request(self.alice)).data, {'build': 3})
+
+        caching.bump_version('skills')
+        self.assertEqual(self.view.shared(self.request(self.alice)).data, {'build': 3})
+
+    def test_per_user_entries_are_separate(self):
+        self.assertEqual(self.view.mine(self.request(self.alice)).data['user'], self.alice.pk)
+        self.assertEqual(self.view.mine(self.request(self.bob)).data['user'], self.bob.pk)
+        self.assertEqual(self.view.mine(self.request(self.alice)).data['user'], self.alice.pk)
+        self.assertEqual(self.view.builds, 2)
+        # Administrators see everything, so they share one entry
+        self.view.mine(self.request(self.admin))
+        self.assertEqual(self.view.mine(self.request(self.other_admin)).data['user'], self.admin.pk)
+        self.assertEqual(self.view.builds, 3)
+
+    def test_errors_are_not_cached(self):
+        self.view.status = status.HTTP_400_BAD_REQUEST
+        self.assertEqual(self.view.shared(self.request(self.alice)).status_code, 400)
+        self.view.status = status.HTTP_200_OK
+        self.assertEqual(self.view.shared(self.request(self.alice)).data, {'build': 2})
+
+    def test_stale_entry_is_served_during_a_rebuild(self):
+        key = 'dkn:response:test'
+        cache.set(key, {'value': 'stale', 'expires': time.time() - 1}, 60)
+        cache.add(f'{key}:lock', 1)  # another request is rebuilding
+        self.assertEqual(caching.get_or_build(key, lambda: 'fresh', 60), 'stale')
+        cache.delete(f'{key}:lock')
+        self.assertEqual(caching.get_or_build(key, lambda: 'fresh', 60), 'fresh')
@@ -0,0 +1,53 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from knowledge import activity_log, counters
+from knowledge.models import Document, Person
+
+@override_settings(REDIS_URL=None, COUNTER_FLUSH_INTERVAL=3600)
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        cls.document = Document.objects.create(
+            title='Report', content_hash='h', uploader=cls.user, status='PUBLISHED',
+            file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf'
+        )
+
+    def setUp(self):
+        # A store of its own, so nothing is left pending for other tests
+        previous, counters._store = counters._store, counters.CounterStore()
+        self.addCleanup(setattr, counters, '_store', previous)
+        # Views and downloads are logged; write them before the test database goes away
+        self.addCleanup(activity_log.flush)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_increments_are_buffered_then_flushed(self):
+        url = f'/api/documents/{self.document.pk}/'
+        self.client.post(f'{url}view/')
+        self.client.post(f'{url}view/')
+        self.client.get(f'{url}download/')
+
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.view_count, self.document.download_count), (0, 0))
+        # Responses include what is still buffered
+        data = self.client.get(url).data
+        self.assertEqual((data['view_count'], data['download_count']), (2, 1))
+
+        self.assertEqual(counters.flush(), 1)
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.view_count, self.document.download_count), (2, 1))
+        self.assertEqual(counters.pending([self.document.pk]), {})
+        data = self.client.get(url).data
+        self.assertEqual((data['view_count'], data['download_count']), (2, 1))
+
+    def test_failed_flush_keeps_increments(self):
+        counters.increment('not-a-document-id', 'view_count')
+        with self.assertLogs('knowledge.counters', 'ERROR'):
+            counters.flush()
+        self.assertEqual(counters.pending(['not-a-document-id'])['not-a-document-id']['view_count'], 1)
+
+    def test_unknown_field_is_refused(self):
+        with self.assertRaises(ValueError):
+            counters.increment(self.document.pk, 'title')
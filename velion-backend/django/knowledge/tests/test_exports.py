@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from knowledge.models import Document, Person, Workspace
+
+class DocumentExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(
+            email='u@example.com', password='x', employee_id='U1', first_name='Ada', last_name='Byron'
+        )
+        cls.outsider = Person.objects.create_user(email='o@example.com', password='x', employee_id='O1')
+        private = Workspace.objects.create(name='Private', created_by=cls.outsider, is_private=True)
+        cls.published = cls.document('Published', status='PUBLISHED', tags=['finance'])
+        cls.document('Draft')
+        cls.document('Hidden', status='PUBLISHED', workspace=private)
+
+    @classmethod
+    def document(cls, title, **fields):
+        return Document.objects.create(
+            title=title, content_hash=title, uploader=cls.user, file_url='https://files.example.com/r.pdf',
+            file_size=1, file_type='pdf', **fields
+        )
+
+    def export(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/documents/export/', {'status': 'PUBLISHED', **params})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        # The status filter and private-workspace visibility both apply
+        self.assertEqual([row['id'] for row in rows], [str(self.published.pk)])
+        self.assertEqual(rows[0]['uploader_name'], 'Ada Byron')
+        self.assertEqual(rows[0]['tags'], ['finance'])
+
+    def test_csv(self):
+        response, body = self.export(output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['title'] for row in rows], ['Published'])
+        self.assertEqual(json.loads(rows[0]['tags']), ['finance'])
+
+    def test_gzip(self):
+        response, body = self.export(output='csv', compress='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(body).decode())))
+        self.assertEqual([row['id'] for row in rows], [str(self.published.pk)])
+
+    def test_unknown_output_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/documents/export/', {'output': 'xml'}).status_code, 400)
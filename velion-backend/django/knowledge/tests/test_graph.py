@@ -0,0 +1,133 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from knowledge import graph
+from knowledge.models import Document, GraphOutbox, Person, Project, Workspace
+
+class GraphVisibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        cls.private = Workspace.objects.create(name='Private', created_by=cls.user, is_private=True)
+        cls.project = Project.objects.create(name='Project', start_date='2024-01-01', created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(GRAPH_SNAPSHOT_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = graph.GraphStore()
+
+    def document(self, title, **fields):
+        return Document.objects.create(
+            title=title, content_hash='h', uploader=self.user, file_url='https://files.example.com/r.pdf',
+            file_size=1, file_type='pdf', **fields
+        )
+
+    def documents_in_graph(self):
+        self.store.refresh()
+        return {
+            key[1] for number, key in enumerate(self.store.graph.keys)
+            if key[0] == 'document' and number not in self.store.graph.dead
+        }
+
+    def test_only_published_public_documents_are_loaded(self):
+        published = self.document('Published', status='PUBLISHED')
+        self.document('Draft')
+        self.document('Private', status='PUBLISHED', workspace=self.private)
+        self.assertEqual(self.documents_in_graph(), {str(published.pk)})
+
+    def test_events_follow_visibility(self):
+        document = self.document('Draft')
+        self.project.documents.add(document)
+        self.assertEqual(self.documents_in_graph(), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.status = 'PUBLISHED'
+            document.save()
+        self.assertEqual(self.documents_in_graph(), {str(document.pk)})
+        result = self.store.query('neighborhood', ('document', str(document.pk)), 1, 10)
+        self.assertIn(f'project:{self.project.pk}', {node['id'] for node in result['nodes']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.workspace = self.private
+            document.save()
+        self.assertEqual(self.documents_in_graph(), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private.is_private = False
+            self.private.save()
+        self.assertEqual(self.documents_in_graph(), {str(document.pk)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private.is_private = True
+            self.private.save()
+        self.assertEqual(self.documents_in_graph(), set())
+
+    def test_drafts_publish_no_events(self):
+        document = self.document('Draft', workspace=self.private)
+        previous = document._saved_state
+        document.title = 'Still a draft'
+        # Nothing to publish, and no workspace lookup to find that out
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.document_events(document, created=True), [])
+            self.assertEqual(graph.document_events(document, previous=previous), [])
+
+    def test_requests_load_the_snapshot(self):
+        published = self.document('Published', status='PUBLISHED')
+        graph.write_snapshot()
+        # Read from disk, not the database
+        with self.assertNumQueries(0):
+            self.assertEqual(self.documents_in_graph(), {str(published.pk)})
+
+    def test_expired_events_wait_for_the_next_snapshot(self):
+        first = self.document('First', status='PUBLISHED')
+        self.assertEqual(self.documents_in_graph(), {str(first.pk)})
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.document('Second', status='PUBLISHED')
+        cache.delete(graph.EVENT_KEY.format(graph.current_sequence()))
+
+        # The stale graph keeps answering until a snapshot is written; marked
+        # as queued so the build does not run inline here
+        cache.set(graph.SNAPSHOT_QUEUED_KEY, True)
+        self.assertEqual(self.documents_in_graph(), {str(first.pk)})
+        self.assertTrue(self.store.waiting)
+        graph.write_snapshot()
+        self.assertEqual(self.documents_in_graph(), {str(first.pk), str(second.pk)})
+
+    def test_project_edge_does_not_reveal_a_hidden_document(self):
+        self.documents_in_graph()
+        document = self.document('Private', status='PUBLISHED', workspace=self.private)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.documents.add(document)
+        self.assertEqual(self.documents_in_graph(), set())
+
+@override_settings(GRAPH_OUTBOX_ENABLED=True)
+class GraphOutboxTransactionTests(TransactionTestCase):
+    def test_failed_save_leaves_no_outbox_row(self):
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError('after the graph receiver')
+
+        post_save.connect(fail, sender=Person)
+        try:
+            with self.assertRaises(RuntimeError):
+                Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        finally:
+            post_save.disconnect(fail, sender=Person)
+        self.assertFalse(Person.objects.exists())
+        self.assertFalse(GraphOutbox.objects.exists())
+
+    def test_save_writes_outbox_row(self):
+        Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        self.assertTrue(GraphOutbox.objects.exists())
+
+    def test_publish_outside_a_transaction_is_refused(self):
+        with self.assertRaises(transaction.TransactionManagementError):
+            graph.publish([('rebuild',)])
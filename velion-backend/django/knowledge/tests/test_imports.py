@@ -0,0 +1,62 @@
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from knowledge import imports
+from knowledge.models import Document, GraphOutbox, Person
+
+def ndjson(*records):
+    return [json.dumps(record) + '\n' for record in records]
+
+class CopyImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+
+    def document(self, title, **fields):
+        return Document(
+            title=title, content_hash='h', uploader=self.user, file_url='https://files.example.com/r.pdf',
+            file_size=1, file_type='pdf', **fields
+        )
+
+    def test_copy_writes_what_the_orm_writes(self):
+        imports.copy_documents([
+            self.document('Blank, "quoted"', blockchain_tx_id='', description=''),
+            self.document('Missing', blockchain_tx_id=None, tags=['a "b"', 'c,d']),
+        ])
+        blank = Document.objects.get(title='Blank, "quoted"')
+        self.assertEqual(blank.blockchain_tx_id, '')
+        self.assertEqual(blank.description, '')
+        self.assertIsNone(blank.quality_score)
+        missing = Document.objects.get(title='Missing')
+        self.assertIsNone(missing.blockchain_tx_id)
+        self.assertEqual(missing.tags, ['a "b"', 'c,d'])
+
+    def test_copy_import(self):
+        records = [
+            {'title': f'Report {i}', 'content_hash': f'h{i}', 'file_url': 'https://files.example.com/r.pdf',
+             'file_size': 1, 'file_type': 'pdf'}
+            for i in range(3)
+        ]
+        report = imports.import_documents(ndjson(*records), 'ndjson', default_uploader=self.user, use_copy=True)
+        self.assertEqual(report.created, 3, report.errors)
+
+@override_settings(GRAPH_OUTBOX_ENABLED=True, GRAPH_OUTBOX_HIGH_WATERMARK=0)
+class ImportBackpressureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(
+            email='admin@example.com', password='x', employee_id='A1', role='ADMIN'
+        )
+        GraphOutbox.objects.create(event=['drop', ['document', 'x']])
+
+    def test_request_is_refused_while_graph_sync_is_behind(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('documents.ndjson', b'{"title": "Report"}\n')
+        response = client.post('/api/documents/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(Document.objects.exists())
@@ -0,0 +1,61 @@
+import base64
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from knowledge.models import Document, Person
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+        for i in range(5):
+            Document.objects.create(
+                title=f'Pipeline report {i}', content_hash=f'h{i}', uploader=cls.user,
+                file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf',
+                status='PUBLISHED',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        explained = any(query['sql'].startswith('EXPLAIN') for query in context.captured_queries)
+        return response.data, explained
+
+    def test_single_page_count_is_exact(self):
+        data, explained = self.get('/api/documents/?pagination=cursor&page_size=20')
+        self.assertEqual(data['approximate_count'], 5)
+        self.assertFalse(explained)
+
+        data, _ = self.get('/api/documents/?pagination=cursor&search=report&ordering=-created_at')
+        self.assertEqual(data['approximate_count'], 5)
+
+    def test_count_only_on_first_page(self):
+        data, explained = self.get('/api/documents/?pagination=cursor&page_size=2')
+        self.assertGreaterEqual(data['approximate_count'], 3)
+        self.assertTrue(explained)
+
+        data, explained = self.get(data['next'])
+        self.assertIsNone(data['approximate_count'])
+        self.assertFalse(explained)
+        self.assertEqual(len(data['results']), 2)
+
+    def test_malformed_cursor_is_not_found(self):
+        malformed = (
+            [1, 2], {'datetime': True}, {'value': 1, 'pk': 'x'},
+            {'value': 'x', 'pk': 'x', 'reverse': False, 'datetime': True},
+        )
+        for cursor in malformed:
+            encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+            response = self.client.get('/api/documents/', {'pagination': 'cursor', 'cursor': encoded})
+            self.assertEqual(response.status_code, 404, cursor)
+        response = self.client.get('/api/documents/', {'pagination': 'cursor', 'cursor': 'not base64!'})
+        self.assertEqual(response.status_code, 404)
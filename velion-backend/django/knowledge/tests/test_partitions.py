@@ -0,0 +1,86 @@
+from datetime import date, datetime, timezone
+
+from django.db import connection
+from django.test import TestCase
+
+from knowledge import partitions
+from knowledge.models import ActivityLog, ActivityLogMonthlyStats, Person
+
+TODAY = date(2026, 10, 18)
+
+class ActivityLogPartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create_user(email='u@example.com', password='x', employee_id='U1')
+
+    def log(self, *months, action='LOGIN'):
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                user=self.user, action=action, description='',
+                created_at=datetime(month.year, month.month, 15, tzinfo=timezone.utc)
+            )
+            for month in months
+        ])
+        # Fire the deferred foreign key checks, or their partitions could not be dropped
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def setUp(self):
+        # post_migrate partitioned the table around the real date; start from the default alone
+        with connection.cursor() as cursor:
+            for name in partitions.list_partitions(cursor).values():
+                cursor.execute(f'DROP TABLE "{name}"')
+
+    def maintain(self):
+        return partitions.maintain_partitions(2, 3, today=TODAY)
+
+    def stats(self):
+        return {
+            (row.month, row.action): row.count
+            for row in ActivityLogMonthlyStats.objects.filter(user=self.user)
+        }
+
+    def months_in_default(self):
+        with connection.cursor() as cursor:
+            return partitions._months_in(cursor, partitions.DEFAULT_PARTITION)
+
+    def test_partitions_are_created_for_upcoming_and_caught_months(self):
+        self.log(date(2026, 9, 1), date(2026, 10, 1), date(2027, 6, 1))
+        result = self.maintain()
+
+        self.assertEqual(result['created'], [
+            partitions.partition_name(month) for month in
+            (date(2026, 9, 1), date(2026, 10, 1), date(2026, 11, 1), date(2026, 12, 1), date(2027, 6, 1))
+        ])
+        self.assertEqual(self.months_in_default(), set())
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        # Running again is a no-op
+        self.assertEqual(self.maintain(), {
+            'converted': False, 'created': [], 'dropped': [], 'expired_default_rows': 0,
+        })
+
+    def test_expired_months_are_rolled_up(self):
+        with connection.cursor() as cursor:
+            partitions.create_partition(cursor, date(2026, 5, 1))
+        self.log(date(2026, 5, 1), date(2026, 5, 1), date(2026, 10, 1))
+        result = self.maintain()
+        self.assertEqual(result['dropped'], [partitions.partition_name(date(2026, 5, 1))])
+        self.assertEqual(result['expired_default_rows'], 0)
+        self.assertEqual(self.stats(), {(date(2026, 5, 1), 'LOGIN'): 2})
+
+        # No partition covers these months any more, so they land in the default
+        self.log(date(2026, 3, 1), date(2026, 3, 1), date(2026, 5, 1), action='SEARCH')
+        self.log(date(2026, 5, 1))
+        result = self.maintain()
+        self.assertEqual(result['expired_default_rows'], 4)
+        # Aged out without a partition being created for them
+        self.assertEqual(result['created'], [])
+        self.assertEqual(self.months_in_default(), set())
+        # Added to the counts rolled up when the May partition was dropped
+        self.assertEqual(self.stats(), {
+            (date(2026, 3, 1), 'SEARCH'): 2,
+            (date(2026, 5, 1), 'SEARCH'): 1,
+            (date(2026, 5, 1), 'LOGIN'): 3,
+        })
+        self.assertEqual(ActivityLog.objects.count(), 1)
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from knowledge import benchmarks, testing
+from knowledge.models import Person, WorkspaceMembership
+
+# Several rows per relation, so a per-row query shows up as a count that
+# grows with the page size
+SIZES = {'people': 30, 'documents': 150, 'projects': 25, 'workspaces': 25, 'validations': 50}
+ADMIN_ONLY = ('/api/users/', '/api/documents/pending_validations/')
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = benchmarks.seed(SIZES)
+        cls.member = WorkspaceMembership.objects.values_list('person', flat=True).first()
+        cls.member = Person.objects.get(pk=cls.member)
+
+    def setUp(self):
+        cache.clear()
+
+    def check_budget(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        testing.check_query_budget(client, url, testing.ENDPOINT_QUERY_BUDGETS[url])
+
+def budget_test(url):
+    def test(self):
+        self.check_budget(self.admin, url)
+        if url not in ADMIN_ONLY:
+            self.check_budget(self.member, url)
+    return test
+
+for url in testing.ENDPOINT_QUERY_BUDGETS:
+    setattr(QueryBudgetTests, f'test_{url.strip("/").replace("/", "_")}', budget_test(url))
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from knowledge.models import Person
+
+TRIGRAM_INDEXES = {
+    'person_email_trgm_idx', 'person_first_name_trgm_idx',
+    'person_last_name_trgm_idx', 'person_employee_id_trgm_idx',
+}
+
+class PeopleTypeaheadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Person.objects.create_user(
+            email='admin@example.com', password='x', employee_id='A1', role='ADMIN', is_staff=True
+        )
+        cls.person = Person.objects.create_user(
+            email='ada@example.com', password='x', employee_id='E100', first_name='Ada', last_name='Lovelace'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def names(self, query):
+        response = self.client.get('/api/users/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return {row['last_name'] for row in response.data}
+
+    def test_cached_results_follow_edits(self):
+        self.assertEqual(self.names('lovelace'), {'Lovelace'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Person.objects.create_user(
+                email='grace@example.com', password='x', employee_id='E101',
+                first_name='Grace', last_name='Lovelace'
+            )
+        self.assertEqual(len(self.client.get('/api/users/search/', {'q': 'lovelace'}).data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.last_name = 'Byron'
+            self.person.save()
+        self.assertEqual(self.names('byron'), {'Byron'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.delete()
+        self.assertEqual(self.names('byron'), set())
+
+    def test_unrelated_saves_keep_the_cache(self):
+        self.names('lovelace')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.profile_completion = 50
+            self.person.save(update_fields=['profile_completion'])
+        with self.assertNumQueries(0):
+            self.names('lovelace')
+
+    def test_activity_keeps_the_cache(self):
+        self.names('lovelace')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.last_activity = timezone.now()
+            self.person.save(update_fields=['last_activity'])
+        with self.assertNumQueries(0):
+            self.names('lovelace')
+
+    def test_substring_match_uses_trigram_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('pg_trgm is not installed')
+            cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s', [Person._meta.db_table])
+            self.assertTrue(TRIGRAM_INDEXES <= {row[0] for row in cursor.fetchall()})
+            # A few rows would always be scanned sequentially otherwise
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Person.objects.filter(email__icontains='xample').explain()
+        self.assertIn('person_email_trgm_idx', plan)
@@ -0,0 +1,65 @@
+from django.test import TestCase
+
+from knowledge import skills
+from knowledge.models import Person, Project
+
+class SkillGapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        alice = cls.person('alice', ['python', 'sql'], department='Engineering', region='EU')
+        bob = cls.person('bob', ['python'], department='Data', region='US')
+        cls.person('carol', ['go'], is_active=False)
+        cls.person('dan', ['sql'], department='Data', region='EU')
+        cls.project('Platform', 'ACTIVE', ['python', 'go'], [bob])
+        cls.project('Reporting', 'PLANNING', ['python', 'sql'], [alice])
+        # Finished work asks for nothing
+        cls.project('Legacy', 'COMPLETED', ['rust'], [])
+
+    @classmethod
+    def person(cls, name, skill_list, **fields):
+        return Person.objects.create_user(
+            email=f'{name}@example.com', password='x', employee_id=name, skills=skill_list, **fields
+        )
+
+    @classmethod
+    def project(cls, name, status, tags, team):
+        project = Project.objects.create(
+            name=name, description='', start_date='2026-01-01', status=status, tags=tags,
+            created_by=Person.objects.get(employee_id='alice')
+        )
+        project.team_members.set(team)
+        return project
+
+    def numbers(self, rows):
+        return {
+            row['skill']: (row['required'], row['staffed'], row['available'], row['gap'])
+            for row in rows
+        }
+
+    def test_demand_supply_and_staffing(self):
+        rows = skills.skill_gaps()
+        # Largest gap first, then most demanded
+        self.assertEqual([row['skill'] for row in rows], ['go', 'python', 'sql'])
+        self.assertEqual(self.numbers(rows), {
+            # Only an inactive person has it
+            'go': (1, 0, 0, 1),
+            'python': (2, 2, 2, 0),
+            'sql': (1, 1, 2, 0),
+        })
+        self.assertEqual((rows[0]['priority'], rows[0]['action']), ('HIGH', 'Hire External Talent'))
+        self.assertEqual((rows[1]['priority'], rows[1]['action']), ('LOW', 'None'))
+
+    def test_filters_and_segments(self):
+        rows = skills.skill_gaps({'department': 'Data'}, segment_by='region')
+        self.assertEqual(self.numbers(rows), {
+            'go': (1, 0, 0, 1),
+            'python': (2, 2, 1, 1),
+            'sql': (1, 1, 1, 0),
+        })
+        segments = {row['skill']: row['segments'] for row in rows}
+        self.assertEqual(segments['python'], [{'region': 'US', 'available': 1}])
+        self.assertEqual(segments['sql'], [{'region': 'EU', 'available': 1}])
+        self.assertEqual(segments['go'], [])
+
+    def test_limit(self):
+        self.assertEqual([row['skill'] for row in skills.skill_gaps(limit=1)], ['go'])
@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase, override_settings
+
+from knowledge import tasks
+
+class RecordingTask:
+    name = 'knowledge.tasks.recording'
+
+    def __init__(self):
+        self.calls = []
+
+    def delay(self, *args, **kwargs):
+        self.calls.append(('delay', args, kwargs))
+
+    def apply(self, args=None, kwargs=None):
+        self.calls.append(('apply', tuple(args), kwargs))
+
+class EnqueueTests(SimpleTestCase):
+    @override_settings(CELERY_BROKER_URL='redis://localhost:6379/0', CELERY_TASK_ALWAYS_EAGER=False)
+    def test_queued_with_a_broker(self):
+        task = RecordingTask()
+        tasks.enqueue(task, 'id', force=True)
+        self.assertEqual(task.calls, [('delay', ('id',), {'force': True})])
+
+    @override_settings(CELERY_BROKER_URL=None, CELERY_TASK_ALWAYS_EAGER=False)
+    def test_inline_with_a_warning_without_a_broker(self):
+        task = RecordingTask()
+        with self.assertLogs('knowledge.tasks', 'WARNING'):
+            tasks.enqueue(task, 'id', force=True)
+        self.assertEqual(task.calls, [('apply', ('id',), {'force': True})])
@@ -0,0 +1,14 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from knowledge import text_analysis
+
+class TextFeaturesTests(SimpleTestCase):
+    def test_nul_in_a_text_does_not_shift_later_texts(self):
+        texts = ['Quarterly\0report on delivery.', 'Another short summary.', '\0']
+        features = text_analysis.text_features(texts)
+        for index, text in enumerate(texts):
+            alone = text_analysis.text_features([text.replace('\0', ' ')])
+            for combined, single in zip(features, alone):
+                self.assertEqual(len(combined), len(texts))
+                np.testing.assert_array_equal(combined[index], single[0])
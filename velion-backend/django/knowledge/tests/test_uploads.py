@@ -0,0 +1,68 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from knowledge.models import Document, Person, Workspace, WorkspaceMembership
+
+CONTENT = b'quarterly report'
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+class DuplicateVisibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Person.objects.create_user(email='owner@example.com', password='x', employee_id='O1')
+        cls.outsider = Person.objects.create_user(email='out@example.com', password='x', employee_id='O2')
+        cls.workspace = Workspace.objects.create(
+            name='Private', workspace_type='CLIENT', created_by=cls.owner, is_private=True
+        )
+        WorkspaceMembership.objects.create(workspace=cls.workspace, person=cls.owner, role='OWNER')
+        cls.private = Document.objects.create(
+            title='Private', content_hash=CONTENT_HASH, uploader=cls.owner, workspace=cls.workspace,
+            file_url='https://files.example.com/r.pdf', file_size=len(CONTENT), file_type='text/plain'
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def by_hash(self, user):
+        return self.client_for(user).get(
+            '/api/documents/by_hash/', {'content_hash': CONTENT_HASH, 'file_size': len(CONTENT)}
+        )
+
+    def test_by_hash_only_finds_visible_documents(self):
+        self.assertEqual(self.by_hash(self.outsider).status_code, 404)
+        response = self.by_hash(self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], str(self.private.pk))
+
+    def test_upload_does_not_return_an_invisible_duplicate(self):
+        response = self.client_for(self.outsider).post('/api/documents/upload/', {
+            'file': SimpleUploadedFile('report.txt', CONTENT), 'on_duplicate': 'return',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.data['duplicate'])
+        document = Document.objects.get(pk=response.data['document']['id'])
+        self.assertEqual(document.uploader, self.outsider)
+        self.assertEqual(document.version, 1)
+        self.assertIsNone(document.previous_version)
+
+    def test_upload_returns_a_visible_duplicate(self):
+        response = self.client_for(self.owner).post('/api/documents/upload/', {
+            'file': SimpleUploadedFile('report.txt', CONTENT), 'on_duplicate': 'return',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['duplicate'])
+        self.assertEqual(response.data['document']['id'], str(self.private.pk))
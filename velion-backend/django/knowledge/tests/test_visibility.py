@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from knowledge import activity_log, related_index, vector_index
+from knowledge.models import Document, Person, ValidationActivity, Workspace, WorkspaceMembership
+
+TEXT = 'Pipeline migration review for the finance reporting platform and its quarterly delivery'
+
+class PrivateDocumentVisibilityTests(TestCase):
+    """Every document listing leaves private-workspace documents to members."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Person.objects.create_user(
+            email='member@example.com', password='x', employee_id='M1', role='KNOWLEDGE_CHAMPION'
+        )
+        cls.outsider = Person.objects.create_user(
+            email='outsider@example.com', password='x', employee_id='O1', role='KNOWLEDGE_CHAMPION'
+        )
+        cls.workspace = Workspace.objects.create(
+            name='Client', workspace_type='CLIENT', created_by=cls.member, is_private=True
+        )
+        WorkspaceMembership.objects.create(workspace=cls.workspace, person=cls.member, role='OWNER')
+        cls.public = cls.document('Public pipeline', status='PUBLISHED')
+        cls.private = cls.document('Private pipeline', status='PUBLISHED', workspace=cls.workspace)
+        cls.pending = cls.document('Private pending', status='PENDING_REVIEW', workspace=cls.workspace)
+        ValidationActivity.objects.create(
+            document=cls.private, validator=cls.member, action='APPROVE',
+            previous_status='PENDING_REVIEW', new_status='PUBLISHED'
+        )
+
+    @classmethod
+    def document(cls, title, **fields):
+        return Document.objects.create(
+            title=title, description=TEXT, content_hash=title, uploader=cls.member, tags=['pipeline'],
+            file_url='https://files.example.com/r.pdf', file_size=1, file_type='pdf', **fields
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Searches are logged; write them before the test database goes away
+        self.addCleanup(activity_log.flush)
+        for setting in ('VECTOR_INDEX_DIR', 'RELATED_INDEX_DIR', 'GRAPH_SNAPSHOT_DIR'):
+            directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directory)
+            override = override_settings(**{setting: directory})
+            override.enable()
+            self.addCleanup(override.disable)
+
+    def ids(self, user, method, url, data=None, key=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = getattr(client, method)(url, data, format='json' if method == 'post' else None)
+        self.assertEqual(response.status_code, 200, response.data)
+        results = response.data
+        if isinstance(results, dict):
+            results = results['results']
+        return {str(item[key or 'id']) for item in results}
+
+    def assertPrivateHidden(self, method, url, data=None, key=None, document=None):
+        document = str((document or self.private).pk)
+        self.assertIn(document, self.ids(self.member, method, url, data, key))
+        self.assertNotIn(document, self.ids(self.outsider, method, url, data, key))
+
+    def test_recent(self):
+        # The member's response is cached first; the outsider must not get it
+        self.assertPrivateHidden('get', '/api/documents/recent/')
+
+    def test_search(self):
+        self.assertPrivateHidden('post', '/api/documents/search/', {'tags': ['pipeline']})
+
+    def test_semantic_search(self):
+        vector_index.sync_index(rebuild=True)
+        self.assertPrivateHidden('post', '/api/documents/semantic_search/', {'query': 'pipeline migration'})
+
+    def test_related(self):
+        related_index.sync_index(rebuild=True)
+        self.assertPrivateHidden('get', f'/api/documents/{self.public.pk}/related/')
+
+    def test_pending_validations(self):
+        self.assertPrivateHidden('get', '/api/documents/pending_validations/', document=self.pending)
+
+    def test_user_engagement(self):
+        self.assertPrivateHidden('get', '/api/analytics/user_engagement/', key='document_id')
+        client = APIClient()
+        client.force_authenticate(self.outsider)
+        actions = {item['action'] for item in client.get('/api/analytics/user_engagement/').data}
+        self.assertNotIn('VALIDATION', actions)
+
+    def test_graph(self):
+        client = APIClient()
+        client.force_authenticate(self.outsider)
+        nodes = {node['id'] for node in client.get('/api/graph/').data['nodes']}
+        self.assertIn(f'document:{self.public.pk}', nodes)
+        self.assertNotIn(f'document:{self.private.pk}', nodes)
+        response = client.get('/api/graph/', {'entity_type': 'document', 'entity_id': str(self.private.pk)})
+        self.assertEqual(response.status_code, 404)
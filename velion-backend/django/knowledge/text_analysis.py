@@ -0,0 +1,248 @@
+"""
+CPU-bound text analysis behind knowledge extraction.
+
+Plain functions over a string with no Django imports, so they can run in
+a process pool started with ``spawn``. Each stage has a version: bump it
+when its algorithm changes and ``manage.py extract_knowledge``
+recomputes just that stage across the corpus.
+"""
+
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+SUMMARY_SENTENCES = 3
+SUMMARY_MAX_LENGTH = 1000
+TOPIC_COUNT = 10
+ENTITY_COUNT = 25
+
+# Sentence ends, and blank lines between a title or heading and its text
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])|\n\s*\n')
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+# Runs of capitalised words, optionally joined by "of", "and" or "&"
+ENTITY_RE = re.compile(
+    r"\b[A-Z][A-Za-z0-9&'-]*(?:\s+(?:of\s+|and\s+|&\s+)?[A-Z][A-Za-z0-9&'-]*)*"
+)
+
+STOPWORDS = frozenset('''
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers herself him himself his how i if in into is it
+its itself just me more most my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your yours yourself yourselves
+may might must shall upon within without across per via etc
+'''.split())
+
+POSITIVE_WORDS = frozenset('''
+achieve achieved accurate advantage benefit benefits best better clear complete completed
+effective efficient excellent good great improve improved improvement innovative positive
+reliable robust secure simple stable strong success successful valuable win
+'''.split())
+
+NEGATIVE_WORDS = frozenset('''
+bad break broken concern concerns costly critical delay delayed difficult error errors fail
+failed failure fault issue issues lack late loss poor problem problems risk risks slow unclear
+unstable weak worse worst
+'''.split())
+
+NEGATIONS = frozenset(('not', 'no', 'never', "n't", 'without', 'hardly'))
+
+def sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_RE.split(text) if sentence.strip()]
+
+def words(text):
+    return WORD_RE.findall(text)
+
+def content_words(text):
+    return [word for word in (w.lower() for w in words(text)) if word not in STOPWORDS and len(word) > 2]
+
+def summarize(text):
+    """Extractive summary: the highest scoring sentences, in document order."""
+    parts = sentences(text)
+    if len(parts) <= SUMMARY_SENTENCES:
+        return ' '.join(parts)[:SUMMARY_MAX_LENGTH]
+
+    frequencies = Counter(content_words(text))
+    if not frequencies:
+        return ' '.join(parts[:SUMMARY_SENTENCES])[:SUMMARY_MAX_LENGTH]
+    top = frequencies.most_common(1)[0][1]
+
+    def score(sentence):
+        terms = content_words(sentence)
+        return sum(frequencies[term] / top for term in terms) / (len(terms) or 1) * math.log(len(terms) + 1)
+
+    best = sorted(range(len(parts)), key=lambda index: score(parts[index]), reverse=True)
+    chosen = sorted(best[:SUMMARY_SENTENCES])
+    return ' '.join(parts[index] for index in chosen)[:SUMMARY_MAX_LENGTH]
+
+def key_topics(text):
+    frequencies = Counter(word for word in content_words(text) if len(word) > 3)
+    return [word for word, _ in frequencies.most_common(TOPIC_COUNT)]
+
+def entities(text):
+    counts = Counter()
+    for sentence in sentences(text):
+        for match in ENTITY_RE.finditer(sentence):
+            name = match.group(0)
+            # A single capitalised word opening a sentence is usually not a name
+            if match.start() == 0 and ' ' not in name:
+                continue
+            if name.lower() in STOPWORDS:
+                continue
+            counts[name] += 1
+    return [{'text': name, 'count': count} for name, count in counts.most_common(ENTITY_COUNT)]
+
+def sentiment(text):
+    """Lexicon score in [-1, 1]; a negation flips the next sentiment word."""
+    positive = negative = 0
+    negated = False
+    for word in (w.lower() for w in words(text)):
+        if word in NEGATIONS or word.endswith("n't"):
+            negated = True
+            continue
+        if word in POSITIVE_WORDS or word in NEGATIVE_WORDS:
+            is_positive = (word in POSITIVE_WORDS) != negated
+            if is_positive:
+                positive += 1
+            else:
+                negative += 1
+        negated = False
+    if not positive and not negative:
+        return 0.0
+    return round((positive - negative) / (positive + negative), 4)
+
+# Scores are computed for many texts at once: each chunk is joined into one
+# byte array and words, vowel groups and per-document totals are found
+# with array operations instead of a Python loop per word
+HASH_BASE = np.uint64(1099511628211)
+HASH_TEXT_MIX = np.uint64(0x9E3779B97F4A7C15)
+LETTERS = np.zeros(256, dtype=bool)
+LETTERS[ord('a'):ord('z') + 1] = True
+WORD_CHARS = LETTERS.copy()
+WORD_CHARS[[ord("'"), ord('-')]] = True
+VOWELS = np.zeros(256, dtype=bool)
+VOWELS[[ord(c) for c in 'aeiouy']] = True
+SILENT_E_EXCEPTIONS = np.zeros(256, dtype=bool)  # "-le" and "-ee" keep their e
+SILENT_E_EXCEPTIONS[[ord('l'), ord('e')]] = True
+
+def _shift(mask, fill=False):
+    # mask[i - 1] at position i
+    return np.concatenate(([fill], mask[:-1]))
+
+def text_features(texts):
+    """
+    Per-text arrays: words, sentences, syllables, words of three or more
+    syllables, and distinct words. Words match ``WORD_RE``; non-ASCII
+    characters separate words, as they do there.
+    """
+    count = len(texts)
+    sentence_counts = np.array([max(len(sentences(text)), 1) for text in texts], dtype=np.float64)
+    # NUL separates texts; one inside a text would shift every later word
+    # to the next text, so it becomes the word break it would have been
+    raw = '\0'.join(text.replace('\0', ' ') for text in texts).encode('ascii', errors='replace').lower()
+    chars = np.frombuffer(raw, dtype=np.uint8)
+    empty = np.zeros(count, dtype=np.float64)
+    if not len(chars):
+        return empty, sentence_counts, empty, empty, empty
+    text_index = np.cumsum(chars == 0, dtype=np.int32)
+
+    # A word is a run of word characters from its first letter onwards
+    word_char = WORD_CHARS[chars]
+    run_start = word_char & ~_shift(word_char)
+    letters_seen = np.cumsum(LETTERS[chars], dtype=np.int32)
+    letters_before_run = np.maximum.accumulate(np.where(run_start, letters_seen - LETTERS[chars], 0))
+    in_word = word_char & (letters_seen > letters_before_run)
+    if not in_word.any():
+        return empty, sentence_counts, empty, empty, empty
+    word_start = in_word & ~_shift(in_word)
+    starts = np.flatnonzero(word_start)
+    ends = np.flatnonzero(in_word & ~np.concatenate((in_word[1:], [False])))
+    word_id = np.cumsum(word_start, dtype=np.int32) - 1
+
+    # Syllables: vowel groups, less a silent final e when there are others
+    vowel = VOWELS[chars] & in_word
+    group_start = vowel & ~(_shift(vowel) & ~word_start)
+    syllable_counts = np.bincount(word_id[group_start], minlength=len(starts))
+    silent_e = (
+        (chars[ends] == ord('e'))
+        & ((ends == starts) | ~SILENT_E_EXCEPTIONS[chars[np.maximum(ends - 1, 0)]])
+        & (syllable_counts > 1)
+    )
+    syllable_counts = np.maximum(syllable_counts - silent_e, 1)
+
+    # Distinct words per text via a 64-bit polynomial hash of each word,
+    # weighting every character by the base to the power of its offset
+    positions = np.flatnonzero(in_word)
+    offsets = positions - starts[word_id[positions]]
+    powers = np.cumprod(np.full(offsets.max() + 1, HASH_BASE, dtype=np.uint64))
+    hashes = np.add.reduceat(chars[positions].astype(np.uint64) * powers[offsets], np.flatnonzero(offsets == 0))
+    word_text = text_index[starts]
+    # Mixing in the text index keeps equal words of different texts apart
+    keys = hashes ^ (word_text.astype(np.uint64) * HASH_TEXT_MIX)
+    _, first_seen = np.unique(keys, return_index=True)
+
+    words_per_text = np.bincount(word_text, minlength=count).astype(np.float64)
+    syllables_per_text = np.bincount(word_text, weights=syllable_counts, minlength=count)
+    polysyllabic = np.bincount(word_text, weights=syllable_counts >= 3, minlength=count)
+    distinct = np.bincount(word_text[first_seen], minlength=count).astype(np.float64)
+    return words_per_text, sentence_counts, syllables_per_text, polysyllabic, distinct
+
+def batch_scores(texts):
+    """
+    Complexity (0-1 blend of sentence length, polysyllabic words and
+    vocabulary richness) and Flesch reading ease for each text, as two
+    arrays with NaN for texts without words.
+    """
+    words_per_text, sentence_counts, syllables_per_text, polysyllabic, distinct = text_features(texts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        words_per_sentence = words_per_text / sentence_counts
+        complexity = np.minimum(
+            0.5 * np.minimum(words_per_sentence / 40, 1.0)
+            + 0.3 * np.minimum(polysyllabic / words_per_text * 2, 1.0)
+            + 0.2 * (distinct / words_per_text),
+            1.0
+        )
+        readability = 206.835 - 1.015 * words_per_sentence - 84.6 * (syllables_per_text / words_per_text)
+    missing = words_per_text == 0
+    complexity[missing] = np.nan
+    readability[missing] = np.nan
+    return np.round(complexity, 4), np.round(readability, 2)
+
+def _score_or_none(value):
+    return None if np.isnan(value) else float(value)
+
+def scores(text):
+    complexity, readability = batch_scores([text])
+    return {
+        'complexity_score': _score_or_none(complexity[0]),
+        'readability_score': _score_or_none(readability[0]),
+    }
+
+# Stage name -> (version, function, KnowledgeComponent field it fills, or
+# None when the function returns a dict of fields)
+STAGES = {
+    'summary': (1, summarize, 'summary'),
+    'topics': (1, key_topics, 'key_topics'),
+    'entities': (1, entities, 'entities'),
+    'sentiment': (1, sentiment, 'sentiment_score'),
+    'scores': (1, scores, None),
+}
+
+def stage_versions():
+    return {name: version for name, (version, _, _) in STAGES.items()}
+
+def analyze(text, stage_names):
+    """Run ``stage_names`` over ``text`` and return the resulting field values."""
+    fields = {}
+    for name in stage_names:
+        _, function, field = STAGES[name]
+        result = function(text)
+        if field is None:
+            fields.update(result)
+        else:
+            fields[field] = result
+    return fields
@@ -0,0 +1,70 @@
+"""
+Streaming document uploads with content hashing and deduplication.
+
+``HashingFileUploadHandler`` writes each multipart chunk to a temporary
+file and feeds it to SHA-256 as it arrives, so an upload of any size is
+hashed without being held in memory or read twice. Files are stored under
+their hash, and an upload whose content already exists in a document the
+uploader can see is answered with that document (or recorded as a new
+version of it) instead of being stored again.
+"""
+
+import hashlib
+import mimetypes
+import os
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import connection
+
+STORAGE_PREFIX = 'documents'
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.content_hash = self.hasher.hexdigest()
+        return upload
+
+def storage_name(content_hash, filename):
+    # Keep the extension so the file is served with a sensible type
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{STORAGE_PREFIX}/{content_hash[:2]}/{content_hash}{extension}'
+
+def lock_content_hash(content_hash):
+    # Serialises concurrent uploads of the same content until commit
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [content_hash])
+
+def find_duplicate(documents, content_hash, size):
+    """
+    The latest version in ``documents`` with exactly this content. Pass only
+    what the requester may see: content held elsewhere is stored again
+    (under the same name, so not written twice) rather than revealed.
+    """
+    return documents.filter(
+        content_hash=content_hash, file_size=size
+    ).order_by('-version', '-created_at').first()
+
+def store_upload(upload):
+    """
+    Move ``upload`` into storage under its content hash and return the
+    stored name. Content that is already stored is not written again.
+    """
+    name = storage_name(upload.content_hash, upload.name)
+    if not default_storage.exists(name):
+        # FileSystemStorage moves the temporary file instead of copying it
+        name = default_storage.save(name, upload)
+    return name
+
+def guess_file_type(upload):
+    if upload.content_type and upload.content_type != 'application/octet-stream':
+        return upload.content_type
+    return mimetypes.guess_type(upload.name)[0] or 'application/octet-stream'
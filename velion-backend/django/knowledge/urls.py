@@ -9,6 +9,8 @@ router.register(r'users', views.PersonViewSet)
 router.register(r'documents', views.DocumentViewSet)
 router.register(r'projects', views.ProjectViewSet)
 router.register(r'workspaces', views.WorkspaceViewSet)
+router.register(r'validations', views.ValidationActivityViewSet)
+router.register(r'activity-logs', views.ActivityLogViewSet)
 router.register(r'analytics', views.AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
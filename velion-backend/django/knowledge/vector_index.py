@@ -0,0 +1,466 @@
+"""
+Local vector index for semantic document search.
+
+Published documents are embedded (hashed TF-IDF by default, pluggable via
+``settings.VECTOR_EMBEDDER``) into a float32 matrix that is appended to on
+disk and memory-mapped by readers, so every worker shares the page cache
+instead of holding its own copy.
+
+Search uses an inverted file (IVF): rows are clustered around k-means
+centroids and a query only scores the rows of its ``nprobe`` nearest
+clusters. Rows appended since the last training are assigned to their
+nearest centroid and kept in a short tail that is scanned the same way;
+``manage.py update_vector_index --train`` re-clusters once it grows.
+
+Layout, under ``settings.VECTOR_INDEX_DIR``::
+
+    meta.json              current generation, row counts, sync watermark
+    g<N>/vectors.f32       row-major float32, one row per indexed version
+    g<N>/ids.bin           16-byte document UUID per row
+    g<N>/superseded.u8     1 for rows replaced by a newer version or unpublished
+    g<N>/assign.i32        cluster of each row
+    g<N>/centroids.npy, g<N>/offsets.npy, g<N>/rows.npy   IVF lists
+    g<N>/df.npy            per-dimension document frequencies (for IDF)
+
+A single writer (``sync_index``, under a file lock) appends rows and then
+replaces meta.json; readers notice the new meta.json and remap. Training
+and rebuilds write a new generation directory, so readers never see a
+half-written one.
+"""
+
+import fcntl
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from . import text_analysis
+from .extraction import document_text
+from .models import Document
+from .scoring import SourceDocument
+
+logger = logging.getLogger(__name__)
+
+IVF_MIN_ROWS = 10000  # below this an exact scan is fast enough
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 50
+RETRAIN_TAIL_RATIO = 0.5  # retrain once the untrained tail reaches half the trained rows
+SYNC_OVERLAP = timedelta(minutes=5)  # re-checks late commits; unchanged rows are skipped
+SYNC_CHUNK_SIZE = 1000
+SYNC_QUEUED_KEY = 'vector-index:sync-queued'
+SEARCH_OVERSAMPLE = 4  # neighbours fetched per wanted result, to survive filtering
+SEARCH_MAX_CANDIDATES = 10000
+
+class HashedTfidfEmbedder:
+    """
+    Words and bigrams hashed into ``dimensions`` signed buckets with
+    sublinear term frequency. Document vectors are L2-normalised TF; IDF
+    weights from the index's document frequencies are applied to queries
+    only, so stored vectors stay valid as the corpus grows.
+    """
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+
+    def _vector(self, text):
+        terms = text_analysis.content_words(text)
+        features = Counter(terms + [f'{first} {second}' for first, second in zip(terms, terms[1:])])
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in features.items():
+            digest = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign * (1.0 + math.log(count))
+        return vector
+
+    def embed(self, text):
+        return normalize(self._vector(text))
+
+    def embed_query(self, text, document_frequencies, documents):
+        idf = np.log((1.0 + documents) / (1.0 + document_frequencies)) + 1.0
+        return normalize(self._vector(text) * idf.astype(np.float32))
+
+def normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def get_embedder():
+    return import_string(settings.VECTOR_EMBEDDER)(settings.VECTOR_DIMENSIONS)
+
+def spherical_kmeans(vectors, clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+class VectorIndex:
+    """A read-only view of one generation, as recorded in meta.json."""
+    def __init__(self, root, meta):
+        self.root = root
+        self.meta = meta
+        self.path = os.path.join(root, f'g{meta["generation"]}')
+        count, dimensions = meta['count'], meta['dimensions']
+        self.count = count
+        if count:
+            self.vectors = np.memmap(self._file('vectors.f32'), np.float32, 'r', shape=(count, dimensions))
+            self.ids = np.memmap(self._file('ids.bin'), 'V16', 'r', shape=(count,))
+            self.superseded = np.memmap(self._file('superseded.u8'), np.uint8, 'r', shape=(count,))
+            self.assign = np.memmap(self._file('assign.i32'), np.int32, 'r', shape=(count,))
+        self.document_frequencies = np.load(self._file('df.npy')) if count else np.zeros(dimensions)
+        self.trained_count = meta['trained_count']
+        if self.trained_count:
+            self.centroids = np.load(self._file('centroids.npy'))
+            self.offsets = np.load(self._file('offsets.npy'))
+            self.list_rows = np.load(self._file('rows.npy'), mmap_mode='r')
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def candidate_rows(self, query, nprobe):
+        if not self.trained_count:
+            return np.arange(self.count)
+        probes = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        parts = [self.list_rows[self.offsets[probe]:self.offsets[probe + 1]] for probe in probes]
+        tail = np.arange(self.trained_count, self.count)
+        parts.append(tail[np.isin(self.assign[self.trained_count:self.count], probes)])
+        return np.concatenate(parts)
+
+    def search(self, query, k, nprobe=None):
+        """``[(document_id, score)]`` for the ``k`` nearest live rows."""
+        if not self.count or k <= 0:
+            return []
+        rows = self.candidate_rows(query, nprobe or settings.VECTOR_INDEX_NPROBE)
+        rows = np.sort(rows[self.superseded[rows] == 0])
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(uuid.UUID(bytes=self.ids[rows[i]].tobytes()), float(scores[i])) for i in top]
+
+def read_meta(root):
+    with open(os.path.join(root, 'meta.json')) as handle:
+        return json.load(handle)
+
+def write_meta(root, meta):
+    # Replaced atomically, so readers see the old or the new version
+    temporary = os.path.join(root, 'meta.json.tmp')
+    with open(temporary, 'w') as handle:
+        json.dump(meta, handle)
+    os.replace(temporary, os.path.join(root, 'meta.json'))
+
+_loaded = None
+_loaded_version = None
+_load_lock = threading.Lock()
+
+def get_index():
+    """The current index, remapped when the writer has published changes."""
+    global _loaded, _loaded_version
+    root = settings.VECTOR_INDEX_DIR
+    try:
+        stat = os.stat(os.path.join(root, 'meta.json'))
+    except FileNotFoundError:
+        return None
+    # meta.json is replaced, never rewritten, so a new inode means new data
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if version != _loaded_version:
+        with _load_lock:
+            if version != _loaded_version:
+                _loaded = VectorIndex(root, read_meta(root))
+                _loaded_version = version
+    return _loaded
+
+def semantic_search(query, k):
+    index = get_index()
+    if index is None:
+        return []
+    embedder = get_embedder()
+    if hasattr(embedder, 'embed_query'):
+        vector = embedder.embed_query(query, index.document_frequencies, index.meta['documents'])
+    else:
+        vector = embedder.embed(query)
+    return index.search(vector.astype(np.float32), k)
+
+def find_documents(queryset, data, offset, limit):
+    """
+    The ``limit`` documents of ``queryset`` after ``offset`` most similar
+    to ``data['query']``, each with a ``score``, and whether more follow.
+    ``queryset`` and the structured filters decide what may be returned;
+    the index only ranks, so unpublished or filtered out neighbours are
+    skipped by asking the index for more.
+    """
+    from .search import filter_documents
+
+    queryset = filter_documents(queryset, data)
+    wanted = offset + limit + 1
+    k = wanted * SEARCH_OVERSAMPLE
+    while True:
+        hits = semantic_search(data['query'], k)
+        allowed = {document.pk: document for document in queryset.filter(pk__in=[pk for pk, _ in hits])}
+        ranked = []
+        for pk, score in hits:
+            document = allowed.get(pk)
+            # A score of zero or less shares no terms with the query
+            if document is not None and score > 0:
+                document.score = score
+                ranked.append(document)
+        # Fewer hits than asked for means the index has nothing more to give
+        if len(ranked) >= wanted or len(hits) < k or k >= SEARCH_MAX_CANDIDATES:
+            return ranked[offset:offset + limit], len(ranked) > offset + limit
+        k = min(k * 4, SEARCH_MAX_CANDIDATES)
+
+# Writer side
+@contextmanager
+def writer_lock(root):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'lock'), 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+class IndexWriter:
+    def __init__(self, root, meta):
+        self.root = root
+        self.meta = meta
+        self.path = os.path.join(root, f'g{meta["generation"]}')
+        self.dimensions = meta['dimensions']
+        count = meta['count']
+        self.document_frequencies = (
+            np.load(self._file('df.npy')) if count else np.zeros(self.dimensions)
+        )
+        self.centroids = np.load(self._file('centroids.npy')) if meta['trained_count'] else None
+        # Latest row of every indexed document
+        self.rows = {}
+        if count:
+            ids = np.fromfile(self._file('ids.bin'), 'V16', count)
+            superseded = np.fromfile(self._file('superseded.u8'), np.uint8, count)
+            for row in np.flatnonzero(superseded == 0):
+                self.rows[ids[row].tobytes()] = int(row)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _vectors(self):
+        return np.memmap(self._file('vectors.f32'), np.float32, 'r', shape=(self.meta['count'], self.dimensions))
+
+    def supersede(self, rows):
+        if not rows:
+            return
+        flags = np.memmap(self._file('superseded.u8'), np.uint8, 'r+', shape=(self.meta['count'],))
+        flags[rows] = 1
+        flags.flush()
+
+    def apply(self, published, removed):
+        """
+        Append ``published`` ``[(document_id, vector)]`` unless unchanged,
+        and retire the rows of ``removed`` document ids.
+        """
+        vectors = self._vectors() if self.meta['count'] else None
+        retired = []
+        for pk in removed:
+            row = self.rows.pop(pk.bytes, None)
+            if row is not None:
+                retired.append(row)
+                # Frequencies are not decremented; a rebuild recomputes them
+                self.meta['documents'] -= 1
+        appended_ids = []
+        appended = []
+        for pk, vector in published:
+            row = self.rows.get(pk.bytes)
+            if row is not None and np.array_equal(vectors[row], vector):
+                continue
+            if row is not None:
+                retired.append(row)
+            else:
+                self.document_frequencies += vector != 0
+                self.meta['documents'] += 1
+            appended_ids.append(pk.bytes)
+            appended.append(vector)
+        self.supersede(retired)
+        if not appended:
+            return len(retired)
+
+        matrix = np.vstack(appended).astype(np.float32)
+        if self.centroids is not None:
+            assign = np.argmax(matrix @ self.centroids.T, axis=1).astype(np.int32)
+        else:
+            assign = np.full(len(matrix), -1, dtype=np.int32)
+        with open(self._file('vectors.f32'), 'ab') as handle:
+            handle.write(matrix.tobytes())
+        with open(self._file('ids.bin'), 'ab') as handle:
+            handle.write(b''.join(appended_ids))
+        with open(self._file('assign.i32'), 'ab') as handle:
+            handle.write(assign.tobytes())
+        with open(self._file('superseded.u8'), 'ab') as handle:
+            handle.write(bytes(len(matrix)))
+        for offset, pk in enumerate(appended_ids):
+            self.rows[pk] = self.meta['count'] + offset
+        self.meta['count'] += len(matrix)
+        np.save(self._file('df.npy'), self.document_frequencies)
+        return len(retired) + len(matrix)
+
+    def train(self):
+        """Re-cluster every row into a new generation and return its meta."""
+        count = self.meta['count']
+        generation = self.meta['generation'] + 1
+        path = new_generation_path(self.root, generation)
+        for name in ('vectors.f32', 'ids.bin', 'superseded.u8', 'df.npy'):
+            # Row data is unchanged: link it rather than copy it
+            os.link(self._file(name), os.path.join(path, name))
+
+        vectors = self._vectors()
+        if count >= IVF_MIN_ROWS:
+            lists = int(min(4096, max(1, math.sqrt(count))))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(count, min(count, lists * KMEANS_SAMPLE_PER_LIST), replace=False))
+            centroids = spherical_kmeans(np.asarray(vectors[sample]), lists)
+            assign = np.concatenate([
+                np.argmax(vectors[start:start + 50000] @ centroids.T, axis=1)
+                for start in range(0, count, 50000)
+            ]).astype(np.int32)
+            order = np.argsort(assign, kind='stable').astype(np.int32)
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=lists))))
+            np.save(os.path.join(path, 'centroids.npy'), centroids)
+            np.save(os.path.join(path, 'offsets.npy'), offsets)
+            np.save(os.path.join(path, 'rows.npy'), order)
+            trained = count
+        else:
+            assign = np.full(count, -1, dtype=np.int32)
+            trained = 0
+        assign.tofile(os.path.join(path, 'assign.i32'))
+        return {**self.meta, 'generation': generation, 'trained_count': trained}
+
+def _empty_meta(generation, embedder_path, dimensions):
+    return {
+        'generation': generation,
+        'embedder': embedder_path,
+        'dimensions': dimensions,
+        'count': 0,
+        'trained_count': 0,
+        'documents': 0,
+        'synced_until': None,
+    }
+
+def new_generation_path(root, generation):
+    # Clears what an interrupted run may have left behind
+    path = os.path.join(root, f'g{generation}')
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+def _create_generation(root, meta):
+    path = new_generation_path(root, meta['generation'])
+    for name in ('vectors.f32', 'ids.bin', 'superseded.u8', 'assign.i32'):
+        open(os.path.join(path, name), 'wb').close()
+    np.save(os.path.join(path, 'df.npy'), np.zeros(meta['dimensions']))
+
+def remove_old_generations(root, keep):
+    # Readers that still map an old generation keep its open files
+    for name in os.listdir(root):
+        if name.startswith('g') and name[1:].isdigit() and int(name[1:]) != keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+def _embed_rows(embedder, rows):
+    published, removed = [], []
+    for row in rows:
+        pk, status = row[0], row[1]
+        if status == 'PUBLISHED':
+            published.append((pk, embedder.embed(document_text(SourceDocument(*row[3:])))))
+        else:
+            removed.append(pk)
+    return published, removed
+
+def sync_index(rebuild=False, train=None):
+    """
+    Bring the index up to date with published documents: embed documents
+    changed since the last sync, or everything with ``rebuild``. Training
+    runs when asked, or automatically once the untrained tail is large.
+    Returns the number of rows written or retired.
+    """
+    root = settings.VECTOR_INDEX_DIR
+    embedder = get_embedder()
+    with writer_lock(root):
+        try:
+            meta = read_meta(root)
+        except FileNotFoundError:
+            meta = None
+        if meta is not None and (
+            meta['embedder'] != settings.VECTOR_EMBEDDER or meta['dimensions'] != settings.VECTOR_DIMENSIONS
+        ):
+            rebuild = True
+        if meta is None or rebuild:
+            meta = _empty_meta(meta['generation'] + 1 if meta else 1,
+                               settings.VECTOR_EMBEDDER, settings.VECTOR_DIMENSIONS)
+            _create_generation(root, meta)
+
+        writer = IndexWriter(root, meta)
+        fields = ['pk', 'status', 'updated_at'] + list(SourceDocument._fields)
+        documents = Document.objects.order_by('updated_at', 'pk')
+        if rebuild or meta['synced_until'] is None:
+            documents = documents.filter(status='PUBLISHED')
+        else:
+            documents = documents.filter(updated_at__gte=parse_datetime(meta['synced_until']) - SYNC_OVERLAP)
+
+        started = timezone.now()
+        changed = 0
+        chunk = []
+        with transaction.atomic():
+            for row in documents.values_list(*fields).iterator(chunk_size=SYNC_CHUNK_SIZE):
+                chunk.append(row)
+                if len(chunk) >= SYNC_CHUNK_SIZE:
+                    changed += writer.apply(*_embed_rows(embedder, chunk))
+                    chunk = []
+            if chunk:
+                changed += writer.apply(*_embed_rows(embedder, chunk))
+        # Changes committed while this ran fall inside the next overlap
+        meta['synced_until'] = started.isoformat()
+
+        tail = meta['count'] - meta['trained_count']
+        if train is None:
+            train = meta['count'] >= IVF_MIN_ROWS and tail > max(meta['trained_count'], 1) * RETRAIN_TAIL_RATIO
+        if train:
+            meta = writer.train()
+        write_meta(root, meta)
+        remove_old_generations(root, meta['generation'])
+    return changed
+
+# Signal helpers (see signals.py)
+def schedule_sync(document, previous=None):
+    # ``previous`` is the snapshot taken when the instance was loaded
+    if 'PUBLISHED' in (document.status, (previous or {}).get('status')):
+        request_sync()
+
+def request_sync():
+    def enqueue():
+        # One queued sync covers every change committed before it runs
+        if cache.add(SYNC_QUEUED_KEY, True, timeout=300):
+            from .tasks import enqueue, update_vector_index
+
+            enqueue(update_vector_index)
+
+    transaction.on_commit(enqueue)
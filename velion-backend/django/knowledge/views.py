@@ -1,11 +1,16 @@
 from rest_framework import viewsets, status, filters
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.parsers import MultiPartParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg, F, ExpressionWrapper, FloatField
-from django.db.models.functions import TruncDate
+from django.db.models import (
+    Count, Avg, F, ExpressionWrapper, FloatField, Value, OuterRef, Subquery
+)
+from django.db.models.functions import TruncDate, Coalesce
+from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 import logging
@@ -20,11 +25,20 @@ from .serializers import (
     ProjectSerializer, WorkspaceSerializer, WorkspaceMembershipSerializer,
     BlockchainTransactionSerializer, AnalyticsComponentSerializer,
     ValidationActivitySerializer, ActivityLogSerializer,
-    DocumentSearchSerializer, GraphQuerySerializer
+    DocumentSearchSerializer, DocumentSearchResultSerializer, GraphQuerySerializer,
+    DocumentUploadSerializer, SemanticSearchSerializer, SemanticSearchResultSerializer,
+    RelatedDocumentSerializer, SkillGapQuerySerializer
+)
+from . import (
+    access, activity_log, analytics, anchoring, extraction, graph, graph_sync, imports,
+    related_index, search, skills, uploads, vector_index
 )
+from .caching import cached_response
+from .exports import ExportMixin, full_name
+from .pagination import KeysetPaginationMixin
 from .permissions import (
     IsOwnerOrReadOnly, IsAdminOrKnowledgeChampion,
-    IsWorkspaceMember, IsWorkspaceOwnerOrAdmin
+    IsWorkspaceMember, IsWorkspaceOwnerOrAdmin, ObjectPermissionFilter, workspace_memberships
 )
 
 logger = logging.getLogger(__name__)
@@ -44,38 +58,56 @@ class PersonViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def search(self, request):
-        query = request.query_params.get('q', '')
+        query = request.query_params.get('q', '').strip()
         if not query:
             return Response([])
         
-        users = Person.objects.filter(
-            Q(email__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(employee_id__icontains=query)
-        ).filter(is_active=True)[:10]
-        
-        serializer = self.get_serializer(users, many=True)
-        return Response(serializer.data)
+        # Typeahead: trigram-indexed match, ranked by similarity, cached briefly per prefix
+        results = search.cached_people_search(
+            query, 10,
+            lambda users: self.get_serializer(users, many=True).data
+        )
+        return Response(results)
 
-class DocumentViewSet(viewsets.ModelViewSet):
-    queryset = Document.objects.all()
+class DocumentViewSet(KeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Document.objects.select_related('uploader')
     serializer_class = DocumentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'document_type', 'uploader']
     search_fields = ['title', 'description', 'tags']
     ordering_fields = ['created_at', 'updated_at', 'quality_score', 'view_count']
+    # Keyset cursors need a total order, so unscored documents sort as -1
+    keyset_expressions = {
+        'quality_score': Coalesce('quality_score', Value(-1.0)),
+    }
+    export_name = 'documents'
+    export_columns = [
+        ('id', 'id'), ('title', 'title'), ('description', 'description'),
+        ('content_hash', 'content_hash'), ('blockchain_tx_id', 'blockchain_tx_id'),
+        ('uploader', 'uploader_id'), ('uploader_employee_id', 'uploader__employee_id'),
+        ('uploader_name', full_name('uploader')), ('status', 'status'),
+        ('document_type', 'document_type'), ('quality_score', 'quality_score'),
+        ('metadata', 'metadata'), ('tags', 'tags'), ('file_url', 'file_url'),
+        ('file_size', 'file_size'), ('file_type', 'file_type'), ('version', 'version'),
+        ('previous_version', 'previous_version_id'), ('workspace', 'workspace_id'),
+        ('view_count', 'view_count'), ('download_count', 'download_count'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ('published_at', 'published_at'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filter by workspace if specified
+        # Filter by workspace if specified, within the same query as its visibility
         workspace_id = self.request.query_params.get('workspace')
+        memberships = workspace_memberships(self.request, build=False)
         if workspace_id:
-            workspace = Workspace.objects.filter(id=workspace_id).first()
-            if workspace:
-                queryset = queryset.filter(workspace=workspace)
+            queryset = access.filter_documents_by_workspace(
+                queryset, self.request.user, workspace_id, memberships
+            )
+        else:
+            queryset = self.visible_documents(queryset, memberships)
         
         # Filter by project if specified
         project_id = self.request.query_params.get('project')
@@ -84,6 +116,21 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def visible_documents(self, queryset, memberships=None):
+        # Documents in private workspaces stay with their members
+        if memberships is None:
+            memberships = workspace_memberships(self.request, build=False)
+        return access.visible_documents(queryset, self.request.user, memberships)
+    
+    def get_serializer_class(self):
+        if self.action == 'search':
+            return DocumentSearchResultSerializer
+        if self.action == 'semantic_search':
+            return SemanticSearchResultSerializer
+        if self.action == 'related':
+            return RelatedDocumentSerializer
+        return super().get_serializer_class()
+    
     def perform_create(self, serializer):
         serializer.save(uploader=self.request.user)
     
@@ -139,9 +186,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        documents = Document.objects.filter(
+        documents = self.visible_documents(Document.objects.select_related('uploader').filter(
             status__in=['PENDING_REVIEW', 'UNDER_REVIEW']
-        ).order_by('-created_at')
+        )).order_by('-created_at')
         
         page = self.paginate_queryset(documents)
         if page is not None:
@@ -152,11 +199,12 @@ class DocumentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_response(['documents', 'workspaces'], timeout=30, per_user=True)
     def recent(self, request):
         limit = min(int(request.query_params.get('limit', 10)), 50)
-        documents = Document.objects.filter(
+        documents = self.visible_documents(Document.objects.select_related('uploader').filter(
             status='PUBLISHED'
-        ).order_by('-created_at')[:limit]
+        )).order_by('-created_at')[:limit]
         
         serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
@@ -165,80 +213,222 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def view(self, request, pk=None):
         document = self.get_object()
         document.increment_view_count()
+        activity_log.log_action(
+            request.user, 'DOCUMENT_VIEW', f'Viewed {document.title}',
+            request=request, document_id=str(document.id)
+        )
         return Response({'success': True})
     
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
         document = self.get_object()
         document.increment_download_count()
+        activity_log.log_action(
+            request.user, 'DOCUMENT_DOWNLOAD', f'Downloaded {document.title}',
+            request=request, document_id=str(document.id)
+        )
         # In a real implementation, you would serve the file here
         return Response({
             'success': True,
             'url': document.file_url
         })
     
-    @action(detail=False, methods=['post'])
-    def search(self, request):
-        serializer = DocumentSearchSerializer(data=request.data)
+    @action(detail=True, methods=['get', 'post'])
+    def knowledge(self, request, pk=None):
+        # GET polls the extraction; POST re-runs every stage
+        document = self.get_object()
+        if request.method == 'POST':
+            extraction.request_extraction([document.pk], force=True)
+            return Response({'extraction_status': 'PENDING'}, status=status.HTTP_202_ACCEPTED)
+        
+        component = KnowledgeComponent.objects.filter(document=document).first()
+        if component is None:
+            return Response({'error': 'No extraction requested'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(KnowledgeComponentSerializer(component).data)
+    
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        # Neighbours are precomputed by the related index, so this is one row lookup
+        document = self.get_object()
+        limit = min(int(request.query_params.get('limit', 10)), related_index.TOP_N)
+        queryset = self.visible_documents(
+            Document.objects.select_related('uploader').filter(status='PUBLISHED')
+        )
+        documents = related_index.related_documents(queryset, document, limit)
+        return Response(self.get_serializer(documents, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def verify_anchor(self, request, pk=None):
+        # Walks the stored Merkle proof from the current content to the anchored root
+        document = self.get_object()
+        result = anchoring.verify_document(document)
+        if result is None:
+            return Response(
+                {'error': 'Document has not been anchored yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(result)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def upload(self, request):
+        # Hash each chunk as it streams to a temporary file
+        request.upload_handlers.insert(0, uploads.HashingFileUploadHandler())
+        
+        serializer = DocumentUploadSerializer(data=request.data, context=self.get_serializer_context())
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
-        
-        # Start with all published documents
-        queryset = Document.objects.filter(status='PUBLISHED')
-        
-        # Apply text search
-        if data.get('query'):
-            queryset = queryset.filter(
-                Q(title__icontains=data['query']) |
-                Q(description__icontains=data['query']) |
-                Q(tags__contains=[data['query']])
+        upload = data.pop('file')
+        on_duplicate = data.pop('on_duplicate')
+        
+        with transaction.atomic():
+            uploads.lock_content_hash(upload.content_hash)
+            existing = uploads.find_duplicate(self.get_queryset(), upload.content_hash, upload.size)
+            if existing and on_duplicate == 'return':
+                return Response({
+                    'duplicate': True,
+                    'document': self.get_serializer(existing).data
+                })
+            
+            if existing:
+                # Same content as a new version, sharing the stored file
+                file_url = existing.file_url
+                data.setdefault('title', existing.title)
+            else:
+                name = uploads.store_upload(upload)
+                file_url = request.build_absolute_uri(default_storage.url(name))
+            
+            document = Document.objects.create(
+                uploader=request.user,
+                content_hash=upload.content_hash,
+                file_url=file_url,
+                file_size=upload.size,
+                file_type=uploads.guess_file_type(upload),
+                version=existing.version + 1 if existing else 1,
+                previous_version=existing,
+                title=data.pop('title', None) or upload.name,
+                **data
             )
         
-        # Apply filters
-        if data.get('document_type'):
-            queryset = queryset.filter(document_type__in=data['document_type'])
-        
-        if data.get('tags'):
-            for tag in data['tags']:
-                queryset = queryset.filter(tags__contains=[tag])
+        return Response(
+            {'duplicate': existing is not None, 'document': self.get_serializer(document).data},
+            status=status.HTTP_201_CREATED
+        )
+    
+    @action(detail=False, methods=['get'])
+    def by_hash(self, request):
+        # Lets clients skip uploading content that is already stored
+        content_hash = request.query_params.get('content_hash', '').lower()
+        size = request.query_params.get('file_size')
+        if not content_hash or not size or not size.isdigit():
+            return Response(
+                {'error': 'content_hash and file_size are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if data.get('date_from'):
-            queryset = queryset.filter(created_at__date__gte=data['date_from'])
+        document = uploads.find_duplicate(self.get_queryset(), content_hash, int(size))
+        if document is None:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(document).data)
+    
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated, IsAdminOrKnowledgeChampion]
+    )
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A file upload is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if data.get('date_to'):
-            queryset = queryset.filter(created_at__date__lte=data['date_to'])
+        input_format = request.data.get('input_format') or imports.detect_format(upload.name)
+        if input_format not in imports.FORMATS:
+            return Response(
+                {'error': f'input_format must be one of: {", ".join(imports.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if data.get('quality_min') is not None:
-            queryset = queryset.filter(quality_score__gte=data['quality_min'])
+        # Shed load while the graph sync is behind rather than hold the worker
+        if not graph_sync.has_capacity():
+            return Response(
+                {'error': 'Imports are paused while the graph sync catches up'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(graph_sync.CAPACITY_RETRY_AFTER)}
+            )
         
-        if data.get('quality_max') is not None:
-            queryset = queryset.filter(quality_score__lte=data['quality_max'])
+        # Rows without uploader_employee_id are attributed to the caller
+        report = imports.import_documents(
+            imports.decode_lines(upload),
+            input_format,
+            default_uploader=request.user,
+            use_copy=request.data.get('method') == 'copy',
+        )
+        return Response(report.to_dict())
+    
+    @action(detail=False, methods=['post'])
+    def search(self, request):
+        serializer = DocumentSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        # Apply sorting
-        sort_field = 'created_at'
-        if data['sort_by'] == 'quality':
-            sort_field = 'quality_score'
-        elif data['sort_by'] == 'views':
-            sort_field = 'view_count'
+        data = serializer.validated_data
+        activity_log.log_action(
+            request.user, 'SEARCH', data.get('query', ''), request=request
+        )
         
-        if data['sort_order'] == 'desc':
-            sort_field = f'-{sort_field}'
+        # Start with the published documents the user can see
+        queryset = self.visible_documents(
+            Document.objects.select_related('uploader').filter(status='PUBLISHED')
+        )
         
-        queryset = queryset.order_by(sort_field)
+        # Full-text match, structured filters and sorting
+        queryset, search_query = search.search_documents(queryset, data)
         
         # Pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
+            page = search.attach_highlights(page, search_query)
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
-        serializer = self.get_serializer(queryset, many=True)
+        documents = search.attach_highlights(queryset, search_query)
+        serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def semantic_search(self, request):
+        serializer = SemanticSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        activity_log.log_action(
+            request.user, 'SEARCH', data['query'], request=request, semantic=True
+        )
+        
+        # Same scope as keyword search: published documents the user can see
+        queryset = self.visible_documents(
+            Document.objects.select_related('uploader').filter(status='PUBLISHED')
+        )
+        documents, has_more = vector_index.find_documents(
+            queryset, data, offset=(data['page'] - 1) * data['limit'], limit=data['limit']
+        )
+        return Response({
+            'page': data['page'],
+            'limit': data['limit'],
+            'has_more': has_more,
+            'results': self.get_serializer(documents, many=True).data,
+        })
 
 class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+    # Aggregate querysets skip Meta.ordering, so restate it
+    queryset = Project.objects.select_related('created_by').annotate(
+        team_members_count=Count('team_members')
+    ).order_by('-created_at')
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -269,29 +459,36 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
         
         project.team_members.add(user)
-        serializer = self.get_serializer(project)
+        
+        # Reload so the annotated member count includes the new member
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
 
 class WorkspaceViewSet(viewsets.ModelViewSet):
     queryset = Workspace.objects.all()
     serializer_class = WorkspaceSerializer
     permission_classes = [IsAuthenticated, IsWorkspaceMember]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # ObjectPermissionFilter limits lists and lookups to visible workspaces
+    filter_backends = [ObjectPermissionFilter, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description', 'tags']
     ordering_fields = ['created_at']
     
     def get_queryset(self):
-        user = self.request.user
-        
-        # Show all workspaces for admin
-        if user.role == 'ADMIN':
-            return Workspace.objects.all()
-        
-        # Show public workspaces and private workspaces user is a member of
-        return Workspace.objects.filter(
-            Q(is_private=False) |
-            Q(memberships__person=user)
-        ).distinct()
+        member_count = WorkspaceMembership.objects.filter(
+            workspace=OuterRef('pk')
+        ).order_by().values('workspace').annotate(count=Count('id')).values('count')
+        return Workspace.objects.select_related('created_by').annotate(
+            member_count=Coalesce(Subquery(member_count), 0)
+        )
+    
+    def get_permissions(self):
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return [IsAuthenticated(), IsWorkspaceMember(), IsWorkspaceOwnerOrAdmin()]
+        return super().get_permissions()
+    
+    @cached_response(['workspaces'], timeout=300, per_user=True)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         workspace = serializer.save(created_by=self.request.user)
@@ -303,24 +500,15 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
             role='OWNER'
         )
     
-    @action(detail=True, methods=['post'])
+    @action(
+        detail=True, methods=['post'],
+        permission_classes=[IsAuthenticated, IsWorkspaceMember, IsWorkspaceOwnerOrAdmin]
+    )
     def add_member(self, request, pk=None):
         workspace = self.get_object()
         user_id = request.data.get('user_id')
         role = request.data.get('role', 'MEMBER')
         
-        # Check permissions
-        membership = WorkspaceMembership.objects.filter(
-            workspace=workspace,
-            person=request.user
-        ).first()
-        
-        if not membership or membership.role not in ['OWNER', 'ADMIN']:
-            return Response(
-                {'error': 'Only owners and admins can add members'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         try:
             user = Person.objects.get(id=user_id, is_active=True)
         except Person.DoesNotExist:
@@ -347,123 +535,118 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
             role=role
         )
         
-        serializer = self.get_serializer(workspace)
+        # Reload so the annotated member count includes the new member
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def activity(self, request, pk=None):
         workspace = self.get_object()
+        limit = min(int(request.query_params.get('limit', 20)), 100)
         
-        # Get recent activities (in a real app, this would query an activity log)
-        activities = []
+        # Newest uploads first, read backwards off document_ws_feed_idx;
+        # uploader names come from the join, not per-row lookups
+        recent_docs = Document.objects.filter(workspace=workspace).order_by('-created_at').values(
+            'id', 'title', 'created_at', uploader_name=full_name('uploader')
+        )[:limit]
         
-        # Add recent document uploads
-        recent_docs = Document.objects.filter(
-            workspace=workspace
-        ).order_by('-created_at')[:10]
-        
-        for doc in recent_docs:
-            activities.append({
+        return Response([
+            {
                 'type': 'DOCUMENT_UPLOAD',
-                'timestamp': doc.created_at,
-                'user': doc.uploader.get_full_name(),
-                'document': doc.title,
-                'message': f'{doc.uploader.get_full_name()} uploaded "{doc.title}"'
-            })
-        
-        # Sort by timestamp
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        return Response(activities[:20])
+                'timestamp': doc['created_at'],
+                'user': doc['uploader_name'],
+                'document': doc['title'],
+                'document_id': doc['id'],
+                'message': f'{doc["uploader_name"]} uploaded "{doc["title"]}"'
+            }
+            for doc in recent_docs
+        ])
+
+class ValidationActivityViewSet(KeysetPaginationMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ValidationActivity.objects.select_related('document', 'validator')
+    serializer_class = ValidationActivitySerializer
+    permission_classes = [IsAuthenticated, IsAdminOrKnowledgeChampion]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {
+        'document': ['exact'],
+        'validator': ['exact'],
+        'action': ['exact'],
+        'new_status': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    ordering_fields = ['created_at']
+    export_name = 'validations'
+    export_columns = [
+        ('id', 'id'), ('document', 'document_id'), ('document_title', 'document__title'),
+        ('validator', 'validator_id'), ('validator_name', full_name('validator')),
+        ('action', 'action'), ('feedback', 'feedback'),
+        ('previous_status', 'previous_status'), ('new_status', 'new_status'),
+        ('created_at', 'created_at'),
+    ]
+
+class ActivityLogViewSet(KeysetPaginationMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ActivityLog.objects.select_related('user')
+    serializer_class = ActivityLogSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    # created_at bounds also let Postgres skip whole monthly partitions
+    filterset_fields = {
+        'user': ['exact'],
+        'action': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    ordering_fields = ['created_at']
+    export_name = 'activity-logs'
+    export_columns = [
+        ('id', 'id'), ('user', 'user_id'), ('user_name', full_name('user')),
+        ('action', 'action'), ('description', 'description'),
+        ('ip_address', 'ip_address'), ('user_agent', 'user_agent'),
+        ('metadata', 'metadata'), ('created_at', 'created_at'),
+    ]
 
 class AnalyticsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsAdminOrKnowledgeChampion]
     
     @action(detail=False, methods=['get'])
+    @cached_response(['documents', 'validations', 'workspaces', 'people'], timeout=60)
     def dashboard(self, request):
         timeframe = request.query_params.get('timeframe', '7days')
+        start_date, end_date = analytics.get_timeframe_range(timeframe)
         
-        # Calculate date range
-        end_date = timezone.now()
-        if timeframe == '7days':
-            start_date = end_date - timedelta(days=7)
-        elif timeframe == '30days':
-            start_date = end_date - timedelta(days=30)
-        elif timeframe == '90days':
-            start_date = end_date - timedelta(days=90)
-        elif timeframe == 'year':
-            start_date = end_date - timedelta(days=365)
-        else:
-            start_date = end_date - timedelta(days=7)
-        
-        # Get total documents
-        total_documents = Document.objects.count()
-        
-        # Get document growth
-        previous_period_end = start_date - timedelta(days=(end_date - start_date).days)
-        previous_period_start = previous_period_end - timedelta(days=(end_date - start_date).days)
-        
-        current_period_count = Document.objects.filter(
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        previous_period_count = Document.objects.filter(
-            created_at__range=[previous_period_start, previous_period_end]
-        ).count()
+        # Totals, growth and average quality from the daily rollups
+        totals = analytics.get_document_totals(start_date, end_date)
         
         document_growth = 0
-        if previous_period_count > 0:
-            document_growth = ((current_period_count - previous_period_count) / previous_period_count) * 100
+        if totals['previous_period'] > 0:
+            document_growth = (
+                (totals['current_period'] - totals['previous_period'])
+                / totals['previous_period']
+            ) * 100
         
         # Get active users (users with activity in last 7 days)
-        active_users = Person.objects.filter(
-            last_activity__gte=end_date - timedelta(days=7)
-        ).count()
-        
-        # Get average quality score
-        avg_quality = Document.objects.filter(
-            quality_score__isnull=False
-        ).aggregate(Avg('quality_score'))['quality_score__avg'] or 0
+        active_users = analytics.get_active_user_count(end_date - timedelta(days=7))
         
         # Get workspace count
         workspaces = Workspace.objects.count()
         
-        # Get activity trend
-        activity_trend = []
-        current = start_date
-        while current <= end_date:
-            next_day = current + timedelta(days=1)
-            daily_count = Document.objects.filter(
-                created_at__range=[current, next_day]
-            ).count()
-            
-            activity_trend.append({
-                'date': current.date().isoformat(),
-                'documents': daily_count,
-                'users': Person.objects.filter(
-                    last_activity__range=[current, next_day]
-                ).count(),
-                'quality': Document.objects.filter(
-                    created_at__range=[current, next_day],
-                    quality_score__isnull=False
-                ).aggregate(Avg('quality_score'))['quality_score__avg'] or 0
-            })
-            
-            current = next_day
+        # Get activity trend (constant number of queries for any timeframe)
+        activity_trend = analytics.get_activity_trend(start_date, end_date)
         
         # Get document type distribution
-        document_types = Document.objects.values('document_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        document_types = analytics.get_document_type_distribution()
+        
+        # Get validation outcomes for the timeframe
+        validation_outcomes = analytics.get_validation_outcomes(start_date, end_date)
         
         return Response({
-            'totalDocuments': total_documents,
+            'totalDocuments': totals['total'],
             'documentGrowth': round(document_growth, 2),
             'activeUsers': active_users,
-            'avgQualityScore': round(avg_quality, 1),
+            'avgQualityScore': round(totals['avg_quality'] or 0, 1),
             'activeWorkspaces': workspaces,
             'activityTrend': activity_trend,
-            'documentTypes': list(document_types),
+            'documentTypes': document_types,
+            'validationOutcomes': validation_outcomes,
             'timeframe': timeframe,
             'period': {
                 'start': start_date,
@@ -472,64 +655,29 @@ class AnalyticsViewSet(viewsets.ViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @cached_response(['skills'], timeout=300)
     def skill_gap(self, request):
-        # This is a simplified example
-        # In a real implementation, this would analyze project requirements vs available skills
-        
-        skill_gaps = [
-            {
-                'skill': 'AI/ML Development',
-                'required': 15,
-                'available': 8,
-                'gap': 7,
-                'priority': 'HIGH',
-                'action': 'Hire External Talent'
-            },
-            {
-                'skill': 'Blockchain Security',
-                'required': 10,
-                'available': 6,
-                'gap': 4,
-                'priority': 'MEDIUM',
-                'action': 'Training Program'
-            },
-            {
-                'skill': 'Cloud Architecture',
-                'required': 20,
-                'available': 18,
-                'gap': 2,
-                'priority': 'LOW',
-                'action': 'Internal Development'
-            },
-            {
-                'skill': 'Data Analytics',
-                'required': 12,
-                'available': 9,
-                'gap': 3,
-                'priority': 'MEDIUM',
-                'action': 'Cross-training'
-            },
-            {
-                'skill': 'DevOps Engineering',
-                'required': 8,
-                'available': 5,
-                'gap': 3,
-                'priority': 'HIGH',
-                'action': 'Contract Hiring'
-            }
-        ]
+        serializer = SkillGapQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(skill_gaps)
+        data = serializer.validated_data
+        filters = {field: data[field] for field in skills.SEGMENTS if data.get(field)}
+        return Response(skills.skill_gaps(filters, data.get('segment_by'), data.get('limit')))
     
     @action(detail=False, methods=['get'])
+    @cached_response(['documents', 'validations', 'workspaces'], timeout=60, per_user=True)
     def user_engagement(self, request):
         limit = int(request.query_params.get('limit', 10))
+        memberships = workspace_memberships(request, build=False)
         
         # Get recent user activities
         recent_activities = []
         
         # Recent document uploads
-        recent_docs = Document.objects.select_related('uploader').order_by('-created_at')[:limit]
+        recent_docs = access.visible_documents(
+            Document.objects.select_related('uploader'), request.user, memberships
+        ).order_by('-created_at')[:limit]
         for doc in recent_docs:
             recent_activities.append({
                 'timestamp': doc.created_at,
@@ -540,8 +688,9 @@ class AnalyticsViewSet(viewsets.ViewSet):
             })
         
         # Recent validations
-        recent_validations = ValidationActivity.objects.select_related(
-            'validator', 'document'
+        recent_validations = access.visible_documents(
+            ValidationActivity.objects.select_related('validator', 'document'),
+            request.user, memberships, prefix='document__'
         ).order_by('-created_at')[:limit]
         
         for validation in recent_validations:
@@ -556,4 +705,41 @@ class AnalyticsViewSet(viewsets.ViewSet):
         # Sort by timestamp
         recent_activities.sort(key=lambda x: x['timestamp'], reverse=True)
         
-        return Response(recent_activities[:limit])
\ No newline at end of file
+        return Response(recent_activities[:limit])
+
+class GraphView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = GraphQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        try:
+            if data.get('entity_id'):
+                result = graph.neighborhood(
+                    data['entity_type'], data['entity_id'], data['depth'], data['limit']
+                )
+            else:
+                result = graph.overview(data['limit'])
+        except graph.GraphUnavailable:
+            return Response(
+                {'error': 'The knowledge graph is being built, try again shortly'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(graph.SNAPSHOT_RETRY_AFTER)}
+            )
+        if result is None:
+            return Response(
+                {'error': 'Entity not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        result['metadata'] = {
+            'entity_id': data.get('entity_id'),
+            'entity_type': data.get('entity_type'),
+            'depth': data['depth'],
+            'total_nodes': len(result['nodes']),
+            'total_edges': len(result['edges']),
+        }
+        return Response(result)
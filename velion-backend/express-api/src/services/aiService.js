@@ -1,3 +1,5 @@
+const DjangoService = require("./djangoService");
+
 class AIService {
   async analyzeDocument(content) {
     // Placeholder for AI analysis
@@ -8,6 +10,11 @@ class AIService {
     };
   }
 
+  async semanticSearch(params) {
+    // Served by the vector index behind /api/documents/semantic_search/
+    return DjangoService.semanticSearch(params);
+  }
+
   async generateEmbeddings(text) {
     // Placeholder for embeddings
     return [0.1, 0.2, 0.3]; // dummy vector
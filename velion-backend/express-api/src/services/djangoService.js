@@ -84,6 +84,21 @@ class DjangoService {
     }
   }
 
+  async semanticSearch({ query, filters = {}, page = 1, limit = 20 }) {
+    try {
+      const response = await this.client.post("/documents/semantic_search/", {
+        ...filters,
+        query,
+        page,
+        limit,
+      });
+      return response.data.results;
+    } catch (error) {
+      console.error("Error in semantic search:", error.message);
+      return [];
+    }
+  }
+
   // Knowledge component operations
   async createKnowledgeComponent(componentData) {
     try {